@@ -0,0 +1,201 @@
+import argparse
+import sys
+import time
+from collections import defaultdict
+from functools import reduce
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from smart_nvr.detection.detection_types import (
+    Detection,
+    merge_detections,
+    suppress_detections,
+)
+from smart_nvr.utils.geometry import merge_rectangles
+from smart_nvr.utils.rectangle import Rectangle
+
+NAMES = ["person", "car", "cat"]
+
+
+# Previous implementations, including their min of the bottom right corner
+def legacy_outer_box_rectangles(rectangles: List[Rectangle]) -> Rectangle:
+    return Rectangle(
+        min([r.x1 for r in rectangles]),
+        min([r.y1 for r in rectangles]),
+        min([r.x2 for r in rectangles]),
+        min([r.y2 for r in rectangles]),
+    )
+
+
+def legacy_merge_rectangles(
+    rectangles: List[Rectangle], overlap_ratio_threshold: float = 0.65
+) -> List[Rectangle]:
+    rectangle_groups: List[List[Rectangle]] = []
+
+    for rectangle in rectangles:
+        rectangle_grouped = False
+        for rectangle_group in rectangle_groups:
+            for other_rectangle in rectangle_group:
+                smaller_area = min(rectangle.area, other_rectangle.area)
+                if (
+                    rectangle.overlap_area(other_rectangle)
+                    > overlap_ratio_threshold * smaller_area
+                ):
+                    rectangle_group.append(rectangle)
+                    rectangle_grouped = True
+                    break
+
+            if rectangle_grouped:
+                break
+
+        if not rectangle_grouped:
+            rectangle_groups.append([rectangle])
+
+        rectangle_groups = sorted(
+            rectangle_groups, key=lambda rectangle_group: len(rectangle_group)
+        )
+
+    return [
+        legacy_outer_box_rectangles(rectangle_group)
+        for rectangle_group in rectangle_groups
+    ]
+
+
+def legacy_outer_box_detections(detections: List[Detection]) -> Detection:
+    return Detection(
+        detections[0].name,
+        max([d.confidence for d in detections]),
+        min([d.rectangle.x1 for d in detections]),
+        min([d.rectangle.y1 for d in detections]),
+        min([d.rectangle.x2 for d in detections]),
+        min([d.rectangle.y2 for d in detections]),
+    )
+
+
+def legacy_merge_detections(
+    detections: List[Detection], overlap_ratio_threshold: float = 0.65
+) -> List[Detection]:
+    detection_groups_map: Dict[str, List[List[Detection]]] = defaultdict(list)
+
+    for detection in detections:
+        detection_grouped = False
+        detection_groups = detection_groups_map[detection.name]
+
+        for detection_group in detection_groups:
+            for other_detection in detection_group:
+                smaller_area = min(
+                    detection.rectangle.area, other_detection.rectangle.area
+                )
+                if (
+                    detection.rectangle.overlap_area(other_detection.rectangle)
+                    > overlap_ratio_threshold * smaller_area
+                ):
+                    detection_group.append(detection)
+                    detection_grouped = True
+                    break
+
+            if detection_grouped:
+                break
+
+        if not detection_grouped:
+            detection_groups.append([detection])
+
+        detection_groups_map[detection.name] = sorted(
+            detection_groups, key=lambda detection_group: len(detection_group)
+        )
+
+    detection_groups = reduce(
+        lambda acc, detection_groups: [*acc, *detection_groups],
+        detection_groups_map.values(),
+        [],
+    )
+
+    return [
+        legacy_outer_box_detections(detection_group)
+        for detection_group in detection_groups
+    ]
+
+
+def random_detections(count: int, seed: int = 0) -> List[Detection]:
+    # Clusters of jittered boxes like duplicate detections of one object
+    rng = np.random.RandomState(seed)
+    detections: List[Detection] = []
+    while len(detections) < count:
+        x, y = rng.randint(0, 1600), rng.randint(0, 900)
+        size = rng.randint(40, 300)
+        name = NAMES[rng.randint(0, len(NAMES))]
+        for _ in range(min(count - len(detections), rng.randint(1, 5))):
+            dx, dy = rng.randint(-10, 10, size=2)
+            detections.append(
+                Detection(
+                    name,
+                    float(rng.uniform(0.5, 1)),
+                    int(x + dx),
+                    int(y + dy),
+                    int(x + dx + size),
+                    int(y + dy + size),
+                )
+            )
+    return detections
+
+
+def measure(function: Callable[[], object], repeat: int, rounds: int = 5) -> float:
+    # Best of several rounds, a busy host only ever makes a round slower
+    best = float("inf")
+    for _ in range(rounds):
+        t = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        best = min(best, (time.perf_counter() - t) * 1e6 / repeat)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[5, 20, 100, 400])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Fail when a merge is slower than its legacy implementation",
+    )
+    args = parser.parse_args()
+
+    regressions = []
+    for count in args.counts:
+        detections = random_detections(count)
+        rectangles = [d.rectangle for d in detections]
+
+        results = {
+            "legacy merge_rectangles": measure(
+                lambda: legacy_merge_rectangles(rectangles), args.repeat
+            ),
+            "merge_rectangles": measure(
+                lambda: merge_rectangles(rectangles), args.repeat
+            ),
+            "legacy merge_detections": measure(
+                lambda: legacy_merge_detections(detections), args.repeat
+            ),
+            "merge_detections": measure(
+                lambda: merge_detections(detections), args.repeat
+            ),
+            "suppress_detections": measure(
+                lambda: suppress_detections(detections), args.repeat
+            ),
+        }
+        print(
+            f"{count} boxes: "
+            + ", ".join(f"{name} {value:.0f} us" for name, value in results.items())
+        )
+
+        for name in ["merge_rectangles", "merge_detections"]:
+            if results[name] > results[f"legacy {name}"]:
+                regressions.append(f"{name} at {count} boxes")
+
+    if args.check and len(regressions) > 0:
+        sys.exit(f"Slower than legacy: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
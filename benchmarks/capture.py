@@ -0,0 +1,82 @@
+import argparse
+import os
+import tempfile
+import time
+from fractions import Fraction
+
+import av
+
+from smart_nvr.app_config import CaptureBackendEnum, CaptureConfig, DecodeModeEnum
+from smart_nvr.camera.capture import CAPTURE_MAP
+
+from .frames import RESOLUTIONS, synthetic_frames
+
+
+def write_sample_video(file_path: str, resolution: str, frames_count: int, gop: int):
+    height, width = RESOLUTIONS[resolution]
+
+    container = av.open(file_path, mode="w")
+    stream = container.add_stream("mpeg4", rate=25)
+    stream.width = width
+    stream.height = height
+    stream.pix_fmt = "yuv420p"
+    stream.codec_context.gop_size = gop
+    stream.codec_context.time_base = Fraction(1, 25)
+
+    for index, img in enumerate(
+        synthetic_frames((height, width), frames_count, step=4)
+    ):
+        frame = av.VideoFrame.from_ndarray(img, format="bgr24")
+        frame.pts = index
+        for packet in stream.encode(frame):
+            container.mux(packet)
+
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()
+
+
+def run(file_path: str, config: CaptureConfig) -> str:
+    cap = CAPTURE_MAP[config.backend](file_path, config)
+
+    grabbed = 0
+    analysed = 0
+    t = time.perf_counter()
+    while cap.grab():
+        grabbed += 1
+        if grabbed % config.frame_step == 0 and cap.retrieve() is not None:
+            analysed += 1
+    elapsed = time.perf_counter() - t
+    cap.release()
+
+    return f"{elapsed * 1000:.0f} ms, {grabbed} grabbed, {analysed} analysed"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolution", choices=RESOLUTIONS.keys(), default="1080p")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--gop", type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "sample.mp4")
+        write_sample_video(file_path, args.resolution, args.frames, args.gop)
+
+        configs = {
+            "opencv": CaptureConfig(backend=CaptureBackendEnum.opencv),
+            "pyav all": CaptureConfig(backend=CaptureBackendEnum.pyav),
+            "pyav every 5th": CaptureConfig(
+                backend=CaptureBackendEnum.pyav, frame_step=5
+            ),
+            "pyav keyframes": CaptureConfig(
+                backend=CaptureBackendEnum.pyav, decode=DecodeModeEnum.keyframes
+            ),
+        }
+
+        for name, config in configs.items():
+            print(f"{args.resolution} {name}: {run(file_path, config)}")
+
+
+if __name__ == "__main__":
+    main()
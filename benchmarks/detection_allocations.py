@@ -0,0 +1,93 @@
+import argparse
+import time
+import tracemalloc
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from benchmarks.box_merging import legacy_merge_detections
+from benchmarks.detection_decoding import legacy_decode_ssd_output, random_output
+from smart_nvr.detection.detection_types import Detection
+from smart_nvr.detection.opencv import COCO_LABELS, decode_ssd_output
+from smart_nvr.detection.post_processing import LabelLookup
+from smart_nvr.utils.rectangle import Rectangle
+
+NAMES = ["person", "car", "cat"]
+
+
+def legacy_frame(output, crops, images_count) -> List[Sequence[Detection]]:
+    # Row by row decoding into objects, merged as lists of objects
+    return [
+        legacy_merge_detections(detections)
+        for detections in legacy_decode_ssd_output(output, crops, images_count, 0.5)
+    ]
+
+
+def batch_frame(
+    output, crops, images_count, lookup: LabelLookup
+) -> List[Sequence[Detection]]:
+    return [
+        batch.merge()
+        for batch in decode_ssd_output(output, crops, images_count, lookup, 0.5)
+    ]
+
+
+def measure_time(function: Callable[[], object], repeat: int) -> float:
+    t = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - t) * 1e6 / repeat
+
+
+def measure_memory(function: Callable[[], object], repeat: int) -> Tuple[int, float]:
+    # Peak while processing a frame and what its results keep alive while
+    # they wait in the worker queues
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+
+    results: List[object] = []
+    before = tracemalloc.take_snapshot()
+    for _ in range(repeat):
+        results.append(function())
+    stats = tracemalloc.take_snapshot().compare_to(before, "filename")
+    tracemalloc.stop()
+
+    return peak, sum(stat.size_diff for stat in stats) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--crops", type=int, nargs="+", default=[2, 8])
+    parser.add_argument("--confident-ratio", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    lookup = LabelLookup(COCO_LABELS, NAMES)
+
+    for crops_count in args.crops:
+        crops = [
+            (
+                index // 2,
+                Rectangle((index % 2) * 640, 0, (index % 2) * 640 + 640, 720),
+                np.zeros((720, 640, 3), dtype=np.uint8),
+            )
+            for index in range(crops_count)
+        ]
+        images_count = (crops_count + 1) // 2
+        output = random_output(crops_count, args.confident_ratio)
+
+        for name, function in [
+            ("legacy", lambda: legacy_frame(output, crops, images_count)),
+            ("batch", lambda: batch_frame(output, crops, images_count, lookup)),
+        ]:
+            elapsed = measure_time(function, args.repeat)
+            peak, retained = measure_memory(function, args.repeat)
+            print(
+                f"{crops_count} crops {name}: {elapsed:.0f} us/frame, "
+                f"peak {peak / 1024:.1f} KiB, retained {retained:.0f} B/frame"
+            )
+
+
+if __name__ == "__main__":
+    main()
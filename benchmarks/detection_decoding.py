@@ -0,0 +1,121 @@
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from smart_nvr.detection.base_model import adjust_cropped_detection
+from smart_nvr.detection.detection_types import Detection
+from smart_nvr.detection.opencv import COCO_LABELS, decode_ssd_output
+from smart_nvr.detection.post_processing import LabelLookup, filter_detections
+from smart_nvr.utils.rectangle import Rectangle
+
+NAMES = ["person", "car", "cat"]
+
+# SSD keeps the top 100 detections of every crop
+DETECTIONS_PER_CROP = 100
+
+Crop = Tuple[int, Rectangle, np.ndarray]
+
+
+# Previous row by row decoding, filtered by name afterwards
+def legacy_decode_ssd_output(
+    output: np.ndarray, crops: List[Crop], images_count: int, threshold: float
+) -> List[List[Detection]]:
+    detections: List[List[Detection]] = [[] for _ in range(images_count)]
+
+    for raw_prediction in output[0, 0, :, :]:
+        confidence = float(raw_prediction[2])
+
+        if confidence > threshold:
+            img_index, dimensions, cropped_image = crops[int(raw_prediction[0])]
+            detections[img_index].append(
+                adjust_cropped_detection(
+                    Detection(
+                        name=COCO_LABELS.get(int(raw_prediction[1]), "unknown"),
+                        confidence=confidence,
+                        x1=int(raw_prediction[3] * cropped_image.shape[1]),
+                        y1=int(raw_prediction[4] * cropped_image.shape[0]),
+                        x2=int(raw_prediction[5] * cropped_image.shape[1]),
+                        y2=int(raw_prediction[6] * cropped_image.shape[0]),
+                    ),
+                    dimensions,
+                )
+            )
+
+    return [filter_detections(d, NAMES) for d in detections]
+
+
+def random_output(
+    crops_count: int, confident_ratio: float, seed: int = 0
+) -> np.ndarray:
+    rng = np.random.RandomState(seed)
+    rows = crops_count * DETECTIONS_PER_CROP
+
+    corners = rng.uniform(0, 0.5, size=(rows, 2))
+    sizes = rng.uniform(0.05, 0.5, size=(rows, 2))
+    confidences = np.where(
+        rng.uniform(size=rows) < confident_ratio,
+        rng.uniform(0.5, 1, size=rows),
+        rng.uniform(0, 0.5, size=rows),
+    )
+
+    output = np.column_stack(
+        [
+            np.repeat(np.arange(crops_count), DETECTIONS_PER_CROP),
+            rng.choice(list(COCO_LABELS), size=rows),
+            confidences,
+            corners,
+            corners + sizes,
+        ]
+    )
+    return output.astype(np.float32)[None, None]
+
+
+def measure(function: Callable[[], object], repeat: int) -> float:
+    t = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - t) * 1e6 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--crops", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--confident-ratio", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    lookup = LabelLookup(COCO_LABELS, NAMES)
+
+    for crops_count in args.crops:
+        # Every image is split into two crops like the camera feed does
+        crops = [
+            (
+                index // 2,
+                Rectangle((index % 2) * 640, 0, (index % 2) * 640 + 640, 720),
+                np.zeros((720, 640, 3), dtype=np.uint8),
+            )
+            for index in range(crops_count)
+        ]
+        images_count = (crops_count + 1) // 2
+        output = random_output(crops_count, args.confident_ratio)
+
+        results = {
+            "legacy": measure(
+                lambda: legacy_decode_ssd_output(output, crops, images_count, 0.5),
+                args.repeat,
+            ),
+            "vectorized": measure(
+                lambda: decode_ssd_output(output, crops, images_count, lookup, 0.5),
+                args.repeat,
+            ),
+        }
+        print(
+            f"{crops_count} crops: "
+            + ", ".join(f"{name} {value:.0f} us" for name, value in results.items())
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BACKGROUND_IMAGE_PATH = "data/images/people-back-yard.jpeg"
+OBJECT_IMAGE_PATH = "data/images/cat.jpeg"
+
+RESOLUTIONS = {
+    "720p": (720, 1280),
+    "1080p": (1080, 1920),
+    "4k": (2160, 3840),
+}
+
+
+def load_image(file_path: str, shape: Tuple[int, int]) -> np.ndarray:
+    height, width = shape
+    img = cv2.imread(file_path)
+    if img is None:
+        raise FileNotFoundError(file_path)
+
+    return cv2.resize(img, (width, height))
+
+
+def synthetic_frames(
+    shape: Tuple[int, int],
+    count: int,
+    noise: int = 4,
+    flicker: int = 0,
+    step: Optional[int] = None,
+    seed: int = 0,
+) -> Iterator[np.ndarray]:
+    # Static background with a single object moving across the scene, step of
+    # zero keeps the object in place. Flicker toggles brightness of a patch in
+    # the top left corner like an IR light would
+    height, width = shape
+    rng = np.random.RandomState(seed)
+
+    background = load_image(BACKGROUND_IMAGE_PATH, shape)
+    object_size = height // 4
+    object_img = load_image(OBJECT_IMAGE_PATH, (object_size, object_size))
+
+    if step is None:
+        step = max(1, (width - object_size) // max(1, count))
+    y = height // 2
+
+    for index in range(count):
+        frame = background.copy()
+        x = (index * step) % (width - object_size)
+        frame[y : y + object_size, x : x + object_size] = object_img
+
+        if noise > 0:
+            frame = cv2.add(
+                frame, rng.randint(0, noise, size=frame.shape, dtype=np.uint8)
+            )
+
+        if flicker > 0 and rng.randint(0, 2) == 1:
+            patch = frame[: height // 3, : width // 3]
+            brighter = patch.astype(np.int16) + flicker
+            patch[:] = np.clip(brighter, 0, 255).astype(np.uint8)
+
+        yield frame
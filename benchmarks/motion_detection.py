@@ -0,0 +1,106 @@
+import argparse
+import time
+from typing import List
+
+from smart_nvr.app_config import MotionBackendEnum, MotionDetectionConfig
+from smart_nvr.camera.motion_detection.detection import (
+    FrameDifferenceMotionDetector,
+    detect_motion,
+)
+from smart_nvr.camera.motion_detection.motion_detector_map import MOTION_DETECTOR_MAP
+from smart_nvr.utils.rectangle import Rectangle
+
+from .frames import RESOLUTIONS, synthetic_frames
+
+
+def iou(a: Rectangle, b: Rectangle) -> float:
+    overlap = a.overlap_area(b)
+    union = a.area + b.area - overlap
+    return overlap / union if union > 0 else 0.0
+
+
+def match_ratio(reference: List[Rectangle], rectangles: List[Rectangle]) -> float:
+    if len(reference) == 0 and len(rectangles) == 0:
+        return 1.0
+    if len(reference) == 0 or len(rectangles) == 0:
+        return 0.0
+
+    return sum(max(iou(r, o) for o in rectangles) for r in reference) / len(reference)
+
+
+def run_scales(resolution: str, frames_count: int, scales: List[float]):
+    frames = list(synthetic_frames(RESOLUTIONS[resolution], frames_count))
+
+    t = time.perf_counter()
+    reference = [
+        detect_motion(previous, current)
+        for previous, current in zip(frames, frames[1:])
+    ]
+    reference_ms = (time.perf_counter() - t) * 1000 / (len(frames) - 1)
+
+    print(f"{resolution}: full resolution {reference_ms:.2f} ms/frame")
+
+    for scale in scales:
+        detector = FrameDifferenceMotionDetector(MotionDetectionConfig(scale=scale))
+        detector.detect(frames[0])
+
+        t = time.perf_counter()
+        results = [detector.detect(frame) or [] for frame in frames[1:]]
+        scaled_ms = (time.perf_counter() - t) * 1000 / (len(frames) - 1)
+
+        match = sum(
+            match_ratio(expected, actual)
+            for expected, actual in zip(reference, results)
+        ) / len(reference)
+
+        print(
+            f"{resolution}: scale {scale} {scaled_ms:.2f} ms/frame, "
+            f"speed-up {reference_ms / scaled_ms:.1f}x, rectangle IoU {match:.2f}"
+        )
+
+
+def run_backends(resolution: str, frames_count: int, scale: float):
+    # Flickering static scene followed by a slowly moving object
+    static_frames = list(
+        synthetic_frames(RESOLUTIONS[resolution], frames_count, flicker=40, step=0)
+    )
+    moving_frames = list(
+        synthetic_frames(RESOLUTIONS[resolution], frames_count, step=1, seed=1)
+    )
+
+    for backend in MotionBackendEnum:
+        detector = MOTION_DETECTOR_MAP[backend](
+            MotionDetectionConfig(backend=backend, scale=scale)
+        )
+
+        t = time.perf_counter()
+        static_results = [detector.detect(frame) for frame in static_frames]
+        moving_results = [detector.detect(frame) for frame in moving_frames]
+        ms = (time.perf_counter() - t) * 1000 / (len(static_frames) * 2)
+
+        spurious = sum(1 for r in static_results if r)
+        detected = sum(1 for r in moving_results if r)
+
+        print(
+            f"{resolution}: {backend.value} {ms:.2f} ms/frame, "
+            f"spurious {spurious}/{len(static_frames)} frames, "
+            f"slow mover {detected}/{len(moving_frames)} frames"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolution", choices=RESOLUTIONS.keys(), default="1080p")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.5, 0.25])
+    parser.add_argument("--backends", action="store_true")
+    args = parser.parse_args()
+
+    if args.backends:
+        run_backends(args.resolution, args.frames, args.scales[-1])
+    else:
+        run_scales(args.resolution, args.frames, args.scales)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache, partial
+from itertools import cycle
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from smart_nvr.camera.feed_multiplexer import CameraFeedMultiplexer
+from smart_nvr.camera.image import (
+    CameraImageContainer,
+    DetectionCameraImageContainer,
+    get_split_image_dimensions,
+)
+from smart_nvr.camera.motion_detection.detection import detect_motion
+from smart_nvr.detection.base_model import BaseDetectionModel
+from smart_nvr.detection.detection_types import Detection, merge_detections
+from smart_nvr.detection.model_map import MODEL_MAP, get_model_class
+from smart_nvr.detection.onnx_runtime import OnnxDetectionModel
+from smart_nvr.detection.opencv import MODEL_DIR, OpenCVTensorflowDetectionModel
+from smart_nvr.detection.visualizer import Visualizer
+from smart_nvr.utils.geometry import merge_rectangles
+from smart_nvr.video.video_output import VideoOutput
+
+from .box_merging import random_detections
+from .frames import OBJECT_IMAGE_PATH, RESOLUTIONS, load_image, synthetic_frames
+
+FRAMES_COUNT = 10
+FRAME_RATE = 25
+MODEL_BATCH_SIZE = 4
+
+
+class Case:
+    def __init__(
+        self,
+        benchmark: str,
+        params: Dict[str, Any],
+        run: Callable[[], object],
+        items: int = 1,
+        teardown: Optional[Callable[[], object]] = None,
+    ):
+        self.benchmark = benchmark
+        self.params = params
+        self.run = run
+        # Items processed by one run, reported as throughput
+        self.items = items
+        self.teardown = teardown
+
+    @property
+    def key(self) -> str:
+        params = ",".join(f"{key}={value}" for key, value in self.params.items())
+        return f"{self.benchmark}[{params}]"
+
+
+@lru_cache(maxsize=None)
+def frames(resolution: str) -> Tuple[np.ndarray, ...]:
+    return tuple(synthetic_frames(RESOLUTIONS[resolution], FRAMES_COUNT, step=8))
+
+
+def detect_next_motion(pairs: Iterator[Tuple[np.ndarray, np.ndarray]]):
+    return detect_motion(*next(pairs))
+
+
+def motion_cases(resolutions: List[str]) -> Iterator[Case]:
+    for resolution in resolutions:
+        pairs = cycle(zip(frames(resolution), frames(resolution)[1:]))
+        yield Case(
+            "detect_motion",
+            {"resolution": resolution},
+            partial(detect_next_motion, pairs),
+        )
+
+
+def merge_cases(resolutions: List[str]) -> Iterator[Case]:
+    for count in [5, 20, 100]:
+        detections = random_detections(count)
+        rectangles = [d.rectangle for d in detections]
+        yield Case(
+            "merge_rectangles",
+            {"boxes": count},
+            partial(merge_rectangles, rectangles),
+        )
+        yield Case(
+            "merge_detections",
+            {"boxes": count},
+            partial(merge_detections, detections),
+        )
+
+
+def image_create_cases(resolutions: List[str]) -> Iterator[Case]:
+    for resolution in resolutions:
+        frame = frames(resolution)[0]
+        dimensions = get_split_image_dimensions(frame)
+        yield Case(
+            "image_create",
+            {"resolution": resolution},
+            partial(CameraImageContainer.create, "benchmark", frame, dimensions),
+        )
+
+
+def visualizer_cases(resolutions: List[str]) -> Iterator[Case]:
+    for resolution in resolutions:
+        frame = frames(resolution)[0].copy()
+        height, width = RESOLUTIONS[resolution]
+        detection = Detection(
+            "person", 0.87, width // 4, height // 4, width // 2, height // 2, 12
+        )
+        yield Case(
+            "draw_detection",
+            {"resolution": resolution},
+            partial(Visualizer.draw_detection, frame, detection),
+        )
+
+
+def video_output_cases(resolutions: List[str]) -> Iterator[Case]:
+    for resolution in resolutions:
+        height, width = RESOLUTIONS[resolution]
+        imgs = cycle(
+            [
+                DetectionCameraImageContainer(
+                    CameraImageContainer.create("benchmark", frame, []), []
+                )
+                for frame in frames(resolution)
+            ]
+        )
+
+        directory = tempfile.TemporaryDirectory()
+        video_output = VideoOutput(
+            os.path.join(directory.name, "benchmark.mp4"), width, height
+        )
+        timestamps = iter(range(0, sys.maxsize, 1000 // FRAME_RATE))
+
+        def write_image(video_output=video_output, imgs=imgs, timestamps=timestamps):
+            img = next(imgs)
+            img.camera_image_container.created_at = next(timestamps)
+            video_output.write_image(img)
+
+        def close(video_output=video_output, directory=directory):
+            video_output.close()
+            directory.cleanup()
+
+        yield Case(
+            "video_write_image",
+            {"resolution": resolution},
+            write_image,
+            teardown=close,
+        )
+
+
+def multiplex(producers: int, frames_count: int):
+    multiplexer = CameraFeedMultiplexer()
+    raw_image_np = np.zeros((90, 160, 3), dtype=np.uint8)
+    stop = threading.Event()
+
+    def produce(img: CameraImageContainer):
+        while not stop.is_set():
+            try:
+                multiplexer.put_nowait(img)
+            except CameraFeedMultiplexer.Full:
+                multiplexer.wait_taken(img.camera_name, timeout=0.01)
+
+    threads = [
+        threading.Thread(
+            target=produce,
+            args=(CameraImageContainer.create(f"cam{index}", raw_image_np, []),),
+        )
+        for index in range(producers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for _ in range(frames_count):
+            multiplexer.get(timeout=1)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def multiplexer_cases(resolutions: List[str]) -> Iterator[Case]:
+    frames_count = 500
+    for producers in [1, 4, 16]:
+        yield Case(
+            "multiplexer",
+            {"producers": producers},
+            partial(multiplex, producers, frames_count),
+            items=frames_count,
+        )
+
+
+def model_files_present(model: BaseDetectionModel) -> bool:
+    if isinstance(model, OpenCVTensorflowDetectionModel):
+        return os.path.exists(
+            os.path.join(MODEL_DIR, model.model_name(), "frozen_inference_graph.pb")
+        )
+
+    if isinstance(model, OnnxDetectionModel):
+        return importlib.util.find_spec("onnxruntime") is not None and os.path.exists(
+            model.model_path()
+        )
+
+    # Other models are downloaded on load, only benchmarked when cached
+    try:
+        import torch
+    except ImportError:
+        return False
+    return os.path.isdir(os.path.join(torch.hub.get_dir(), "ultralytics_yolov5_master"))
+
+
+def model_cases(resolutions: List[str]) -> Iterator[Case]:
+    for model_name in MODEL_MAP:
+        model = get_model_class(model_name)()
+        if not model_files_present(model):
+            print(f"Skipping {model_name.value}, model files not found")
+            continue
+        model.load()
+
+        for resolution in resolutions:
+            frame = load_image(OBJECT_IMAGE_PATH, RESOLUTIONS[resolution])
+            img = CameraImageContainer.create(
+                "benchmark", frame, get_split_image_dimensions(frame)
+            )
+            yield Case(
+                "model_detect",
+                {"model": model_name.value, "resolution": resolution},
+                partial(model.detect, img),
+            )
+            # Frames of several cameras batched into one forward pass
+            imgs = [img] * MODEL_BATCH_SIZE
+            yield Case(
+                "model_detect_batch",
+                {
+                    "model": model_name.value,
+                    "resolution": resolution,
+                    "batch": MODEL_BATCH_SIZE,
+                },
+                partial(model.detect_batch, imgs),
+                items=MODEL_BATCH_SIZE,
+            )
+
+
+SUITE: Dict[str, Callable[[List[str]], Iterator[Case]]] = {
+    "motion": motion_cases,
+    "merge": merge_cases,
+    "image_create": image_create_cases,
+    "visualizer": visualizer_cases,
+    "video_output": video_output_cases,
+    "multiplexer": multiplexer_cases,
+    "model": model_cases,
+}
+
+
+def measure(case: Case, min_time: float, max_runs: int = 10000) -> Dict[str, Any]:
+    case.run()
+
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < 3 or (
+        time.perf_counter() < deadline and len(samples) < max_runs
+    ):
+        t = time.perf_counter()
+        case.run()
+        samples.append(time.perf_counter() - t)
+
+    median = statistics.median(samples)
+    return {
+        "key": case.key,
+        "benchmark": case.benchmark,
+        "params": case.params,
+        "runs": len(samples),
+        "median_us": median * 1e6,
+        "mean_us": statistics.mean(samples) * 1e6,
+        "min_us": min(samples) * 1e6,
+        "items_per_second": case.items / median if median > 0 else None,
+    }
+
+
+def run_suite(
+    benchmarks: List[str], resolutions: List[str], min_time: float
+) -> List[Dict[str, Any]]:
+    results = []
+    for name in benchmarks:
+        for case in SUITE[name](resolutions):
+            try:
+                result = measure(case, min_time)
+            finally:
+                if case.teardown is not None:
+                    case.teardown()
+
+            results.append(result)
+            print(f"{result['key']}: {result['median_us']:.1f} us")
+    return results
+
+
+def compare_results(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float
+) -> List[Tuple[str, float, float]]:
+    # Cases slower than the baseline median by more than the tolerance
+    baseline_medians = {result["key"]: result["median_us"] for result in baseline}
+    return [
+        (result["key"], baseline_medians[result["key"]], result["median_us"])
+        for result in results
+        if result["key"] in baseline_medians
+        and result["median_us"] > baseline_medians[result["key"]] * (1 + tolerance)
+    ]
+
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--benchmarks", nargs="+", choices=SUITE.keys())
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        choices=RESOLUTIONS.keys(),
+        default=list(RESOLUTIONS),
+    )
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run_suite(
+        args.benchmarks if args.benchmarks else list(SUITE),
+        args.resolutions,
+        args.min_time,
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare_results(results, baseline["results"], args.tolerance)
+        for key, baseline_us, median_us in regressions:
+            print(
+                f"Regression {key}: {baseline_us:.1f} us -> {median_us:.1f} us "
+                f"({median_us / baseline_us:.2f}x)"
+            )
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
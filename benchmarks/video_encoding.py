@@ -0,0 +1,81 @@
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict
+
+from smart_nvr.app_config import RecordingProfileConfig, VideoCodecEnum
+from smart_nvr.camera.image import CameraImageContainer, DetectionCameraImageContainer
+from smart_nvr.video.video_output import VideoOutput, get_encoder_name
+
+from .frames import RESOLUTIONS, synthetic_frames
+
+FRAME_RATE = 25
+
+PROFILES: Dict[str, RecordingProfileConfig] = {
+    "mpeg4 default": RecordingProfileConfig(),
+    "mpeg4 4 Mbit": RecordingProfileConfig(bit_rate=4_000_000),
+    "h264 ultrafast crf 28": RecordingProfileConfig(
+        codec=VideoCodecEnum.h264, preset="ultrafast", crf=28
+    ),
+    "h264 veryfast crf 26": RecordingProfileConfig(
+        codec=VideoCodecEnum.h264, preset="veryfast", crf=26
+    ),
+    "h264 veryfast crf 26 1 thread": RecordingProfileConfig(
+        codec=VideoCodecEnum.h264, preset="veryfast", crf=26, thread_count=1
+    ),
+    "h264 veryfast crf 26 half size": RecordingProfileConfig(
+        codec=VideoCodecEnum.h264, preset="veryfast", crf=26, scale=0.5
+    ),
+    "hevc ultrafast crf 30": RecordingProfileConfig(
+        codec=VideoCodecEnum.hevc, preset="ultrafast", crf=30
+    ),
+}
+
+
+def run(
+    file_path: str, resolution: str, frames_count: int, profile: RecordingProfileConfig
+) -> str:
+    height, width = RESOLUTIONS[resolution]
+    imgs = [
+        DetectionCameraImageContainer(
+            CameraImageContainer.create(
+                "benchmark", frame, [], created_at=index * 1000 // FRAME_RATE
+            ),
+            [],
+        )
+        for index, frame in enumerate(
+            synthetic_frames((height, width), frames_count, step=4)
+        )
+    ]
+
+    t = time.perf_counter()
+    video_output = VideoOutput(file_path, width, height, profile)
+    for img in imgs:
+        video_output.write_image(img)
+    video_output.close()
+    elapsed = time.perf_counter() - t
+
+    bytes_per_second = os.path.getsize(file_path) * FRAME_RATE / frames_count
+    return (
+        f"{get_encoder_name(profile.codec)}, {frames_count / elapsed:.1f} fps, "
+        f"{bytes_per_second / 1024:.0f} KiB/s of video"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolution", choices=RESOLUTIONS.keys(), default="1080p")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES.keys())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.profiles if args.profiles else PROFILES.keys():
+            file_path = os.path.join(directory, "sample.mp4")
+            result = run(file_path, args.resolution, args.frames, PROFILES[name])
+            print(f"{args.resolution} {name}: {result}")
+
+
+if __name__ == "__main__":
+    main()
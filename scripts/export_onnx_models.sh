@@ -0,0 +1,50 @@
+#!/bin/bash -e
+
+# Exports YOLOv5 to ONNX with a dynamic batch axis and quantizes the weights
+# to int8, needs torch and onnxruntime installed
+
+SCRIPT_RELATIVE_DIR=$(dirname "${0}")
+ROOT_DIR=$(cd "${SCRIPT_RELATIVE_DIR}/.."; pwd -P)
+
+MODELS="yolov5s"
+YOLOV5_VERSION="v6.0"
+MODEL_DIR="${ROOT_DIR}/data/models"
+
+mkdir -p "${MODEL_DIR}"
+
+yolov5_tmpdir="$(mktemp -d)"
+echo -n "Cloning YOLOv5 ${YOLOV5_VERSION} ... "
+git clone -q --depth 1 --branch "${YOLOV5_VERSION}" https://github.com/ultralytics/yolov5 "${yolov5_tmpdir}"
+echo "done"
+
+pip3 install -q -r "${yolov5_tmpdir}/requirements.txt" onnx onnx-simplifier
+
+for model in ${MODELS}; do
+    model_path="${MODEL_DIR}/${model}.onnx"
+    quantized_model_path="${MODEL_DIR}/${model}.int8.onnx"
+
+    if test -f "${model_path}"; then
+        echo "Model ${model} already exists"
+    else
+        pushd "${yolov5_tmpdir}"
+        python3 export.py --weights "${model}.pt" --include onnx --dynamic --simplify
+        cp -v "${model}.onnx" "${model_path}"
+        popd
+    fi
+
+    if test -f "${quantized_model_path}"; then
+        echo "Model ${model}.int8 already exists"
+        continue
+    fi
+
+    # Dynamic quantization needs no calibration images, activations are
+    # quantized at runtime
+    echo -n "Quantizing model ${model} ... "
+    python3 -c "
+from onnxruntime.quantization import QuantType, quantize_dynamic
+quantize_dynamic('${model_path}', '${quantized_model_path}', weight_type=QuantType.QUInt8)
+"
+    echo "done"
+done
+
+rm -rf "${yolov5_tmpdir}"
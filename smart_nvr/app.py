@@ -1,56 +1,218 @@
 import logging
 import os
 import signal
-from typing import List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
-import cv2
-
-from smart_nvr.app_config import ApplicationConfig
+from smart_nvr.app_config import (
+    ApplicationConfig,
+    CameraFeedModeEnum,
+    RecordingModeEnum,
+    ReplayPaceEnum,
+)
 from smart_nvr.camera.feed_multiplexer import CameraFeedMultiplexer
-from smart_nvr.camera.image import CameraImageContainer, get_split_image_dimensions
+from smart_nvr.camera.motion_detection.hikvision import HikvisionMotionDetection
+from smart_nvr.detection.autotune import tune_model
 from smart_nvr.detection.base_model import BaseDetectionModel
-from smart_nvr.detection.model_map import MODEL_MAP
+from smart_nvr.detection.model_map import get_model_class
+from smart_nvr.detection.tracking import TrackingDetectionModel
+from smart_nvr.detection.warmup import warmup_model
+from smart_nvr.tracing.profiler import PROFILER
+from smart_nvr.tracing.trace import TRACER
+from smart_nvr.utils.startup import StartupReport
+from smart_nvr.utils.timing import SimulatedClock, set_clock
+from smart_nvr.video.packet_buffer import PacketRingBuffer
 from smart_nvr.workers.base_worker import BaseWorker
 from smart_nvr.workers.camera_feed_worker import CameraFeedWorker
+from smart_nvr.workers.camera_process_worker import CameraFeedProcessWorker
 from smart_nvr.workers.detection_worker import DetectionWorker
+from smart_nvr.workers.event_loop_worker import EventLoopWorker
+from smart_nvr.workers.metrics_worker import MetricsWorker
 from smart_nvr.workers.minio_worker import MinioWorker
+from smart_nvr.workers.replay_feed_worker import ReplayFeedWorker
 from smart_nvr.workers.video_worker import VideoWorker
 from smart_nvr.workers.visualize_worker import VisualizeWorker
 
 logger = logging.getLogger(__name__)
 
 
-def warmup_model(model: BaseDetectionModel):
-    img_raw = cv2.imread("data/images/cat.jpeg")
-    img = CameraImageContainer.create(
-        "warmup", img_raw, get_split_image_dimensions(img_raw)
-    )
-    detections = model.detect(img)
-    assert "cat" in {d.name for d in detections}
+def prepare_model(
+    config: ApplicationConfig, startup: StartupReport
+) -> Tuple[BaseDetectionModel, int]:
+    # Only the configured backend and its libraries are imported
+    with startup.phase("model_import"):
+        model = get_model_class(config.model.name)()
+    model.configure(config.model)
+
+    with startup.phase("model_load"):
+        model.load()
+    with startup.phase("model_warmup"):
+        warmup_model(model, config.model)
+    # Allowlist is applied after warmup, which looks for a cat
+    model.set_label_allowlist(config.model.labels)
+
+    batch_size = config.model.batch_size
+    if config.model.autotune.enabled:
+        with startup.phase("model_autotune"):
+            batch_size = tune_model(
+                model, config.model.name.value, config.model.autotune
+            ).batch_size
+    if config.model.tracking.enabled:
+        model = TrackingDetectionModel(model, config.model.tracking)
+
+    return model, batch_size
+
+
+def report_startup(
+    startup: StartupReport,
+    motion_detections: Dict[str, HikvisionMotionDetection],
+    timeout_seconds: float,
+):
+    deadline = time.monotonic() + timeout_seconds
+    for camera_name, motion_detection in motion_detections.items():
+        connected = motion_detection.connected.wait(
+            max(0.0, deadline - time.monotonic())
+        )
+        if connected and motion_detection.connect_seconds is not None:
+            startup.record(
+                f"camera_connect[{camera_name}]", motion_detection.connect_seconds
+            )
+        else:
+            logger.warning(
+                f"Motion events of {camera_name} not connected "
+                f"after {timeout_seconds} s, still retrying"
+            )
+
+    startup.log()
+
+
+def stop_workers(workers: List[BaseWorker]):
+    # Uploads stop last, so clips closed while the others shut down are spooled
+    upload_workers: List[BaseWorker] = [
+        worker for worker in workers if isinstance(worker, MinioWorker)
+    ]
+    other_workers = [worker for worker in workers if worker not in upload_workers]
+
+    for stage in [other_workers, upload_workers]:
+        for worker in stage:
+            worker.stop()
+        for worker in stage:
+            worker.join()
 
 
 def run():
-    config = ApplicationConfig.load_from_file("/config/app.yaml")
+    startup = StartupReport()
+    with startup.phase("config"):
+        config = ApplicationConfig.load_from_file("/config/app.yaml")
     logger.info(config)
 
-    model_cls = MODEL_MAP[config.model.name]
-    model = model_cls()
-    model.load()
-    warmup_model(model)
+    TRACER.configure(config.tracing)
+    PROFILER.configure(config.profiling)
+    if config.profiling.enabled:
+        signal.signal(signal.SIGUSR1, lambda signum, frame: PROFILER.toggle())
+
+    # Fast replay runs every timer of the pipeline on the replayed time
+    replay_clock: Optional[SimulatedClock] = None
+    if config.replay.pace == ReplayPaceEnum.fast and len(config.replay.feeds) > 0:
+        replay_clock = SimulatedClock(max_skew_millis=config.replay.max_skew_millis)
+        set_clock(replay_clock)
+
+    # Model loads and warms up while the cameras connect
+    model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ModelLoader")
+    model_future = model_executor.submit(prepare_model, config, startup)
+    model_executor.shutdown(wait=False)
 
     workers: List[BaseWorker] = []
 
-    camera_feed_multiplexer = CameraFeedMultiplexer()
+    camera_feed_multiplexer = CameraFeedMultiplexer(
+        max_frame_age_millis=config.scheduler.max_frame_age_millis,
+        recording_weight=config.scheduler.recording_weight,
+    )
+    for camera_name, camera_config in config.camera_feeds.items():
+        camera_feed_multiplexer.set_weight(camera_name, camera_config.priority)
+    for camera_name, replay_config in config.replay.feeds.items():
+        camera_feed_multiplexer.set_weight(camera_name, replay_config.priority)
 
-    camera_workers = [
-        CameraFeedWorker(camera_name, camera_feed_multiplexer, camera_config)
+    # Packets can't be shared with camera processes, so passthrough recording
+    # only works with camera feeds running as threads
+    packet_buffers: Dict[str, PacketRingBuffer] = {}
+
+    # One thread follows the motion events of every camera
+    motion_events_worker = EventLoopWorker(name="MotionEventsWorker")
+    motion_detections = {
+        camera_name: HikvisionMotionDetection(
+            camera_config.motion, motion_events_worker
+        )
         for camera_name, camera_config in config.camera_feeds.items()
-    ]
+    }
+
+    camera_workers: List[BaseWorker]
+    if config.camera_feed_mode == CameraFeedModeEnum.process:
+        camera_workers = [
+            CameraFeedProcessWorker(
+                camera_name,
+                camera_feed_multiplexer,
+                camera_config,
+                motion_detections[camera_name],
+                config.shared_memory,
+            )
+            for camera_name, camera_config in config.camera_feeds.items()
+        ]
+    else:
+        packet_buffers = {
+            camera_name: PacketRingBuffer(camera_config.recording.pre_roll_seconds)
+            for camera_name, camera_config in config.camera_feeds.items()
+            if camera_config.recording.mode == RecordingModeEnum.passthrough
+        }
+        camera_workers = [
+            CameraFeedWorker(
+                camera_name,
+                camera_feed_multiplexer,
+                camera_config,
+                motion_detections[camera_name],
+                packet_buffers.get(camera_name),
+            )
+            for camera_name, camera_config in config.camera_feeds.items()
+        ]
     workers.extend(camera_workers)
+    workers.append(motion_events_worker)
+
+    # Cameras connect in the background, frames read before detection runs
+    # go stale in the multiplexer
+    with startup.phase("camera_workers"):
+        motion_events_worker.start()
+        for worker in camera_workers:
+            worker.start()
+
+    try:
+        with startup.phase("model_wait"):
+            model, batch_size = model_future.result()
+    except BaseException:
+        for worker in [*camera_workers, motion_events_worker]:
+            worker.stop()
+        for worker in [*camera_workers, motion_events_worker]:
+            worker.join()
+        raise
+
+    replay_workers = [
+        ReplayFeedWorker(
+            camera_name, camera_feed_multiplexer, replay_config, replay_clock
+        )
+        for camera_name, replay_config in config.replay.feeds.items()
+    ]
+    workers.extend(replay_workers)
 
     detection_worker = DetectionWorker(
         model=model,
         image_queue=camera_feed_multiplexer,
+        batch_size=batch_size,
+        batch_max_wait_millis=config.model.batch_max_wait_millis,
+        detection_names=config.model.labels,
+        box_merging=config.model.box_merging,
+        nms_iou_threshold=config.model.nms_iou_threshold,
+        model_name=config.model.name.value,
     )
     # Run detection worker in main thread
 
@@ -62,16 +224,32 @@ def run():
     video_worker = VideoWorker(
         output_directory="output",
         detection_queue=visualizer_worker.output_queue,
+        recording_configs={
+            camera_name: camera_config.recording
+            for camera_name, camera_config in [
+                *config.camera_feeds.items(),
+                *config.replay.feeds.items(),
+            ]
+        },
+        packet_buffers=packet_buffers,
+        recording_callback=camera_feed_multiplexer.set_recording,
     )
     workers.append(video_worker)
 
     minio_worker = MinioWorker(
-        config=config.minio, file_queue=video_worker.file_path_queue
+        config=config.minio,
+        file_queue=video_worker.file_path_queue,
+        upload_config=config.upload,
     )
     workers.append(minio_worker)
 
-    for worker in workers:
-        worker.start()
+    if config.metrics.enabled:
+        workers.append(MetricsWorker(config.metrics.host, config.metrics.port))
+
+    with startup.phase("workers"):
+        for worker in workers:
+            if worker not in camera_workers and worker is not motion_events_worker:
+                worker.start()
 
     def stop_detection_worker(signum, frame):
         detection_worker.stop()
@@ -79,14 +257,47 @@ def run():
     signal.signal(signal.SIGINT, stop_detection_worker)
     signal.signal(signal.SIGTERM, stop_detection_worker)
 
+    replay_started_at = time.monotonic()
+
+    def stop_when_replay_finished():
+        for worker in replay_workers:
+            worker.finished.wait()
+
+        elapsed = time.monotonic() - replay_started_at
+        frames_count = sum(worker.forwarded_count for worker in replay_workers)
+        logger.info(
+            f"Replayed {frames_count} frames in {elapsed:.1f} s "
+            f"({frames_count / elapsed:.1f} fps)"
+        )
+        detection_worker.stop()
+
+    if (
+        len(replay_workers) > 0
+        and len(config.camera_feeds) == 0
+        and config.replay.exit_when_finished
+    ):
+        threading.Thread(
+            target=stop_when_replay_finished, name="ReplayWatcher", daemon=True
+        ).start()
+
+    startup.record("ready", startup.elapsed())
+    threading.Thread(
+        target=report_startup,
+        args=(
+            startup,
+            motion_detections,
+            config.startup.camera_connect_timeout_seconds,
+        ),
+        name="StartupReporter",
+        daemon=True,
+    ).start()
+
     # RUN
     detection_worker.run()
 
-    for worker in workers:
-        worker.stop()
+    stop_workers(workers)
 
-    for worker in workers:
-        worker.join()
+    TRACER.close()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Extra, Field
+from pydantic import BaseModel, Extra, Field, validator
 from typing_extensions import Literal
 from yaml import safe_load
 
@@ -23,9 +23,133 @@ class HikvisionMotionConfig(BaseModel, extra=Extra.ignore):
     port: int
     auth: Optional[AuthConfig]
     ssl: bool = Field(default=False)
+    # Motion has to last this long before the camera is read
+    on_delay_seconds: float = Field(default=0.0)
+    # Camera is read until motion has been gone this long
+    off_delay_seconds: float = Field(default=2.0)
+    # Reading starts or stops at most once in this time, so a chattering
+    # sensor doesn't keep reopening the camera stream
+    min_hold_seconds: float = Field(default=5.0)
 
 
-class CameraFeedConfig(BaseModel, extra=Extra.ignore):
+class MotionBackendEnum(str, Enum):
+    frame_difference = "frame_difference"
+    running_average = "running_average"
+    mog2 = "mog2"
+    knn = "knn"
+
+
+class MotionDetectionConfig(BaseModel, extra=Extra.ignore):
+    backend: MotionBackendEnum = Field(default=MotionBackendEnum.frame_difference)
+    # Motion is detected on a grayscale copy downscaled by this factor
+    scale: float = Field(default=0.5, gt=0, le=1)
+    # Background model update rate, backend default when not set
+    learning_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    # Frames remembered by mog2 and knn backends
+    history: int = Field(default=500, ge=1)
+
+
+class CaptureBackendEnum(str, Enum):
+    opencv = "opencv"
+    pyav = "pyav"
+
+
+class DecodeModeEnum(str, Enum):
+    all = "all"
+    keyframes = "keyframes"
+
+
+class CaptureConfig(BaseModel, extra=Extra.ignore):
+    backend: CaptureBackendEnum = Field(default=CaptureBackendEnum.opencv)
+    # Decoding only keyframes needs the pyav backend
+    decode: DecodeModeEnum = Field(default=DecodeModeEnum.all)
+    # Analyse only every Nth grabbed frame
+    frame_step: int = Field(default=1, ge=1)
+    # Upper limit of analysed frames per second
+    target_fps: Optional[float] = Field(default=None, gt=0)
+    # FFmpeg decoder threads of the pyav backend, 0 picks automatically
+    decoder_threads: int = Field(default=0, ge=0)
+    rtsp_transport: Literal["tcp", "udp"] = Field(default="tcp")
+    # Keeps the stream connected without motion, packets are demuxed but only
+    # decoded from the last keyframe once motion starts, needs the pyav backend
+    standby: bool = Field(default=False)
+
+    @validator("standby")
+    def validate_standby(cls, value: bool, values: Dict[str, Any]):
+        if value and values.get("backend") != CaptureBackendEnum.pyav:
+            raise ValueError("Standby requires pyav capture backend")
+        return value
+
+
+class RecordingModeEnum(str, Enum):
+    transcode = "transcode"
+    passthrough = "passthrough"
+
+
+class VideoCodecEnum(str, Enum):
+    mpeg4 = "mpeg4"
+    h264 = "h264"
+    hevc = "hevc"
+
+
+class RecordingProfileConfig(BaseModel, extra=Extra.ignore):
+    # Falls back to mpeg4 when FFmpeg was built without an encoder for the codec
+    codec: VideoCodecEnum = Field(default=VideoCodecEnum.mpeg4)
+    # Encoder speed preset, e.g. ultrafast or veryfast, used by x264 and x265
+    preset: Optional[str] = Field(default=None)
+    # Constant quality of x264 and x265, lower is better
+    crf: Optional[int] = Field(default=None, ge=0, le=51)
+    # Target bits per second when crf is not set
+    bit_rate: Optional[int] = Field(default=None, gt=0)
+    # Encoder threads, 0 picks automatically
+    thread_count: int = Field(default=0, ge=0)
+    thread_type: Optional[Literal["AUTO", "FRAME", "SLICE"]] = Field(default=None)
+    # Output resolution relative to the camera frames
+    scale: float = Field(default=1, gt=0, le=1)
+    # Frames between keyframes, encoder default when not set
+    gop_size: Optional[int] = Field(default=None, ge=1)
+    pix_fmt: str = Field(default="yuv420p")
+    # Nominal rate for the encoder rate control, frames keep their capture time
+    frame_rate: int = Field(default=25, ge=1)
+
+
+class RecordingConfig(BaseModel, extra=Extra.ignore):
+    # Passthrough remuxes camera packets without re-encoding, needs pyav capture
+    mode: RecordingModeEnum = Field(default=RecordingModeEnum.transcode)
+    # Seconds of packets kept before the clip is opened
+    pre_roll_seconds: float = Field(default=5, ge=0)
+    # Clips are split into segments of about this length, uploaded while recording
+    segment_seconds: Optional[float] = Field(default=None, gt=0)
+    # Encoder settings of the transcode mode
+    profile: RecordingProfileConfig = Field(default_factory=RecordingProfileConfig)
+
+
+class BaseCameraFeedConfig(BaseModel, extra=Extra.ignore):
+    motion_detection: MotionDetectionConfig = Field(
+        default_factory=MotionDetectionConfig
+    )
+    capture: CaptureConfig = Field(default_factory=CaptureConfig)
+    recording: RecordingConfig = Field(default_factory=RecordingConfig)
+    # Share of detection turns relative to other cameras under load
+    priority: float = Field(default=1, gt=0)
+
+    @validator("recording")
+    def validate_recording(cls, value: RecordingConfig, values: Dict[str, Any]):
+        capture = values.get("capture")
+        if (
+            value.mode == RecordingModeEnum.passthrough
+            and capture is not None
+            and capture.backend != CaptureBackendEnum.pyav
+        ):
+            raise ValueError("Passthrough recording requires pyav capture backend")
+        return value
+
+    @property
+    def source_url(self) -> str:
+        raise NotImplementedError()
+
+
+class CameraFeedConfig(BaseCameraFeedConfig):
     host: str
     port: int = Field(default=554)
     auth: Optional[AuthConfig]
@@ -33,6 +157,10 @@ class CameraFeedConfig(BaseModel, extra=Extra.ignore):
 
     motion: HikvisionMotionConfig
 
+    @property
+    def source_url(self) -> str:
+        return self.rtsp_url
+
     @property
     def rtsp_url(self) -> str:
         auth = (
@@ -43,15 +171,142 @@ class CameraFeedConfig(BaseModel, extra=Extra.ignore):
         return f"rtsp://{auth}{self.host}:{self.port}{self.path}"
 
 
+class MotionTriggerEnum(str, Enum):
+    always = "always"
+    # Motion repeats on a fixed schedule of replayed time
+    schedule = "schedule"
+    # Motion follows the pixel motion detector of the feed
+    pixel = "pixel"
+
+
+class MotionTriggerConfig(BaseModel, extra=Extra.ignore):
+    type: MotionTriggerEnum = Field(default=MotionTriggerEnum.always)
+    on_seconds: float = Field(default=20, gt=0)
+    off_seconds: float = Field(default=10, ge=0)
+    # Pixel motion ends after this long without moving pixels
+    hold_seconds: float = Field(default=5, ge=0)
+
+
+class ReplayFeedConfig(BaseCameraFeedConfig):
+    # Video file, directory of images or glob pattern of images
+    path: str
+    # Frame rate of image sequences and of videos not reporting one
+    frame_rate: float = Field(default=25, gt=0)
+    loop: bool = Field(default=False)
+    # Stands in for the camera motion events
+    trigger: MotionTriggerConfig = Field(default_factory=MotionTriggerConfig)
+
+    @validator("recording")
+    def validate_replay_recording(cls, value: RecordingConfig):
+        if value.mode == RecordingModeEnum.passthrough:
+            raise ValueError("Replayed feeds only support encode recording")
+        return value
+
+    @property
+    def source_url(self) -> str:
+        return self.path
+
+
+class ReplayPaceEnum(str, Enum):
+    realtime = "realtime"
+    # Frames are read as fast as the pipeline takes them, on a simulated clock
+    fast = "fast"
+
+
+class ReplayConfig(BaseModel, extra=Extra.ignore):
+    pace: ReplayPaceEnum = Field(default=ReplayPaceEnum.realtime)
+    feeds: Dict[str, ReplayFeedConfig] = Field(default_factory=dict)
+    # Fast replay keeps feeds within this much simulated time of each other
+    max_skew_millis: int = Field(default=1000, ge=0)
+    # Application stops once every replayed feed has ended
+    exit_when_finished: bool = Field(default=True)
+
+
+class CameraFeedModeEnum(str, Enum):
+    thread = "thread"
+    process = "process"
+
+
+class SharedMemoryConfig(BaseModel, extra=Extra.ignore):
+    # Frame slots in the ring buffer of each camera
+    slots: int = Field(default=8, ge=3)
+    max_frame_width: int = Field(default=1920)
+    max_frame_height: int = Field(default=1080)
+
+    @property
+    def slot_size(self) -> int:
+        return self.max_frame_width * self.max_frame_height * 3
+
+
 class ModelNameEnum(str, Enum):
     yolo_v5_s = "yolo_v5_s"
     tf_ssd_mobilenet_v2 = "tf_ssd_mobilenet_v2"
     tf_ssdlite_mobilenet_v2 = "tf_ssdlite_mobilenet_v2"
+    # Local ONNX exports run by ONNX Runtime on CPU
+    yolo_v5_s_onnx = "yolo_v5_s_onnx"
+    yolo_v5_s_onnx_int8 = "yolo_v5_s_onnx_int8"
+
+
+class TrackingConfig(BaseModel, extra=Extra.ignore):
+    enabled: bool = Field(default=False)
+    # Full inference at least every Nth frame of a camera
+    detect_interval: int = Field(default=5, ge=1)
+    # Boxes are only predicted this long after the last inference
+    max_prediction_millis: int = Field(default=1000, ge=0)
+    # Inference also runs when less of the motion is covered by predicted boxes
+    motion_coverage: float = Field(default=0.5, ge=0, le=1)
+    iou_threshold: float = Field(default=0.3, gt=0, le=1)
+    # Inference passes a track may go unmatched before it's dropped
+    max_misses: int = Field(default=2, ge=0)
+
+
+class OnnxRuntimeConfig(BaseModel, extra=Extra.ignore):
+    # Threads used within one operator, 0 picks automatically
+    intra_op_threads: int = Field(default=0, ge=0)
+    # Threads running independent operators in parallel, 0 runs them in order
+    inter_op_threads: int = Field(default=0, ge=0)
+
+
+class AutotuneConfig(BaseModel, extra=Extra.ignore):
+    enabled: bool = Field(default=False)
+    # Tuned settings are cached per host and model, later startups skip tuning
+    cache_path: str = Field(default="output/autotune.json")
+    images_directory: str = Field(default="data/images")
+    # Slowest acceptable forward pass of one batch
+    latency_budget_millis: float = Field(default=250, gt=0)
+    # OpenCV threads, empty tries powers of two up to the CPU count
+    threads: List[int] = Field(default_factory=list)
+    batch_sizes: List[int] = Field(default=[1, 2, 4])
+    # Square input sizes, empty keeps the input size of the model
+    image_sizes: List[int] = Field(default_factory=list)
+    # Timed passes of every candidate after one untimed pass
+    runs: int = Field(default=5, ge=1)
+
+
+class BoxMergingEnum(str, Enum):
+    # Overlapping boxes of a class are replaced by their outer box
+    merge = "merge"
+    # Only the most confident of overlapping boxes of a class is kept
+    nms = "nms"
 
 
 class ModelConfig(BaseModel, extra=Extra.ignore):
     name: ModelNameEnum
 
+    # Max number of crops sent to the model in one forward pass
+    batch_size: int = Field(default=1, ge=1)
+    # How long to wait for other cameras to fill the batch
+    batch_max_wait_millis: int = Field(default=20, ge=0)
+    # Detections of other labels are dropped while decoding model output
+    labels: List[str] = Field(default=["person", "car", "cat"])
+    tracking: TrackingConfig = Field(default_factory=TrackingConfig)
+    box_merging: BoxMergingEnum = Field(default=BoxMergingEnum.merge)
+    nms_iou_threshold: float = Field(default=0.5, gt=0, le=1)
+    onnx: OnnxRuntimeConfig = Field(default_factory=OnnxRuntimeConfig)
+    # Models that passed warmup on this host skip it on later startups
+    warmup_cache_path: str = Field(default="output/warmup.json")
+    autotune: AutotuneConfig = Field(default_factory=AutotuneConfig)
+
 
 class MinioConfig(BaseModel, extra=Extra.ignore):
     host: str
@@ -63,10 +318,81 @@ class MinioConfig(BaseModel, extra=Extra.ignore):
     bucket: str
 
 
+class UploadConfig(BaseModel, extra=Extra.ignore):
+    # Pending uploads are journaled here and replayed after a restart
+    spool_directory: str = Field(default="output/.spool")
+    # Oldest files are evicted when pending files exceed this size
+    max_spool_bytes: int = Field(default=10 * 1024**3, gt=0)
+    workers: int = Field(default=2, ge=1)
+    # Multipart upload settings, MinIO requires parts of at least 5 MiB
+    part_size: int = Field(default=16 * 1024**2, ge=5 * 1024**2)
+    parallel_parts: int = Field(default=3, ge=1)
+    retry_initial_seconds: float = Field(default=1, gt=0)
+    retry_max_seconds: float = Field(default=300, gt=0)
+
+
+class SchedulerConfig(BaseModel, extra=Extra.ignore):
+    # Frames waiting longer for detection are dropped
+    max_frame_age_millis: Optional[int] = Field(default=2000, gt=0)
+    # Priority multiplier of cameras with an open recording
+    recording_weight: float = Field(default=2, gt=0)
+
+
+class MetricsConfig(BaseModel, extra=Extra.ignore):
+    # Prometheus text format is served on /metrics
+    enabled: bool = Field(default=False)
+    # Only local scrapers by default, 0.0.0.0 exposes it on every interface
+    host: str = Field(default="127.0.0.1")
+    port: int = Field(default=9108, ge=0, le=65535)
+
+
+class TracingConfig(BaseModel, extra=Extra.ignore):
+    # Spans of sampled frames are written as Chrome trace JSON, viewable in
+    # Perfetto or chrome://tracing
+    enabled: bool = Field(default=False)
+    sample_interval: int = Field(default=25, ge=1)
+    output_path: str = Field(default="output/trace.json")
+    # Tracing stops once the file holds this many events
+    max_events: int = Field(default=1_000_000, ge=1)
+
+
+class ProfilingConfig(BaseModel, extra=Extra.ignore):
+    # SIGUSR1 starts and stops cProfile of the workers
+    enabled: bool = Field(default=False)
+    # Worker name prefixes, all workers when empty
+    workers: List[str] = Field(default_factory=list)
+    output_directory: str = Field(default="output/profiles")
+
+
+class StartupConfig(BaseModel, extra=Extra.ignore):
+    # Time the startup report waits for motion clients, slower cameras keep
+    # connecting in the background
+    camera_connect_timeout_seconds: float = Field(default=10.0)
+
+
 class ApplicationConfig(BaseModel, extra=Extra.ignore):
     camera_feeds: Dict[str, CameraFeedConfig] = Field(default_factory=dict)
+    camera_feed_mode: CameraFeedModeEnum = Field(default=CameraFeedModeEnum.thread)
+    shared_memory: SharedMemoryConfig = Field(default_factory=SharedMemoryConfig)
+    scheduler: SchedulerConfig = Field(default_factory=SchedulerConfig)
     model: ModelConfig
     minio: MinioConfig
+    upload: UploadConfig = Field(default_factory=UploadConfig)
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+    tracing: TracingConfig = Field(default_factory=TracingConfig)
+    profiling: ProfilingConfig = Field(default_factory=ProfilingConfig)
+    replay: ReplayConfig = Field(default_factory=ReplayConfig)
+    startup: StartupConfig = Field(default_factory=StartupConfig)
+
+    @validator("replay")
+    def validate_replay(cls, value: ReplayConfig, values: Dict[str, Any]):
+        if (
+            value.pace == ReplayPaceEnum.fast
+            and len(value.feeds) > 0
+            and len(values.get("camera_feeds", {})) > 0
+        ):
+            raise ValueError("Fast replay can't run alongside live camera feeds")
+        return value
 
     @classmethod
     def load_from_file(cls, file_path: Optional[str] = None) -> "ApplicationConfig":
@@ -0,0 +1,212 @@
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+import cv2
+import numpy as np
+
+from ..app_config import CaptureBackendEnum, CaptureConfig, DecodeModeEnum
+from ..video.packet_buffer import PacketRingBuffer
+
+logger = logging.getLogger(__name__)
+
+# Longest group of pictures kept in standby, longer ones wait for a keyframe
+MAX_STANDBY_PACKETS = 600
+
+
+class BaseCapture:
+    def __init__(
+        self,
+        url: str,
+        config: CaptureConfig,
+        packet_buffer: Optional[PacketRingBuffer] = None,
+    ):
+        pass
+
+    def grab(self) -> bool:
+        raise NotImplementedError()
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        raise NotImplementedError()
+
+    def standby(self) -> bool:
+        # Reads the stream without decoding while no frames are needed
+        raise NotImplementedError()
+
+    def timestamp_millis(self) -> Optional[int]:
+        # Capture time of the grabbed frame, live captures use the current time
+        return None
+
+    def frame_shape(self) -> Tuple[int, int, int]:
+        raise NotImplementedError()
+
+    def release(self):
+        raise NotImplementedError()
+
+
+class OpenCVCapture(BaseCapture):
+    def __init__(
+        self,
+        url: str,
+        config: CaptureConfig,
+        packet_buffer: Optional[PacketRingBuffer] = None,
+    ):
+        if packet_buffer is not None:
+            logger.warning("OpenCV capture does not provide packets for buffering")
+
+        self._cap = cv2.VideoCapture(url)
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def grab(self) -> bool:
+        return self._cap.grab() is True
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        ret, raw_image_np = self._cap.retrieve(image)
+        if ret is not True:
+            return None
+
+        return raw_image_np
+
+    def frame_shape(self) -> Tuple[int, int, int]:
+        return (
+            int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            3,
+        )
+
+    def release(self):
+        self._cap.release()
+
+
+class PyAVCapture(BaseCapture):
+    _frame: Optional[Any]
+
+    def __init__(
+        self,
+        url: str,
+        config: CaptureConfig,
+        packet_buffer: Optional[PacketRingBuffer] = None,
+    ):
+        import av
+
+        options: Dict[str, str] = {}
+        if url.startswith("rtsp://"):
+            options["rtsp_transport"] = config.rtsp_transport
+
+        self._container = av.open(url, options=options)
+        self._stream = self._container.streams.video[0]
+        self._stream.codec_context.thread_type = "AUTO"
+        self._stream.codec_context.thread_count = config.decoder_threads
+
+        self._keyframes_only = config.decode == DecodeModeEnum.keyframes
+        self._packets: Iterator[Any] = self._container.demux(self._stream)
+        self._frame = None
+        # Packets demuxed in standby since the last keyframe
+        self._standby_packets: List[Any] = []
+
+        self._packet_buffer = packet_buffer
+        if self._packet_buffer is not None:
+            self._packet_buffer.start_session(self._stream)
+
+    def decode_packet(self, packet: Any) -> bool:
+        # Flush packet without data signals end of the stream
+        if packet.size == 0:
+            return False
+
+        if self._packet_buffer is not None:
+            self._packet_buffer.append(packet)
+
+        # Keyframes decode on their own, everything between them is skipped
+        if self._keyframes_only and not packet.is_keyframe:
+            return False
+
+        return self.decode(packet)
+
+    def decode(self, packet: Any) -> bool:
+        frames = self._stream.decode(packet)
+        if len(frames) == 0:
+            return False
+
+        self._frame = frames[-1]
+        return True
+
+    def standby(self) -> bool:
+        try:
+            packet = next(self._packets)
+        except StopIteration:
+            return False
+        except Exception as error:
+            logger.error(f"Failed to demux stream: {error}")
+            return False
+
+        if packet.size == 0:
+            return False
+
+        if self._packet_buffer is not None:
+            self._packet_buffer.append(packet)
+
+        if packet.is_keyframe:
+            self._standby_packets = [packet]
+        elif len(self._standby_packets) >= MAX_STANDBY_PACKETS:
+            self._standby_packets = []
+        elif len(self._standby_packets) > 0:
+            self._standby_packets.append(packet)
+        return True
+
+    def resume(self) -> bool:
+        # Decoding starts from the buffered keyframe and catches up to the
+        # newest packet, only that frame is kept
+        packets = self._standby_packets
+        self._standby_packets = []
+        if self._keyframes_only:
+            packets = packets[:1]
+
+        decoded = False
+        for packet in packets:
+            decoded = self.decode(packet) or decoded
+        return decoded
+
+    def grab(self) -> bool:
+        try:
+            if len(self._standby_packets) > 0 and self.resume():
+                return True
+
+            for packet in self._packets:
+                if self.decode_packet(packet):
+                    return True
+        except Exception as error:
+            logger.error(f"Failed to demux stream: {error}")
+
+        return False
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        if self._frame is None:
+            return None
+
+        # Color conversion only happens for frames that are actually analysed
+        raw_image_np = self._frame.to_ndarray(format="bgr24")
+        if image is not None and image.shape == raw_image_np.shape:
+            np.copyto(image, raw_image_np)
+            return image
+
+        return raw_image_np
+
+    def frame_shape(self) -> Tuple[int, int, int]:
+        if self._frame is not None:
+            return self._frame.height, self._frame.width, 3
+
+        return (
+            self._stream.codec_context.height,
+            self._stream.codec_context.width,
+            3,
+        )
+
+    def release(self):
+        if self._packet_buffer is not None:
+            self._packet_buffer.end_session()
+        self._container.close()
+
+
+CAPTURE_MAP: Dict[CaptureBackendEnum, Type[BaseCapture]] = {
+    CaptureBackendEnum.opencv: OpenCVCapture,
+    CaptureBackendEnum.pyav: PyAVCapture,
+}
@@ -1,9 +1,25 @@
+import heapq
+import time
+from itertools import count
 from threading import Condition, Lock
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
+from typing_extensions import Protocol
+
+from ..metrics.pipeline import FRAMES_DROPPED, QUEUE_DEPTH
+from ..tracing.trace import TRACER
+from ..utils.timing import get_current_time_millis
 from .image import CameraImageContainer
 
 
+class FrameSink(Protocol):
+    def put_nowait(self, img: CameraImageContainer):
+        ...
+
+    def contains(self, camera_name: str) -> bool:
+        ...
+
+
 class CameraFeedMultiplexer:
     class Full(BaseException):
         pass
@@ -11,51 +27,130 @@ class CameraFeedMultiplexer:
     class Empty(BaseException):
         pass
 
-    _camera_images: List[CameraImageContainer]
+    # Every camera holds at most one frame
+    _slots: Dict[str, CameraImageContainer]
+    # Ready cameras ordered by their virtual start time
+    _ready: List[Tuple[float, int, str]]
+    _passes: Dict[str, float]
+    _weights: Dict[str, float]
+    _recording: Dict[str, bool]
+    _dropped_frames: Dict[str, int]
     _mutex: Lock
     _cv: Condition
+    _taken_cv: Condition
 
-    def __init__(self):
-        self._camera_images = []
-        self._cv = Condition(Lock())
+    def __init__(
+        self,
+        max_frame_age_millis: Optional[int] = None,
+        recording_weight: float = 1.0,
+    ):
+        self._max_frame_age_millis = max_frame_age_millis
+        self._recording_weight = recording_weight
 
-    def _contains_image(self, camera_name: str) -> bool:
-        return (
-            next(
-                (img for img in self._camera_images if img.camera_name == camera_name),
-                None,
-            )
-            is not None
-        )
+        self._slots = {}
+        self._ready = []
+        self._sequence = count()
+        self._virtual_time = 0.0
+        self._passes = {}
+        self._weights = {}
+        self._recording = {}
+        self._dropped_frames = {}
+
+        self._mutex = Lock()
+        self._cv = Condition(self._mutex)
+        self._taken_cv = Condition(self._mutex)
+
+        QUEUE_DEPTH.labels("camera_feed").set_function(self.qsize)
+
+    @property
+    def dropped_frames(self) -> Dict[str, int]:
+        with self._mutex:
+            return dict(self._dropped_frames)
+
+    def set_weight(self, camera_name: str, weight: float):
+        with self._mutex:
+            self._weights[camera_name] = weight
+
+    def set_recording(self, camera_name: str, recording: bool):
+        with self._mutex:
+            self._recording[camera_name] = recording
+
+    def _weight(self, camera_name: str) -> float:
+        weight = self._weights.get(camera_name, 1.0)
+        if self._recording.get(camera_name, False):
+            weight *= self._recording_weight
+        return weight
 
     def put_nowait(self, img: CameraImageContainer):
         with self._cv:
-            if self._contains_image(img.camera_name):
+            if img.camera_name in self._slots:
                 raise self.Full()
 
-            self._camera_images.append(img)
+            self._slots[img.camera_name] = img
+
+            # Idle cameras rejoin at the current virtual time instead of
+            # claiming the turns they missed
+            start = max(self._passes.get(img.camera_name, 0.0), self._virtual_time)
+            heapq.heappush(self._ready, (start, next(self._sequence), img.camera_name))
 
             self._cv.notify(n=1)
 
+    def _pop_image(self) -> Optional[CameraImageContainer]:
+        while len(self._ready) > 0:
+            start, _, camera_name = heapq.heappop(self._ready)
+            img = self._slots.pop(camera_name)
+            self._taken_cv.notify_all()
+
+            self._virtual_time = start
+            self._passes[camera_name] = start + 1.0 / self._weight(camera_name)
+
+            if (
+                self._max_frame_age_millis is not None
+                and get_current_time_millis() - img.created_at
+                > self._max_frame_age_millis
+            ):
+                self._dropped_frames[camera_name] = (
+                    self._dropped_frames.get(camera_name, 0) + 1
+                )
+                FRAMES_DROPPED.labels(camera_name, "stale").inc()
+                TRACER.finish(img.trace, "stale")
+                continue
+
+            return img
+
+        return None
+
     def get(self, timeout: Optional[float] = None) -> CameraImageContainer:
         with self._cv:
-            try:
-                return self._camera_images.pop()
-            except IndexError:
-                pass
+            img = self._pop_image()
+            if img is not None:
+                return img
 
             if timeout is None:
                 raise self.Empty()
 
-            if self._cv.wait(timeout):
-                try:
-                    return self._camera_images.pop()
-                except IndexError:
-                    # This should never happen, but just in case...
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
                     raise self.Empty()
-            else:
-                raise self.Empty()
+
+                self._cv.wait(remaining)
+
+                # Woken up frames may have turned out stale
+                img = self._pop_image()
+                if img is not None:
+                    return img
+
+    def wait_taken(self, camera_name: str, timeout: Optional[float] = None) -> bool:
+        with self._taken_cv:
+            return self._taken_cv.wait_for(
+                lambda: camera_name not in self._slots, timeout
+            )
+
+    def qsize(self) -> int:
+        return len(self._slots)
 
     def contains(self, camera_name: str) -> bool:
-        with self._cv:
-            return self._contains_image(camera_name)
+        # Single dict lookup, safe without the lock
+        return camera_name in self._slots
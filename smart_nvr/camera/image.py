@@ -1,8 +1,10 @@
-from typing import List, Optional, Tuple
+from enum import Enum
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 
 from ..detection.detection_types import Detection
+from ..tracing.trace import FrameTrace
 from ..utils.rectangle import Rectangle
 from ..utils.timing import get_current_time_millis
 
@@ -22,6 +24,12 @@ def get_split_image_dimensions(
     ]
 
 
+class PixelFormat(str, Enum):
+    # Values match PyAV frame format names
+    rgb = "rgb24"
+    bgr = "bgr24"
+
+
 class CameraImageContainer:
     def __init__(
         self,
@@ -31,6 +39,9 @@ class CameraImageContainer:
         cropped_images: List[np.ndarray],
         detailed: bool,
         created_at: int,
+        pixel_format: PixelFormat = PixelFormat.bgr,
+        motion: Optional[List[Rectangle]] = None,
+        trace: Optional[FrameTrace] = None,
     ):
         self.camera_name = camera_name
         self.raw_image_np = raw_image_np
@@ -38,6 +49,11 @@ class CameraImageContainer:
         self.cropped_images = cropped_images
         self.detailed = detailed
         self.created_at = created_at
+        self.pixel_format = pixel_format
+        # Moving regions of the frame, None when motion wasn't analysed
+        self.motion = motion
+        # Only set for frames sampled by the tracer
+        self.trace = trace
 
     @classmethod
     def create(
@@ -47,6 +63,9 @@ class CameraImageContainer:
         dimensions: List[Rectangle],
         detailed: bool = False,
         created_at: Optional[int] = None,
+        pixel_format: PixelFormat = PixelFormat.bgr,
+        motion: Optional[List[Rectangle]] = None,
+        trace: Optional[FrameTrace] = None,
     ) -> "CameraImageContainer":
         if created_at is None:
             created_at = get_current_time_millis()
@@ -61,19 +80,33 @@ class CameraImageContainer:
         ]
 
         return cls(
-            camera_name, raw_image_np, dimensions, cropped_images, detailed, created_at
+            camera_name,
+            raw_image_np,
+            dimensions,
+            cropped_images,
+            detailed,
+            created_at,
+            pixel_format,
+            motion,
+            trace,
         )
 
 
 class DetectionCameraImageContainer:
     camera_image_container: CameraImageContainer
-    detections: List[Detection]
+    detections: Sequence[Detection]
 
     def __init__(
-        self, camera_image_container: CameraImageContainer, detections: List[Detection]
+        self,
+        camera_image_container: CameraImageContainer,
+        detections: Sequence[Detection],
     ):
         self.camera_image_container = camera_image_container
         self.detections = detections
 
+    @property
+    def trace(self) -> Optional[FrameTrace]:
+        return self.camera_image_container.trace
+
     def has_detections(self):
         return len(self.detections) > 0
@@ -0,0 +1,85 @@
+from typing import Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ...app_config import MotionDetectionConfig
+from .detection import BaseMotionDetector
+
+# Frames used only to build up the background model
+WARMUP_FRAMES = 5
+
+
+class RunningAverageMotionDetector(BaseMotionDetector):
+    _background: Optional[np.ndarray]
+
+    def __init__(self, config: MotionDetectionConfig):
+        super().__init__(config)
+        self._learning_rate = (
+            config.learning_rate if config.learning_rate is not None else 0.05
+        )
+        self._background = None
+
+    def reset(self):
+        # Background model is kept across stream reconnects and adapts on its own
+        pass
+
+    def foreground(self, img: np.ndarray) -> Optional[np.ndarray]:
+        if self._background is None or self._background.shape != img.shape:
+            self._background = img.astype(np.float32)
+            return None
+
+        diff = cv2.absdiff(img, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(img, self._background, self._learning_rate)
+
+        return diff
+
+
+class BackgroundSubtractorMotionDetector(BaseMotionDetector):
+    _subtractor: Optional[Any]
+
+    def __init__(self, config: MotionDetectionConfig):
+        super().__init__(config)
+        self._config = config
+        # Negative learning rate lets OpenCV derive it from the history length
+        self._learning_rate = (
+            config.learning_rate if config.learning_rate is not None else -1
+        )
+        self._subtractor = None
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._frames_count = 0
+
+    def create_subtractor(self) -> Any:
+        raise NotImplementedError()
+
+    def reset(self):
+        # Background model is kept across stream reconnects and adapts on its own
+        pass
+
+    def foreground(self, img: np.ndarray) -> Optional[np.ndarray]:
+        if self._subtractor is None or self._shape != img.shape:
+            self._subtractor = self.create_subtractor()
+            self._shape = img.shape
+            self._frames_count = 0
+
+        mask = self._subtractor.apply(img, learningRate=self._learning_rate)
+        self._frames_count += 1
+
+        if self._frames_count <= WARMUP_FRAMES:
+            return None
+
+        return mask
+
+
+class MOG2MotionDetector(BackgroundSubtractorMotionDetector):
+    def create_subtractor(self) -> Any:
+        return cv2.createBackgroundSubtractorMOG2(
+            history=self._config.history, detectShadows=False
+        )
+
+
+class KNNMotionDetector(BackgroundSubtractorMotionDetector):
+    def create_subtractor(self) -> Any:
+        return cv2.createBackgroundSubtractorKNN(
+            history=self._config.history, detectShadows=False
+        )
@@ -1,10 +1,12 @@
-from typing import List
+from typing import List, Optional
 
 import cv2
 import numpy as np
 
+from ...app_config import MotionDetectionConfig
 from ...utils.geometry import merge_rectangles, square_box_rectangles
 from ...utils.rectangle import Rectangle
+from ..image import PixelFormat
 
 # GAUSIAN_BLUR_SIZE = (5, 5)
 GAUSIAN_BLUR_SIZE = (21, 21)
@@ -14,6 +16,11 @@ THRESHOLD_MINVALUE = 20
 THRESHOLD_MAXVALUE = 255
 DEFAULT_COUNTOURS_SIZE = 2
 
+GRAY_CONVERSIONS = {
+    PixelFormat.rgb: cv2.COLOR_RGB2GRAY,
+    PixelFormat.bgr: cv2.COLOR_BGR2GRAY,
+}
+
 
 def contours_to_rectangles(contours) -> List[Rectangle]:
     bounding_rectangles = [cv2.boundingRect(contour) for contour in contours]
@@ -67,16 +74,14 @@ def filter_motion_areas_by_contours(
     )
 
 
-def detect_motion(previous_img: np.ndarray, current_img: np.ndarray) -> List[Rectangle]:
-    (height, width, _) = current_img.shape
+def find_motion_rectangles(diff_gray: np.ndarray, blur_size: int) -> List[Rectangle]:
+    (height, width) = diff_gray.shape
     total_area = height * width
 
     min_contour_area = int(total_area * MIN_CONTOUR_AREA_FACTOR)
     max_contour_area = int(total_area * MAX_CONTOUR_AREA_FACTOR)
 
-    diff = cv2.absdiff(previous_img, current_img)
-    diff_gray = cv2.cvtColor(diff, cv2.COLOR_RGB2GRAY)
-    diff_blur = cv2.GaussianBlur(diff_gray, GAUSIAN_BLUR_SIZE, 0)
+    diff_blur = cv2.GaussianBlur(diff_gray, (blur_size, blur_size), 0)
     _, thresh_bin = cv2.threshold(
         diff_blur, THRESHOLD_MINVALUE, THRESHOLD_MAXVALUE, cv2.THRESH_BINARY
     )
@@ -84,15 +89,112 @@ def detect_motion(previous_img: np.ndarray, current_img: np.ndarray) -> List[Rec
     # thresh_bin = cv2.erode(thresh_bin, None, iterations=3)
     contours, _ = cv2.findContours(thresh_bin, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
 
-    # rectangles = filter_motion_areas(contours, min_contour_area, max_contour_area)
-    rectangles = filter_motion_areas_by_contours(
-        contours, min_contour_area, max_contour_area
-    )
+    # return filter_motion_areas(contours, min_contour_area, max_contour_area)
+    return filter_motion_areas_by_contours(contours, min_contour_area, max_contour_area)
+
 
+def rectangles_to_dimensions(
+    rectangles: List[Rectangle], height: int, width: int
+) -> List[Rectangle]:
     rectangles = merge_rectangles(rectangles)
 
-    dimensions = [
+    return [
         square_box_rectangles(rectangle, (height, width)) for rectangle in rectangles
     ]
 
-    return dimensions
+
+def scale_rectangle(rectangle: Rectangle, factor: float) -> Rectangle:
+    return Rectangle(
+        int(rectangle.x1 * factor),
+        int(rectangle.y1 * factor),
+        int(rectangle.x2 * factor),
+        int(rectangle.y2 * factor),
+    )
+
+
+def detect_motion(
+    previous_img: np.ndarray,
+    current_img: np.ndarray,
+    pixel_format: PixelFormat = PixelFormat.bgr,
+) -> List[Rectangle]:
+    (height, width, _) = current_img.shape
+
+    diff = cv2.absdiff(previous_img, current_img)
+    diff_gray = cv2.cvtColor(diff, GRAY_CONVERSIONS[pixel_format])
+
+    rectangles = find_motion_rectangles(diff_gray, GAUSIAN_BLUR_SIZE[0])
+
+    return rectangles_to_dimensions(rectangles, height, width)
+
+
+class BaseMotionDetector:
+    def __init__(self, config: MotionDetectionConfig):
+        self._scale = config.scale
+        # Keep the blur kernel covering the same area of the full frame
+        self._blur_size = max(3, int(GAUSIAN_BLUR_SIZE[0] * config.scale) | 1)
+
+    def prepare_image(self, img: np.ndarray, pixel_format: PixelFormat) -> np.ndarray:
+        img = cv2.cvtColor(img, GRAY_CONVERSIONS[pixel_format])
+
+        # Halving steps hit the fast path of INTER_AREA, remainder is resized once
+        scale = self._scale
+        while scale <= 0.5:
+            img = cv2.resize(img, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+            scale *= 2
+
+        if scale != 1.0:
+            img = cv2.resize(
+                img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+
+        return img
+
+    def reset(self):
+        raise NotImplementedError()
+
+    def foreground(self, img: np.ndarray) -> Optional[np.ndarray]:
+        raise NotImplementedError()
+
+    def detect_rectangles(
+        self, img: np.ndarray, pixel_format: PixelFormat = PixelFormat.bgr
+    ) -> Optional[List[Rectangle]]:
+        # Moving regions in full frame coordinates, before they are squared
+        foreground = self.foreground(self.prepare_image(img, pixel_format))
+        if foreground is None:
+            return None
+
+        return [
+            scale_rectangle(rectangle, 1.0 / self._scale)
+            for rectangle in find_motion_rectangles(foreground, self._blur_size)
+        ]
+
+    def detect(
+        self, img: np.ndarray, pixel_format: PixelFormat = PixelFormat.bgr
+    ) -> Optional[List[Rectangle]]:
+        (height, width, _) = img.shape
+
+        rectangles = self.detect_rectangles(img, pixel_format)
+        if rectangles is None:
+            return None
+
+        return rectangles_to_dimensions(rectangles, height, width)
+
+
+class FrameDifferenceMotionDetector(BaseMotionDetector):
+    _previous_img: Optional[np.ndarray]
+
+    def __init__(self, config: MotionDetectionConfig):
+        super().__init__(config)
+        self._previous_img = None
+
+    def reset(self):
+        self._previous_img = None
+
+    def foreground(self, img: np.ndarray) -> Optional[np.ndarray]:
+        previous_img = self._previous_img
+        self._previous_img = img
+
+        if previous_img is None or previous_img.shape != img.shape:
+            return None
+
+        return cv2.absdiff(previous_img, img)
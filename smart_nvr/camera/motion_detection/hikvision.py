@@ -1,74 +1,407 @@
+import asyncio
+import base64
+import hashlib
 import logging
-from typing import Any, Callable, Dict, List, Optional
+import os
+import re
+import ssl
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from xml.etree import ElementTree
 
-from pyhik.hikvision import HikCamera
-
-from ...app_config import HikvisionMotionConfig
+from ...app_config import AuthConfig, HikvisionMotionConfig
+from ...utils.backoff import ExponentialBackoff
+from ...workers.event_loop_worker import EventLoopWorker
+from .hysteresis import MotionHysteresis
 
 logger = logging.getLogger(__name__)
 
-MOTION_EVENTS = {
-    "Motion",
-    "Line Crossing",
-    "Field Detection",
-    "Tamper Detection",
-    "PIR Alarm",
-    "Scene Change Detection",
-    "Exiting Region",
-    "Entering Region",
+ALERT_STREAM_PATH = "/ISAPI/Event/notification/alertStream"
+
+RECONNECT_INITIAL_SECONDS = 1.0
+RECONNECT_MAX_SECONDS = 30.0
+CONNECT_TIMEOUT_SECONDS = 10.0
+# Idle cameras send a heartbeat about every 10 seconds
+STREAM_TIMEOUT_SECONDS = 30.0
+# Active events repeat about every second while motion lasts
+EVENT_TIMEOUT_SECONDS = 2.0
+MAX_ALERT_BYTES = 64 * 1024
+READ_SIZE = 4096
+
+# Event types of the alert stream, lower cased
+MOTION_EVENT_TYPES = {
+    "vmd",
+    "linedetection",
+    "fielddetection",
+    "shelteralarm",
+    "pir",
+    "scenechangedetection",
+    "regionexiting",
+    "regionentering",
 }
 
+ALERT_START = b"<EventNotificationAlert"
+ALERT_PATTERN = re.compile(
+    rb"<EventNotificationAlert\b.*?</EventNotificationAlert>", re.DOTALL
+)
+CHALLENGE_PARAM_PATTERN = re.compile(r'(\w+)=(?:"([^"]*)"|([^\s,]*))')
 
-def event_states_has_motion(event_states: Dict[str, List[List[Any]]]) -> bool:
-    for sensor, channel_list in event_states.items():
-        if sensor in MOTION_EVENTS:
-            for channel in channel_list:
-                if channel[0] == True:
-                    return True
 
-    return False
+class AlertEvent(NamedTuple):
+    event_type: str
+    active: bool
+    channel: Optional[str]
 
 
-def has_motion(cam: HikCamera) -> bool:
-    event_states = cam.current_event_states
+def parse_alert(document: bytes) -> Optional[AlertEvent]:
+    try:
+        root = ElementTree.fromstring(document)
+    except ElementTree.ParseError:
+        return None
 
-    return event_states_has_motion(event_states) if event_states is not None else False
-    # return True  # TODO - hack
+    # Tags are namespaced with the ISAPI schema
+    values = {
+        element.tag.rsplit("}", 1)[-1]: (element.text or "").strip()
+        for element in root.iter()
+    }
+    event_type = values.get("eventType")
+    if not event_type:
+        return None
 
+    return AlertEvent(
+        event_type=event_type,
+        active=values.get("eventState", "").lower() == "active",
+        channel=values.get("channelID") or values.get("dynChannelID"),
+    )
 
-class HikvisionMotionDetection:
-    def __init__(self, config: HikvisionMotionConfig):
-        self._cam = HikCamera(
-            f"http://{config.host}",
-            config.port,
-            config.auth.username if config.auth is not None else None,
-            config.auth.password if config.auth is not None else None,
-        )
 
-        for sensor, channel_list in self._cam.current_event_states.items():
-            for channel in channel_list:
-                id = f"{self._cam.cam_id}.{sensor}.{channel[1]}"
-                self._cam.add_update_callback(self._update_callback, id)
+def is_motion_event(event: AlertEvent) -> bool:
+    return event.event_type.lower() in MOTION_EVENT_TYPES
+
+
+def split_alerts(buffer: bytes) -> Tuple[List[bytes], bytes]:
+    # Multipart boundaries and part headers are skipped, only the XML
+    # documents are kept
+    documents = []
+    end = 0
+    for match in ALERT_PATTERN.finditer(buffer):
+        documents.append(match.group(0))
+        end = match.end()
+
+    remaining = buffer[end:]
+    start = remaining.find(ALERT_START)
+    if start >= 0:
+        remaining = remaining[start:]
+    else:
+        # Start tag may be split between reads
+        remaining = remaining[-len(ALERT_START) :]
+
+    if len(remaining) > MAX_ALERT_BYTES:
+        raise ValueError(f"Alert larger than {MAX_ALERT_BYTES} bytes")
+    return documents, remaining
+
+
+def parse_challenge(challenge: str) -> Tuple[str, Dict[str, str]]:
+    scheme, _, params = challenge.strip().partition(" ")
+    return scheme.lower(), {
+        key.lower(): quoted or token
+        for key, quoted, token in CHALLENGE_PARAM_PATTERN.findall(params)
+    }
+
+
+def digest_authorization(
+    auth: AuthConfig,
+    method: str,
+    uri: str,
+    params: Dict[str, str],
+    cnonce: Optional[str] = None,
+) -> str:
+    algorithm = params.get("algorithm", "MD5")
+    if algorithm.upper() != "MD5":
+        raise ConnectionError(f"Unsupported digest algorithm {algorithm}")
+
+    def md5(value: str) -> str:
+        return hashlib.md5(value.encode()).hexdigest()
+
+    realm, nonce = params.get("realm", ""), params.get("nonce", "")
+    ha1 = md5(f"{auth.username}:{realm}:{auth.password}")
+    ha2 = md5(f"{method}:{uri}")
+
+    fields = [
+        f'username="{auth.username}"',
+        f'realm="{realm}"',
+        f'nonce="{nonce}"',
+        f'uri="{uri}"',
+    ]
+    qop_options = [qop.strip() for qop in params.get("qop", "").split(",")]
+    if "auth" in qop_options:
+        # Every connection authenticates once, so the nonce count stays 1
+        nc = "00000001"
+        cnonce = cnonce if cnonce is not None else os.urandom(8).hex()
+        response = md5(f"{ha1}:{nonce}:{nc}:{cnonce}:auth:{ha2}")
+        fields.extend(["qop=auth", f"nc={nc}", f'cnonce="{cnonce}"'])
+    else:
+        response = md5(f"{ha1}:{nonce}:{ha2}")
+
+    fields.append(f'response="{response}"')
+    if "opaque" in params:
+        fields.append(f'opaque="{params["opaque"]}"')
+    return "Digest " + ", ".join(fields)
+
+
+def authorization_header(
+    auth: AuthConfig, method: str, uri: str, challenges: List[str]
+) -> str:
+    parsed = [parse_challenge(challenge) for challenge in challenges]
+    for scheme, params in parsed:
+        if scheme == "digest":
+            return digest_authorization(auth, method, uri, params)
+
+    if any(scheme == "basic" for scheme, _ in parsed):
+        credentials = f"{auth.username}:{auth.password}".encode()
+        return f"Basic {base64.b64encode(credentials).decode()}"
+
+    raise ConnectionError(f"Unsupported authentication {challenges}")
+
+
+async def read_response_head(
+    reader: asyncio.StreamReader,
+) -> Tuple[int, List[Tuple[str, str]]]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    status = int(status_line.split(" ")[1])
+
+    headers = []
+    for line in header_lines:
+        name, separator, value = line.partition(":")
+        if separator:
+            headers.append((name.strip().lower(), value.strip()))
+    return status, headers
+
+
+async def read_body(reader: asyncio.StreamReader, chunked: bool) -> bytes:
+    if not chunked:
+        return await reader.read(READ_SIZE)
+
+    size_line = await reader.readline()
+    size = int(size_line.split(b";")[0].strip() or b"0", 16)
+    if size == 0:
+        return b""
+    data = await reader.readexactly(size)
+    await reader.readexactly(2)
+    return data
 
+
+StreamItem = Union[AlertEvent, Exception, None]
+
+
+class HikvisionMotionDetection:
+    def __init__(self, config: HikvisionMotionConfig, event_loop: EventLoopWorker):
+        # Alert streams of all cameras share the loop of one worker, so an
+        # unreachable camera holds up neither the others nor the startup
+        self._config = config
+        self._event_loop = event_loop
+        self._task_name = f"hikvision[{config.host}:{config.port}]#{id(self)}"
+        self._ssl_context = ssl.create_default_context() if config.ssl else None
+        self._backoff = ExponentialBackoff(
+            RECONNECT_INITIAL_SECONDS, RECONNECT_MAX_SECONDS
+        )
+        # Chattering sensors would otherwise reopen the camera stream on
+        # every flip
+        self._hysteresis = MotionHysteresis(
+            config.on_delay_seconds, config.off_delay_seconds, config.min_hold_seconds
+        )
+        self._motion = False
+        self._motion_until = 0.0
         self._callback: Optional[Callable[[bool], None]] = None
+        self._started_at = time.monotonic()
+        self.connected = threading.Event()
+        self.connect_seconds: Optional[float] = None
 
     def set_callback(self, callback: Callable[[bool], None]):
         self._callback = callback
 
     def start(self):
-        self.trigger_callback(has_motion(self._cam))
-        self._cam.start_stream()
+        self._started_at = time.monotonic()
+        self._event_loop.start_task(self._task_name, self.watch)
 
     def stop(self):
-        self._cam.disconnect()
+        self._event_loop.cancel_task(self._task_name)
 
     def trigger_callback(self, motion: bool):
         if self._callback is not None:
             self._callback(motion)
 
-    def _update_callback(self, id: str):
-        logger.debug(f"Callback signal from: {id}")
+    def update_motion(self, sensor_motion: bool, now: float):
+        motion = self._hysteresis.update(sensor_motion, now)
+        if motion != self._motion:
+            self._motion = motion
+            self.trigger_callback(motion)
+
+    def reset_motion(self):
+        self._hysteresis.reset()
+        self._motion_until = 0.0
+        if self._motion:
+            self._motion = False
+            self.trigger_callback(False)
+
+    async def watch(self):
+        # Any error short of cancellation ends in a reconnect, the task must
+        # outlive outages of any length
+        attempt = 0
+        while True:
+            try:
+                await self.follow()
+                attempt = 1
+                error_message = "stream ended"
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                attempt += 1
+                error_message = str(error)
+
+            delay = self._backoff.delay(attempt)
+            logger.warning(
+                f"Reconnecting to {self._config.host} in {delay:.1f} s: "
+                f"{error_message}"
+            )
+            await asyncio.sleep(delay)
+
+    async def follow(self):
+        reader, writer, chunked = await self.open_stream()
+
+        if not self.connected.is_set():
+            self.connect_seconds = time.monotonic() - self._started_at
+            self.connected.set()
+        logger.info(f"Following motion events of {self._config.host}")
+
+        try:
+            await self.follow_stream(reader, chunked)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.warning(f"Motion events of {self._config.host} lost: {error}")
+        finally:
+            writer.close()
+            # Motion is unknown until the stream is back
+            self.reset_motion()
+
+    async def open_stream(
+        self,
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        status, headers, reader, writer = await self.request(None)
+        if status == 401 and self._config.auth is not None:
+            writer.close()
+            authorization = authorization_header(
+                self._config.auth,
+                "GET",
+                ALERT_STREAM_PATH,
+                [value for name, value in headers if name == "www-authenticate"],
+            )
+            status, headers, reader, writer = await self.request(authorization)
+
+        if status != 200:
+            writer.close()
+            raise ConnectionError(f"Alert stream returned HTTP {status}")
+
+        chunked = any(
+            name == "transfer-encoding" and value.lower() == "chunked"
+            for name, value in headers
+        )
+        return reader, writer, chunked
+
+    async def request(
+        self, authorization: Optional[str]
+    ) -> Tuple[int, List[Tuple[str, str]], asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self._config.host, self._config.port, ssl=self._ssl_context
+            ),
+            CONNECT_TIMEOUT_SECONDS,
+        )
+
+        lines = [
+            f"GET {ALERT_STREAM_PATH} HTTP/1.1",
+            f"Host: {self._config.host}:{self._config.port}",
+            "Accept: */*",
+        ]
+        if authorization is not None:
+            lines.append(f"Authorization: {authorization}")
+
+        try:
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            status, headers = await asyncio.wait_for(
+                read_response_head(reader), CONNECT_TIMEOUT_SECONDS
+            )
+        except BaseException:
+            writer.close()
+            raise
+        return status, headers, reader, writer
+
+    async def read_stream(
+        self,
+        reader: asyncio.StreamReader,
+        chunked: bool,
+        items: "asyncio.Queue[StreamItem]",
+    ):
+        # Reads are never cancelled halfway, the follower only waits on items
+        buffer = b""
+        try:
+            while True:
+                data = await read_body(reader, chunked)
+                if len(data) == 0:
+                    items.put_nowait(None)
+                    return
+
+                documents, buffer = split_alerts(buffer + data)
+                for document in documents:
+                    event = parse_alert(document)
+                    if event is not None:
+                        items.put_nowait(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            items.put_nowait(error)
+
+    async def follow_stream(self, reader: asyncio.StreamReader, chunked: bool):
+        items: "asyncio.Queue[StreamItem]" = asyncio.Queue()
+        reading = asyncio.ensure_future(self.read_stream(reader, chunked, items))
+        last_event_at = time.monotonic()
+
+        try:
+            while True:
+                now = time.monotonic()
+                sensor_motion = now < self._motion_until
+                self.update_motion(sensor_motion, now)
+
+                wake_at = last_event_at + STREAM_TIMEOUT_SECONDS
+                if sensor_motion:
+                    wake_at = min(wake_at, self._motion_until)
+                change_at = self._hysteresis.next_change_at()
+                if change_at is not None:
+                    wake_at = min(wake_at, change_at)
+
+                try:
+                    item = await asyncio.wait_for(items.get(), max(0.0, wake_at - now))
+                except asyncio.TimeoutError:
+                    if time.monotonic() - last_event_at >= STREAM_TIMEOUT_SECONDS:
+                        raise ConnectionError("No events or heartbeats")
+                    continue
 
-        motion = has_motion(self._cam)
+                if item is None:
+                    raise ConnectionError("Alert stream closed")
+                if isinstance(item, Exception):
+                    raise item
 
-        self.trigger_callback(motion)
+                last_event_at = time.monotonic()
+                if is_motion_event(item):
+                    logger.debug(
+                        f"{self._config.host} {item.event_type} "
+                        f"channel {item.channel} active: {item.active}"
+                    )
+                    self._motion_until = (
+                        last_event_at + EVENT_TIMEOUT_SECONDS if item.active else 0.0
+                    )
+        finally:
+            reading.cancel()
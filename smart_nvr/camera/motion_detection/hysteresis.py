@@ -0,0 +1,44 @@
+from typing import Optional
+
+
+class MotionHysteresis:
+    def __init__(
+        self, on_delay_seconds: float, off_delay_seconds: float, min_hold_seconds: float
+    ):
+        self._on_delay_seconds = on_delay_seconds
+        self._off_delay_seconds = off_delay_seconds
+        self._min_hold_seconds = min_hold_seconds
+        self.motion = False
+        self._changed_at = float("-inf")
+        # Since when the sensor has disagreed with the reported state
+        self._pending_since: Optional[float] = None
+
+    def update(self, motion: bool, now: float) -> bool:
+        if motion == self.motion:
+            self._pending_since = None
+            return self.motion
+
+        if self._pending_since is None:
+            self._pending_since = now
+
+        change_at = self.next_change_at()
+        if change_at is not None and now >= change_at:
+            self.motion = motion
+            self._changed_at = now
+            self._pending_since = None
+
+        return self.motion
+
+    def next_change_at(self) -> Optional[float]:
+        if self._pending_since is None:
+            return None
+
+        delay = self._off_delay_seconds if self.motion else self._on_delay_seconds
+        return max(
+            self._pending_since + delay, self._changed_at + self._min_hold_seconds
+        )
+
+    def reset(self):
+        self.motion = False
+        self._changed_at = float("-inf")
+        self._pending_since = None
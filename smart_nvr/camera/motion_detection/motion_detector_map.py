@@ -0,0 +1,16 @@
+from typing import Dict, Type
+
+from ...app_config import MotionBackendEnum
+from .background_subtraction import (
+    KNNMotionDetector,
+    MOG2MotionDetector,
+    RunningAverageMotionDetector,
+)
+from .detection import BaseMotionDetector, FrameDifferenceMotionDetector
+
+MOTION_DETECTOR_MAP: Dict[MotionBackendEnum, Type[BaseMotionDetector]] = {
+    MotionBackendEnum.frame_difference: FrameDifferenceMotionDetector,
+    MotionBackendEnum.running_average: RunningAverageMotionDetector,
+    MotionBackendEnum.mog2: MOG2MotionDetector,
+    MotionBackendEnum.knn: KNNMotionDetector,
+}
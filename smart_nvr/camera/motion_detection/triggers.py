@@ -0,0 +1,81 @@
+from typing import Dict, Optional, Type
+
+import numpy as np
+
+from ...app_config import MotionDetectionConfig, MotionTriggerConfig, MotionTriggerEnum
+from .motion_detector_map import MOTION_DETECTOR_MAP
+
+
+class BaseMotionTrigger:
+    # Triggers stand in for camera motion events of replayed feeds, they're
+    # asked for every frame with the replayed time
+    needs_frame = False
+
+    def __init__(
+        self,
+        config: MotionTriggerConfig,
+        motion_detection_config: MotionDetectionConfig,
+    ):
+        pass
+
+    def update(self, timestamp_millis: int, frame: Optional[np.ndarray]) -> bool:
+        raise NotImplementedError()
+
+
+class AlwaysMotionTrigger(BaseMotionTrigger):
+    def update(self, timestamp_millis: int, frame: Optional[np.ndarray]) -> bool:
+        return True
+
+
+class ScheduleMotionTrigger(BaseMotionTrigger):
+    _started_at: Optional[int]
+
+    def __init__(
+        self,
+        config: MotionTriggerConfig,
+        motion_detection_config: MotionDetectionConfig,
+    ):
+        self._on_millis = int(config.on_seconds * 1000)
+        self._period_millis = self._on_millis + int(config.off_seconds * 1000)
+        self._started_at = None
+
+    def update(self, timestamp_millis: int, frame: Optional[np.ndarray]) -> bool:
+        if self._started_at is None:
+            self._started_at = timestamp_millis
+
+        elapsed = timestamp_millis - self._started_at
+        return elapsed % self._period_millis < self._on_millis
+
+
+class PixelMotionTrigger(BaseMotionTrigger):
+    needs_frame = True
+    _last_motion_at: Optional[int]
+
+    def __init__(
+        self,
+        config: MotionTriggerConfig,
+        motion_detection_config: MotionDetectionConfig,
+    ):
+        self._hold_millis = int(config.hold_seconds * 1000)
+        self._motion_detector = MOTION_DETECTOR_MAP[motion_detection_config.backend](
+            motion_detection_config
+        )
+        self._last_motion_at = None
+
+    def update(self, timestamp_millis: int, frame: Optional[np.ndarray]) -> bool:
+        if frame is not None:
+            motion = self._motion_detector.detect(frame)
+            if motion is not None and len(motion) > 0:
+                self._last_motion_at = timestamp_millis
+
+        return (
+            self._last_motion_at is not None
+            and timestamp_millis - self._last_motion_at <= self._hold_millis
+        )
+
+
+MOTION_TRIGGER_MAP: Dict[MotionTriggerEnum, Type[BaseMotionTrigger]] = {
+    MotionTriggerEnum.always: AlwaysMotionTrigger,
+    MotionTriggerEnum.schedule: ScheduleMotionTrigger,
+    MotionTriggerEnum.pixel: PixelMotionTrigger,
+}
@@ -0,0 +1,188 @@
+import glob
+import logging
+import os
+import time
+from typing import List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..app_config import ReplayFeedConfig
+from ..utils.timing import SimulatedClock
+from .capture import BaseCapture
+from .motion_detection.triggers import MOTION_TRIGGER_MAP
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+class VideoFileReader:
+    def __init__(self, path: str):
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise ValueError(f"Failed to open video file: {path}")
+
+    @property
+    def frame_rate(self) -> Optional[float]:
+        frame_rate = self._cap.get(cv2.CAP_PROP_FPS)
+        return frame_rate if frame_rate > 0 else None
+
+    def grab(self) -> bool:
+        return self._cap.grab() is True
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        ret, raw_image_np = self._cap.retrieve()
+        return raw_image_np if ret is True else None
+
+    def frame_shape(self) -> Tuple[int, int, int]:
+        return (
+            int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            3,
+        )
+
+    def release(self):
+        self._cap.release()
+
+
+class ImageSequenceReader:
+    def __init__(self, file_paths: List[str]):
+        if len(file_paths) == 0:
+            raise ValueError("No images to replay")
+
+        self._file_paths = file_paths
+        self._index = -1
+
+    @property
+    def frame_rate(self) -> Optional[float]:
+        return None
+
+    def grab(self) -> bool:
+        if self._index + 1 >= len(self._file_paths):
+            return False
+
+        self._index += 1
+        return True
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        if self._index < 0:
+            return None
+
+        return cv2.imread(self._file_paths[self._index])
+
+    def frame_shape(self) -> Tuple[int, int, int]:
+        raw_image_np = cv2.imread(self._file_paths[0])
+        if raw_image_np is None:
+            raise ValueError(f"Failed to read image: {self._file_paths[0]}")
+
+        height, width, channels = raw_image_np.shape
+        return height, width, channels
+
+    def release(self):
+        pass
+
+
+Reader = Union[VideoFileReader, ImageSequenceReader]
+
+
+def open_reader(path: str) -> Reader:
+    if os.path.isdir(path):
+        file_paths = [
+            os.path.join(path, file_name)
+            for file_name in os.listdir(path)
+            if os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS
+        ]
+        return ImageSequenceReader(sorted(file_paths))
+
+    if glob.has_magic(path):
+        return ImageSequenceReader(sorted(glob.glob(path)))
+
+    return VideoFileReader(path)
+
+
+class ReplayCapture(BaseCapture):
+    _frame: Optional[np.ndarray]
+
+    def __init__(
+        self,
+        camera_name: str,
+        config: ReplayFeedConfig,
+        start_millis: int,
+        clock: Optional[SimulatedClock] = None,
+    ):
+        self._camera_name = camera_name
+        self._config = config
+        self._reader = open_reader(config.path)
+        self._trigger = MOTION_TRIGGER_MAP[config.trigger.type](
+            config.trigger, config.motion_detection
+        )
+        self._motion = False
+
+        frame_rate = self._reader.frame_rate
+        self._frame_interval_millis = 1000.0 / (
+            frame_rate if frame_rate is not None else config.frame_rate
+        )
+
+        # Without a simulated clock frames are paced to the system clock
+        self._clock = clock
+        self._start_millis = start_millis
+        self._started_at = time.monotonic()
+        self._frames_count = 0
+        self._timestamp_millis = start_millis
+        self._frame = None
+
+    def _next_frame(self) -> bool:
+        if self._reader.grab():
+            return True
+
+        if not self._config.loop:
+            return False
+
+        self._reader.release()
+        self._reader = open_reader(self._config.path)
+        return self._reader.grab()
+
+    def grab(self) -> bool:
+        # Frames without motion are read and dropped, like a camera which is
+        # not being read
+        while True:
+            if not self._next_frame():
+                return False
+
+            offset_millis = self._frames_count * self._frame_interval_millis
+            self._frames_count += 1
+            self._timestamp_millis = self._start_millis + int(offset_millis)
+            self._frame = None
+
+            if self._clock is not None:
+                self._clock.advance(self._camera_name, self._timestamp_millis)
+            else:
+                delay = self._started_at + offset_millis / 1000 - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            frame = self.retrieve() if self._trigger.needs_frame else None
+            motion = self._trigger.update(self._timestamp_millis, frame)
+            if motion != self._motion:
+                self._motion = motion
+                logger.info(f"{self._camera_name} motion: {motion}")
+
+            if motion:
+                return True
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        # Frames are decoded once, the trigger may have needed them already
+        if self._frame is None:
+            self._frame = self._reader.retrieve()
+
+        return self._frame
+
+    def timestamp_millis(self) -> Optional[int]:
+        return self._timestamp_millis
+
+    def frame_shape(self) -> Tuple[int, int, int]:
+        return self._reader.frame_shape()
+
+    def release(self):
+        self._reader.release()
@@ -0,0 +1,219 @@
+import ctypes
+import weakref
+from collections import deque
+from multiprocessing.context import BaseContext
+from typing import Any, Deque, List, Optional, Tuple
+
+import numpy as np
+
+from ..tracing.trace import TRACER
+from ..utils.rectangle import Rectangle
+from .feed_multiplexer import CameraFeedMultiplexer
+from .image import CameraImageContainer, PixelFormat
+
+# Slot is free when neither side holds it
+WRITER_HOLD = 1
+READER_HOLD = 2
+
+
+class FrameTooLargeError(ValueError):
+    pass
+
+
+class SharedFrameHandle:
+    camera_name: str
+    slot: int
+    shape: Tuple[int, ...]
+    dimensions: List[Rectangle]
+    created_at: int
+    pixel_format: PixelFormat
+    motion: Optional[List[Rectangle]]
+
+    def __init__(
+        self,
+        camera_name: str,
+        slot: int,
+        shape: Tuple[int, ...],
+        dimensions: List[Rectangle],
+        created_at: int,
+        pixel_format: PixelFormat,
+        motion: Optional[List[Rectangle]] = None,
+    ):
+        self.camera_name = camera_name
+        self.slot = slot
+        self.shape = shape
+        self.dimensions = dimensions
+        self.created_at = created_at
+        self.pixel_format = pixel_format
+        self.motion = motion
+
+    def __repr__(self) -> str:
+        kws = [f"{key}={value!r}" for key, value in self.__dict__.items()]
+        return f"{self.__class__.__name__}({', '.join(kws)})"
+
+
+class SharedFrameRingBuffer:
+    def __init__(self, ctx: BaseContext, slots: int, slot_size: int):
+        self._slots = slots
+        self._slot_size = slot_size
+        self._buffer = ctx.RawArray(ctypes.c_uint8, slots * slot_size)
+        self._states = ctx.Array(ctypes.c_uint8, slots)
+
+    @property
+    def slot_size(self) -> int:
+        return self._slot_size
+
+    def view(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        if not self.fits(shape):
+            raise FrameTooLargeError(
+                f"Frame of shape {shape} does not fit into slot of {self._slot_size} bytes"
+            )
+
+        size = int(np.prod(shape))
+
+        return np.frombuffer(
+            self._buffer, dtype=np.uint8, count=size, offset=slot * self._slot_size
+        ).reshape(shape)
+
+    def fits(self, shape: Tuple[int, ...]) -> bool:
+        return int(np.prod(shape)) <= self._slot_size
+
+    def slot_of(self, image_np: np.ndarray) -> Optional[int]:
+        offset = image_np.__array_interface__["data"][0] - ctypes.addressof(
+            self._buffer
+        )
+        if offset < 0 or offset >= self._slots * self._slot_size:
+            return None
+        return offset // self._slot_size
+
+    def has_free_slot(self) -> bool:
+        with self._states.get_lock():
+            return any(state == 0 for state in self._states.get_obj())
+
+    def acquire(self) -> Optional[int]:
+        with self._states.get_lock():
+            states: Any = self._states.get_obj()
+            for slot in range(self._slots):
+                if states[slot] == 0:
+                    states[slot] = WRITER_HOLD
+                    return slot
+        return None
+
+    def hold(self, slot: int, holder: int):
+        with self._states.get_lock():
+            states: Any = self._states.get_obj()
+            states[slot] = int(states[slot]) | holder
+
+    def release(self, slot: int, holder: int):
+        with self._states.get_lock():
+            states: Any = self._states.get_obj()
+            states[slot] = int(states[slot]) & ~holder
+
+    def create_image(self, handle: SharedFrameHandle) -> CameraImageContainer:
+        # Every view of the frame, including crops, keeps the flat buffer alive,
+        # so the slot goes back to the writer once the last of them is gone.
+        # Frames in flight are bounded by the ring, the writer reports busy
+        # and the camera drops frames while every slot is taken
+        flat_np = np.frombuffer(
+            self._buffer,
+            dtype=np.uint8,
+            count=int(np.prod(handle.shape)),
+            offset=handle.slot * self._slot_size,
+        )
+        weakref.finalize(flat_np, self.release, handle.slot, READER_HOLD)
+
+        return CameraImageContainer.create(
+            handle.camera_name,
+            flat_np.reshape(handle.shape),
+            handle.dimensions,
+            created_at=handle.created_at,
+            pixel_format=handle.pixel_format,
+            motion=handle.motion,
+        )
+
+
+class SharedFrameWriter:
+    def __init__(self, ring: SharedFrameRingBuffer, handle_queue: Any, pending: Any):
+        self._ring = ring
+        self._handle_queue = handle_queue
+        self._pending = pending
+        # Frame currently being processed by the writer
+        self._held_slots: Deque[int] = deque()
+
+    def contains(self, camera_name: str) -> bool:
+        return self._pending.is_set() or not self._ring.has_free_slot()
+
+    def allocate(self, shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        if not self._ring.fits(shape):
+            raise FrameTooLargeError(f"Frame of shape {shape} does not fit into slot")
+
+        slot = self._ring.acquire()
+        if slot is None:
+            return None
+
+        self._held_slots.append(slot)
+        while len(self._held_slots) > 1:
+            self._ring.release(self._held_slots.popleft(), WRITER_HOLD)
+
+        return self._ring.view(slot, shape)
+
+    def put_nowait(self, img: CameraImageContainer):
+        slot = self._ring.slot_of(img.raw_image_np)
+        if slot is None:
+            raise ValueError("Image is not backed by shared memory")
+
+        self._ring.hold(slot, READER_HOLD)
+        self._pending.set()
+        self._handle_queue.put(
+            SharedFrameHandle(
+                img.camera_name,
+                slot,
+                img.raw_image_np.shape,
+                img.dimensions,
+                img.created_at,
+                img.pixel_format,
+                img.motion,
+            )
+        )
+
+    def reset(self):
+        while len(self._held_slots) > 0:
+            self._ring.release(self._held_slots.popleft(), WRITER_HOLD)
+
+
+class SharedFrameReader:
+    def __init__(
+        self,
+        ring: SharedFrameRingBuffer,
+        handle_queue: Any,
+        pending: Any,
+        feed_multiplexer: CameraFeedMultiplexer,
+    ):
+        self._ring = ring
+        self._handle_queue = handle_queue
+        self._pending = pending
+        self._feed_multiplexer = feed_multiplexer
+
+    def forward(self, timeout: float) -> Optional[str]:
+        handle: SharedFrameHandle = self._handle_queue.get(timeout=timeout)
+
+        # Frames of camera processes are traced from the handoff on
+        img = self._ring.create_image(handle)
+        img.trace = TRACER.start_trace(handle.camera_name)
+        if img.trace is not None:
+            img.trace.enqueue("camera_feed")
+
+        try:
+            self._feed_multiplexer.put_nowait(img)
+        except CameraFeedMultiplexer.Full:
+            self._pending.clear()
+            TRACER.finish(img.trace, "dropped")
+            return None
+
+        return handle.camera_name
+
+    def wait_taken(self, camera_name: str, timeout: float) -> bool:
+        if self._feed_multiplexer.wait_taken(camera_name, timeout):
+            self._pending.clear()
+            return True
+        return False
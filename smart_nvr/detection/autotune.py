@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+from itertools import cycle, islice
+from typing import Dict, List, Optional, Set
+
+import cv2
+from pydantic import BaseModel
+
+from ..app_config import AutotuneConfig
+from ..camera.image import CameraImageContainer, get_split_image_dimensions
+from .base_model import BaseDetectionModel
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+class TunedSettings(BaseModel):
+    backend: str
+    threads: int
+    batch_size: int
+    image_size: Optional[int]
+    latency_millis: float
+    crops_per_second: float
+
+
+def thread_candidates(config: AutotuneConfig) -> List[int]:
+    if len(config.threads) > 0:
+        return config.threads
+
+    cpu_count = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpu_count:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpu_count:
+        counts.append(cpu_count)
+    return counts
+
+
+def load_tuning_crops(directory: str) -> List[CameraImageContainer]:
+    # Every crop becomes its own image, so batches hold an exact crop count
+    crops = []
+    for file_name in sorted(os.listdir(directory)):
+        if os.path.splitext(file_name)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+
+        raw_image_np = cv2.imread(os.path.join(directory, file_name))
+        if raw_image_np is None:
+            continue
+
+        for dimensions in get_split_image_dimensions(raw_image_np):
+            crops.append(
+                CameraImageContainer.create("autotune", raw_image_np, [dimensions])
+            )
+
+    if len(crops) == 0:
+        raise ValueError(f"No images to tune on in {directory}")
+    return crops
+
+
+def cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def cache_key(model_name: str, backends: List[str], config: AutotuneConfig) -> str:
+    # Settings follow the hardware and available backends, not the host name,
+    # changed candidates or budget invalidate them as well
+    fingerprint = hashlib.sha1(
+        "\n".join(
+            [
+                cpu_model(),
+                str(os.cpu_count()),
+                ",".join(backends),
+                config.json(exclude={"enabled", "cache_path"}),
+            ]
+        ).encode()
+    ).hexdigest()[:12]
+    return f"{model_name}:{fingerprint}"
+
+
+def read_cache(cache_path: str) -> Dict[str, TunedSettings]:
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+        return {key: TunedSettings.parse_obj(value) for key, value in data.items()}
+    except FileNotFoundError:
+        return {}
+    except Exception as error:
+        logger.warning(f"Ignoring unreadable autotune cache {cache_path}: {error}")
+        return {}
+
+
+def write_cache(cache_path: str, cache: Dict[str, TunedSettings]):
+    directory = os.path.dirname(cache_path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+
+    # Written aside and renamed, so an interrupted write keeps the old cache
+    temporary_path = f"{cache_path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump({key: settings.dict() for key, settings in cache.items()}, f)
+    os.replace(temporary_path, cache_path)
+
+
+def apply_settings(model: BaseDetectionModel, settings: TunedSettings):
+    cv2.setNumThreads(settings.threads)
+    model.apply_tuning(settings.backend, settings.threads, settings.image_size)
+
+
+def detected_names(
+    model: BaseDetectionModel, crops: List[CameraImageContainer]
+) -> Set[str]:
+    return {
+        detection.name
+        for detections in model.detect_batch(crops)
+        for detection in detections
+    }
+
+
+def measure_latency(
+    model: BaseDetectionModel, imgs: List[CameraImageContainer], runs: int
+) -> float:
+    model.detect_batch(imgs)
+
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        model.detect_batch(imgs)
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples)
+
+
+def select_settings(
+    candidates: List[TunedSettings], latency_budget_millis: float
+) -> TunedSettings:
+    within_budget = [
+        settings
+        for settings in candidates
+        if settings.latency_millis <= latency_budget_millis
+    ]
+    if len(within_budget) == 0:
+        logger.warning(
+            f"No configuration within {latency_budget_millis} ms, "
+            "using the one with the lowest latency"
+        )
+        return min(candidates, key=lambda settings: settings.latency_millis)
+
+    return max(within_budget, key=lambda settings: settings.crops_per_second)
+
+
+def tune_candidates(
+    model: BaseDetectionModel, config: AutotuneConfig
+) -> List[TunedSettings]:
+    crops = load_tuning_crops(config.images_directory)
+    # Candidates have to find everything the model finds as configured
+    expected_names = detected_names(model, crops)
+
+    threads_list = thread_candidates(config)
+    image_sizes: List[Optional[int]] = [*config.image_sizes] or [None]
+
+    candidates: List[TunedSettings] = []
+    # Only the picked setting stays applied, the thread count is process wide
+    previous_threads = cv2.getNumThreads()
+    try:
+        for backend in model.tuning_backends():
+            for image_size in image_sizes:
+                try:
+                    model.apply_tuning(backend, threads_list[0], image_size)
+                    names = detected_names(model, crops)
+                except Exception as error:
+                    logger.warning(f"Autotune skipped {backend}/{image_size}: {error}")
+                    continue
+
+                if not expected_names.issubset(names):
+                    logger.info(
+                        f"Autotune skipped {backend}/{image_size}, "
+                        f"missed {sorted(expected_names - names)}"
+                    )
+                    continue
+
+                for threads in threads_list:
+                    cv2.setNumThreads(threads)
+                    model.apply_tuning(backend, threads, image_size)
+
+                    # Larger batches only get slower once over the budget
+                    for batch_size in sorted(config.batch_sizes):
+                        imgs = list(islice(cycle(crops), batch_size))
+                        latency = measure_latency(model, imgs, config.runs)
+                        settings = TunedSettings(
+                            backend=backend,
+                            threads=threads,
+                            batch_size=batch_size,
+                            image_size=image_size,
+                            latency_millis=latency * 1000,
+                            crops_per_second=batch_size / latency,
+                        )
+                        logger.info(f"Autotune candidate {settings}")
+                        candidates.append(settings)
+
+                        if settings.latency_millis > config.latency_budget_millis:
+                            break
+    finally:
+        cv2.setNumThreads(previous_threads)
+
+    return candidates
+
+
+def tune_model(
+    model: BaseDetectionModel, model_name: str, config: AutotuneConfig
+) -> TunedSettings:
+    key = cache_key(model_name, model.tuning_backends(), config)
+    cache = read_cache(config.cache_path)
+
+    settings = cache.get(key)
+    if settings is not None:
+        logger.info(f"Using cached autotune settings {settings}")
+    else:
+        t = time.perf_counter()
+        candidates = tune_candidates(model, config)
+        if len(candidates) == 0:
+            raise ValueError("Autotune found no working configuration")
+
+        settings = select_settings(candidates, config.latency_budget_millis)
+        logger.info(
+            f"Autotune picked {settings} out of {len(candidates)} candidates "
+            f"in {time.perf_counter() - t:.1f} s"
+        )
+
+        cache[key] = settings
+        write_cache(config.cache_path, cache)
+
+    apply_settings(model, settings)
+    return settings
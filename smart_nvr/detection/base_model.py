@@ -1,8 +1,12 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 
+from ..app_config import ModelConfig
 from ..camera.image import CameraImageContainer
 from ..utils.rectangle import Rectangle
 from .detection_types import Detection
+from .post_processing import LabelLookup
+
+DEFAULT_BACKEND = "default"
 
 
 def adjust_cropped_detection(detection: Detection, dimensions: Rectangle) -> Detection:
@@ -13,14 +17,48 @@ def adjust_cropped_detection(detection: Detection, dimensions: Rectangle) -> Det
         y1=detection.rectangle.y1 + dimensions.y1,
         x2=detection.rectangle.x2 + dimensions.x1,
         y2=detection.rectangle.y2 + dimensions.y1,
+        track_id=detection.track_id,
     )
 
 
 class BaseDetectionModel:
+    _label_allowlist: Optional[List[str]] = None
+    _label_lookup: Optional[LabelLookup] = None
+
+    def configure(self, config: ModelConfig):
+        # Backend specific settings, applied before loading
+        pass
+
     def load(self):
         raise NotImplementedError()
 
+    def tuning_backends(self) -> List[str]:
+        # Inference backends available on this host, tried by the autotuner
+        return [DEFAULT_BACKEND]
+
+    def apply_tuning(self, backend: str, threads: int, image_size: Optional[int]):
+        # Image size of None keeps the input size of the model
+        pass
+
+    def labels(self) -> Union[Dict[int, str], Sequence[str]]:
+        raise NotImplementedError()
+
+    def set_label_allowlist(self, names: Optional[Iterable[str]]):
+        # Detections of other labels are dropped while decoding model output
+        self._label_allowlist = list(names) if names is not None else None
+        self._label_lookup = None
+
+    def label_lookup(self) -> LabelLookup:
+        if self._label_lookup is None:
+            self._label_lookup = LabelLookup(self.labels(), self._label_allowlist)
+        return self._label_lookup
+
     def detect(
         self, img: CameraImageContainer, threshold: float = 0.5
-    ) -> List[Detection]:
+    ) -> Sequence[Detection]:
         raise NotImplementedError()
+
+    def detect_batch(
+        self, imgs: List[CameraImageContainer], threshold: float = 0.5
+    ) -> List[Sequence[Detection]]:
+        return [self.detect(img, threshold) for img in imgs]
@@ -1,79 +1,268 @@
-from collections import defaultdict
-from functools import reduce
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union, overload
 
+import numpy as np
+
+from ..utils.box_merging import (
+    VECTORIZE_MIN_BOXES,
+    group_boxes,
+    group_rows,
+    group_starts,
+    non_max_suppression,
+)
 from ..utils.rectangle import Rectangle
 
+NO_TRACK_ID = -1
+
+DETECTION_DTYPE = np.dtype(
+    [
+        ("class_id", np.int32),
+        ("confidence", np.float64),
+        # x1, y1, x2, y2
+        ("box", np.int64, (4,)),
+        ("track_id", np.int64),
+        # Image or crop the detection belongs to
+        ("index", np.int32),
+    ]
+)
+
 
 class Detection:
+    __slots__ = ("name", "confidence", "rectangle", "track_id")
+
     name: str
     confidence: float
     rectangle: Rectangle
+    track_id: Optional[int]
 
     def __init__(
-        self, name: str, confidence: float, x1: int, y1: int, x2: int, y2: int
+        self,
+        name: str,
+        confidence: float,
+        x1: int,
+        y1: int,
+        x2: int,
+        y2: int,
+        track_id: Optional[int] = None,
     ):
         self.name = name
         self.confidence = confidence
         self.rectangle = Rectangle(x1, y1, x2, y2)
+        self.track_id = track_id
 
     def __repr__(self) -> str:
-        kws = [f"{key}={value!r}" for key, value in self.__dict__.items()]
+        kws = [f"{key}={getattr(self, key)!r}" for key in self.__slots__]
         return f"{self.__class__.__name__}({', '.join(kws)})"
 
 
-def outer_box_detections(detections: List[Detection]) -> Detection:
-    name = detections[0].name
-    confidence = max([d.confidence for d in detections])
+class DetectionBatch(Sequence[Detection]):
+    # Detections of a frame stored as one structured array, Detection objects
+    # are only created when iterated
+    __slots__ = ("array", "names")
 
-    return Detection(
-        name,
-        confidence,
-        min([d.rectangle.x1 for d in detections]),
-        min([d.rectangle.y1 for d in detections]),
-        min([d.rectangle.x2 for d in detections]),
-        min([d.rectangle.y2 for d in detections]),
-    )
+    array: np.ndarray
+    names: List[str]
 
+    def __init__(self, array: np.ndarray, names: List[str]):
+        self.array = array
+        self.names = names
 
-def merge_detections(
-    detections: List[Detection], overlap_ratio_threshold: float = 0.65
-) -> List[Detection]:
-    detection_groups_map: Dict[str, List[List[Detection]]] = defaultdict(list)
-
-    for detection in detections:
-        detection_grouped = False
-        detection_groups = detection_groups_map[detection.name]
-
-        for detection_group in detection_groups:
-            for other_detection in detection_group:
-                smaller_area = min(
-                    detection.rectangle.area, other_detection.rectangle.area
-                )
-                if (
-                    detection.rectangle.overlap_area(other_detection.rectangle)
-                    > overlap_ratio_threshold * smaller_area
-                ):
-                    detection_group.append(detection)
-                    detection_grouped = True
-                    break
-
-            if detection_grouped:
-                break
-
-        if not detection_grouped:
-            detection_groups.append([detection])
-
-        detection_groups_map[detection.name] = sorted(
-            detection_groups, key=lambda detection_group: len(detection_group)
+    @classmethod
+    def empty(cls, names: List[str]) -> "DetectionBatch":
+        return cls(np.zeros(0, dtype=DETECTION_DTYPE), names)
+
+    @classmethod
+    def create(
+        cls,
+        names: List[str],
+        class_ids: np.ndarray,
+        confidences: np.ndarray,
+        boxes: np.ndarray,
+        indices: Optional[np.ndarray] = None,
+    ) -> "DetectionBatch":
+        array = np.zeros(len(class_ids), dtype=DETECTION_DTYPE)
+        array["class_id"] = class_ids
+        array["confidence"] = confidences
+        array["box"] = boxes
+        array["track_id"] = NO_TRACK_ID
+        if indices is not None:
+            array["index"] = indices
+        return cls(array, names)
+
+    @classmethod
+    def from_detections(cls, detections: Iterable[Detection]) -> "DetectionBatch":
+        if isinstance(detections, DetectionBatch):
+            return detections
+
+        class_ids: Dict[str, int] = {}
+        rows = [
+            (
+                class_ids.setdefault(d.name, len(class_ids)),
+                d.confidence,
+                (d.rectangle.x1, d.rectangle.y1, d.rectangle.x2, d.rectangle.y2),
+                d.track_id if d.track_id is not None else NO_TRACK_ID,
+                0,
+            )
+            for d in detections
+        ]
+        return cls(np.array(rows, dtype=DETECTION_DTYPE), list(class_ids))
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    @overload
+    def __getitem__(self, index: int) -> Detection:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "DetectionBatch":
+        ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[Detection, "DetectionBatch"]:
+        if isinstance(index, slice):
+            return DetectionBatch(self.array[index], self.names)
+        return self.detection(self.array[index])
+
+    def __iter__(self) -> Iterator[Detection]:
+        for row in self.array:
+            yield self.detection(row)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+    def detection(self, row: np.void) -> Detection:
+        x1, y1, x2, y2 = row["box"].tolist()
+        track_id = int(row["track_id"])
+        return Detection(
+            self.names[row["class_id"]],
+            float(row["confidence"]),
+            x1,
+            y1,
+            x2,
+            y2,
+            track_id=track_id if track_id != NO_TRACK_ID else None,
+        )
+
+    @property
+    def boxes(self) -> np.ndarray:
+        return self.array["box"]
+
+    def select(self, indices: np.ndarray) -> "DetectionBatch":
+        return DetectionBatch(self.array[indices], self.names)
+
+    def split(self, count: int) -> List["DetectionBatch"]:
+        # One batch per image index, keeping the order within every image
+        order = np.argsort(self.array["index"], kind="stable")
+        bounds = np.searchsorted(self.array["index"][order], np.arange(count + 1))
+        return [
+            DetectionBatch(self.array[order[start:end]], self.names)
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def filter_names(self, names: Iterable[str]) -> "DetectionBatch":
+        names_set = set(names)
+        class_ids = [
+            class_id for class_id, name in enumerate(self.names) if name in names_set
+        ]
+        return self.select(np.isin(self.array["class_id"], class_ids))
+
+    def merge(self, overlap_ratio_threshold: float = 0.65) -> "DetectionBatch":
+        if len(self) <= 1:
+            return self
+
+        labels = group_boxes(
+            self.boxes, overlap_ratio_threshold, self.array["class_id"]
+        )
+
+        # Groups in order, tracked detections first and most confident first,
+        # so the first row of a group names its track
+        order = np.lexsort(
+            (
+                -self.array["confidence"],
+                self.array["track_id"] == NO_TRACK_ID,
+                labels,
+            )
         )
+        rows = self.array[order]
+        starts = group_starts(labels[order])
+
+        merged = rows[starts]
+        merged["confidence"] = np.maximum.reduceat(rows["confidence"], starts)
+        merged["box"][:, :2] = np.minimum.reduceat(rows["box"][:, :2], starts)
+        merged["box"][:, 2:] = np.maximum.reduceat(rows["box"][:, 2:], starts)
+        return DetectionBatch(merged, self.names)
+
+    def suppress(self, iou_threshold: float = 0.5) -> "DetectionBatch":
+        # Keeps the most confident of overlapping detections of the same class
+        if len(self) <= 1:
+            return self
+
+        return self.select(
+            non_max_suppression(
+                self.boxes,
+                self.array["confidence"],
+                iou_threshold,
+                self.array["class_id"],
+            )
+        )
+
 
-    detection_groups = reduce(
-        lambda acc, detection_groups: [*acc, *detection_groups],
-        detection_groups_map.values(),
-        [],
+def merge_detections(
+    detections: Sequence[Detection], overlap_ratio_threshold: float = 0.65
+) -> Sequence[Detection]:
+    if isinstance(detections, DetectionBatch) or len(detections) >= VECTORIZE_MIN_BOXES:
+        return DetectionBatch.from_detections(detections).merge(overlap_ratio_threshold)
+
+    # A handful of detections merges faster without building the array
+    class_ids: Dict[str, int] = {}
+    labels = group_rows(
+        [
+            (d.rectangle.x1, d.rectangle.y1, d.rectangle.x2, d.rectangle.y2)
+            for d in detections
+        ],
+        overlap_ratio_threshold,
+        [class_ids.setdefault(d.name, len(class_ids)) for d in detections],
     )
 
-    return [
-        outer_box_detections(detection_group) for detection_group in detection_groups
-    ]
+    groups: Dict[int, List[Detection]] = {}
+    for label, detection in zip(labels, detections):
+        groups.setdefault(label, []).append(detection)
+
+    merged = []
+    for group in groups.values():
+        if len(group) == 1:
+            merged.append(group[0])
+            continue
+
+        # Named after the tracked and most confident detection, as in
+        # DetectionBatch.merge
+        first = group[0]
+        x1, y1, x2, y2 = (
+            first.rectangle.x1,
+            first.rectangle.y1,
+            first.rectangle.x2,
+            first.rectangle.y2,
+        )
+        confidence = first.confidence
+        for d in group[1:]:
+            if (d.track_id is not None, d.confidence) > (
+                first.track_id is not None,
+                first.confidence,
+            ):
+                first = d
+            r = d.rectangle
+            confidence = max(confidence, d.confidence)
+            x1, y1 = min(x1, r.x1), min(y1, r.y1)
+            x2, y2 = max(x2, r.x2), max(y2, r.y2)
+
+        merged.append(
+            Detection(first.name, confidence, x1, y1, x2, y2, track_id=first.track_id)
+        )
+    return merged
+
+
+def suppress_detections(
+    detections: Sequence[Detection], iou_threshold: float = 0.5
+) -> DetectionBatch:
+    return DetectionBatch.from_detections(detections).suppress(iou_threshold)
@@ -1,15 +1,30 @@
-from typing import Dict, Type
+import importlib
+from typing import Dict, Tuple, Type
 
 from ..app_config import ModelNameEnum
 from ..detection.base_model import BaseDetectionModel
-from ..detection.opencv import (
-    OpenCVTensorflowSSDLiteMobilenetDetectionModel,
-    OpenCVTensorflowSSDMobilenetDetectionModel,
-)
-from ..detection.yolo import YoloSDetectionModel
-
-MODEL_MAP: Dict[ModelNameEnum, Type[BaseDetectionModel]] = {
-    ModelNameEnum.yolo_v5_s: YoloSDetectionModel,
-    ModelNameEnum.tf_ssd_mobilenet_v2: OpenCVTensorflowSSDMobilenetDetectionModel,
-    ModelNameEnum.tf_ssdlite_mobilenet_v2: OpenCVTensorflowSSDLiteMobilenetDetectionModel,
+
+# Modules are imported once their model is used, so unused backends and their
+# libraries stay out of the startup
+MODEL_MAP: Dict[ModelNameEnum, Tuple[str, str]] = {
+    ModelNameEnum.yolo_v5_s: (".yolo", "YoloSDetectionModel"),
+    ModelNameEnum.tf_ssd_mobilenet_v2: (
+        ".opencv",
+        "OpenCVTensorflowSSDMobilenetDetectionModel",
+    ),
+    ModelNameEnum.tf_ssdlite_mobilenet_v2: (
+        ".opencv",
+        "OpenCVTensorflowSSDLiteMobilenetDetectionModel",
+    ),
+    ModelNameEnum.yolo_v5_s_onnx: (".onnx_runtime", "OnnxYoloSDetectionModel"),
+    ModelNameEnum.yolo_v5_s_onnx_int8: (
+        ".onnx_runtime",
+        "OnnxYoloSInt8DetectionModel",
+    ),
 }
+
+
+def get_model_class(model_name: ModelNameEnum) -> Type[BaseDetectionModel]:
+    module_name, class_name = MODEL_MAP[model_name]
+    module = importlib.import_module(module_name, package=__package__)
+    return getattr(module, class_name)
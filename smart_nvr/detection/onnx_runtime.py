@@ -0,0 +1,246 @@
+import ast
+import logging
+import os.path
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+from typing_extensions import Literal
+
+from ..app_config import ModelConfig, OnnxRuntimeConfig
+from ..camera.image import CameraImageContainer, PixelFormat
+from ..utils.box_merging import non_max_suppression
+from ..utils.rectangle import Rectangle
+from .base_model import BaseDetectionModel
+from .detection_types import Detection, DetectionBatch
+from .opencv import MODEL_DIR
+from .post_processing import LabelLookup, decode_detections
+
+logger = logging.getLogger(__name__)
+
+OnnxModelName = Union[Literal["yolov5s"], Literal["yolov5s.int8"]]
+
+# Input size of models exported without a fixed one
+DEFAULT_IMAGE_SIZE = 640
+LETTERBOX_COLOR = 114
+# Matches the NMS of the YOLOv5 torch hub models
+YOLO_IOU_THRESHOLD = 0.45
+
+# fmt: off
+YOLO_COCO_LABELS = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat", "traffic light",
+    "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog", "horse", "sheep", "cow",
+    "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella", "handbag", "tie", "suitcase", "frisbee",
+    "skis", "snowboard", "sports ball", "kite", "baseball bat", "baseball glove", "skateboard", "surfboard",
+    "tennis racket", "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch",
+    "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard",
+    "cell phone", "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase",
+    "scissors", "teddy bear", "hair drier", "toothbrush",
+]
+# fmt: on
+
+
+def letterbox(
+    img: np.ndarray, size: int, out: np.ndarray
+) -> Tuple[float, Tuple[int, int]]:
+    # Resized keeping the aspect ratio and centered on a padded square
+    height, width = img.shape[:2]
+    scale = min(size / height, size / width)
+    resized_width, resized_height = int(round(width * scale)), int(
+        round(height * scale)
+    )
+    pad_x, pad_y = (size - resized_width) // 2, (size - resized_height) // 2
+
+    if (resized_width, resized_height) != (width, height):
+        img = cv2.resize(
+            img, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR
+        )
+
+    out[...] = LETTERBOX_COLOR
+    out[pad_y : pad_y + resized_height, pad_x : pad_x + resized_width] = img
+    return scale, (pad_x, pad_y)
+
+
+def decode_yolo_output(
+    output: np.ndarray,
+    scales: np.ndarray,
+    pads: np.ndarray,
+    crops: List[Tuple[int, Rectangle, np.ndarray]],
+    images_count: int,
+    label_lookup: LabelLookup,
+    threshold: float,
+    iou_threshold: float = YOLO_IOU_THRESHOLD,
+) -> List[DetectionBatch]:
+    # Rows are [cx, cy, w, h, objectness, class scores...] in letterboxed
+    # pixels, objectness alone already drops most of them
+    crop_indices, anchors = np.nonzero(output[..., 4] > threshold)
+    rows = output[crop_indices, anchors]
+
+    class_scores = rows[:, 5:] * rows[:, 4:5]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(rows)), class_ids]
+
+    keep = scores > threshold
+    rows, crop_indices = rows[keep], crop_indices[keep]
+    class_ids, scores = class_ids[keep], scores[keep]
+
+    half_sizes = rows[:, 2:4] / 2
+    boxes = np.concatenate(
+        [rows[:, 0:2] - half_sizes, rows[:, 0:2] + half_sizes], axis=1
+    )
+    boxes = (boxes - np.tile(pads[crop_indices], 2)) / scales[crop_indices, None]
+
+    crop_sizes = np.array(
+        [[crop.shape[1], crop.shape[0]] for _, _, crop in crops], dtype=np.float32
+    ).reshape(-1, 2)
+    boxes = np.clip(boxes, 0, np.tile(crop_sizes[crop_indices], 2))
+
+    # Boxes only suppress boxes of the same class in the same crop
+    nms_keep = non_max_suppression(
+        boxes,
+        scores,
+        iou_threshold,
+        classes=crop_indices * (class_scores.shape[1] + 1) + class_ids,
+    )
+
+    return decode_detections(
+        boxes=boxes[nms_keep],
+        scores=scores[nms_keep],
+        class_ids=class_ids[nms_keep],
+        crop_indices=crop_indices[nms_keep],
+        crop_dimensions=[dimensions for _, dimensions, _ in crops],
+        crop_image_indices=[img_index for img_index, _, _ in crops],
+        images_count=images_count,
+        label_lookup=label_lookup,
+        threshold=threshold,
+    )
+
+
+class OnnxDetectionModel(BaseDetectionModel):
+    _session: Any
+    _labels: Optional[Union[Dict[int, str], Sequence[str]]] = None
+
+    def __init__(self):
+        self._config = OnnxRuntimeConfig()
+
+    def model_name(self) -> OnnxModelName:
+        raise NotImplementedError()
+
+    def model_path(self) -> str:
+        return os.path.join(MODEL_DIR, f"{self.model_name()}.onnx")
+
+    def configure(self, config: ModelConfig):
+        self._config = config.onnx
+
+    def labels(self) -> Union[Dict[int, str], Sequence[str]]:
+        return self._labels if self._labels is not None else YOLO_COCO_LABELS
+
+    def apply_tuning(self, backend: str, threads: int, image_size: Optional[int]):
+        # Sessions are created with their thread pools
+        if threads != self._config.intra_op_threads:
+            self._config = self._config.copy(update={"intra_op_threads": threads})
+            self.load()
+
+    def load(self):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        options.intra_op_num_threads = self._config.intra_op_threads
+        options.inter_op_num_threads = self._config.inter_op_threads
+        if self._config.inter_op_threads > 0:
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+
+        self._session = onnxruntime.InferenceSession(
+            self.model_path(), options, providers=["CPUExecutionProvider"]
+        )
+
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        # Symbolic batch axis of exports with dynamic shapes
+        self._dynamic_batch = not isinstance(model_input.shape[0], int)
+        self._image_size = (
+            model_input.shape[2]
+            if isinstance(model_input.shape[2], int)
+            else DEFAULT_IMAGE_SIZE
+        )
+
+        # YOLOv5 exports carry their class names
+        names = self._session.get_modelmeta().custom_metadata_map.get("names")
+        if names is not None:
+            self._labels = ast.literal_eval(names)
+            self._label_lookup = None
+
+        logger.info(
+            f"Loaded {self.model_path()}, batch axis "
+            f"{'dynamic' if self._dynamic_batch else 'static'}"
+        )
+
+    def detect(
+        self, img: CameraImageContainer, threshold: float = 0.5
+    ) -> Sequence[Detection]:
+        return self.detect_batch([img], threshold)[0]
+
+    def detect_batch(
+        self, imgs: List[CameraImageContainer], threshold: float = 0.5
+    ) -> List[Sequence[Detection]]:
+        crops = [
+            (img_index, dimensions, cropped_image)
+            for img_index, img in enumerate(imgs)
+            for dimensions, cropped_image in zip(img.dimensions, img.cropped_images)
+        ]
+
+        if len(crops) == 0:
+            return [[] for _ in imgs]
+
+        size = self._image_size
+        letterboxed = np.empty((len(crops), size, size, 3), dtype=np.uint8)
+        scales = np.empty(len(crops), dtype=np.float32)
+        pads = np.empty((len(crops), 2), dtype=np.float32)
+        for index, (img_index, _, cropped_image) in enumerate(crops):
+            scales[index], pads[index] = letterbox(
+                cropped_image, size, letterboxed[index]
+            )
+            # Model expects RGB input
+            if imgs[img_index].pixel_format == PixelFormat.bgr:
+                letterboxed[index] = letterboxed[index, ..., ::-1]
+
+        blob = letterboxed.transpose(0, 3, 1, 2).astype(np.float32)
+        blob *= 1 / 255.0
+
+        t = time.perf_counter()
+        if self._dynamic_batch:
+            output = self._session.run(None, {self._input_name: blob})[0]
+        else:
+            output = np.concatenate(
+                [
+                    self._session.run(
+                        None, {self._input_name: blob[index : index + 1]}
+                    )[0]
+                    for index in range(len(crops))
+                ]
+            )
+        logger.debug(
+            f"Model infer of {len(crops)} crops took "
+            f"{int((time.perf_counter() - t) * 1000)} ms"
+        )
+
+        batches = decode_yolo_output(
+            output, scales, pads, crops, len(imgs), self.label_lookup(), threshold
+        )
+        return list(batches)
+
+
+class OnnxYoloSDetectionModel(OnnxDetectionModel):
+    def model_name(self) -> OnnxModelName:
+        return "yolov5s"
+
+
+class OnnxYoloSInt8DetectionModel(OnnxDetectionModel):
+    # Weights quantized to int8 by scripts/export_onnx_models.sh
+    def model_name(self) -> OnnxModelName:
+        return "yolov5s.int8"
@@ -1,13 +1,16 @@
 import logging
 import os.path
 import time
-from typing import List, Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 from typing_extensions import Literal
 
-from ..camera.image import CameraImageContainer
-from .base_model import BaseDetectionModel, adjust_cropped_detection
-from .detection_types import Detection
+from ..camera.image import CameraImageContainer, PixelFormat
+from ..utils.rectangle import Rectangle
+from .base_model import BaseDetectionModel
+from .detection_types import Detection, DetectionBatch
+from .post_processing import LabelLookup, decode_detections
 
 logger = logging.getLogger(__name__)
 
@@ -36,13 +39,80 @@ COCO_LABELS = {
 # fmt: on
 
 
+def decode_ssd_output(
+    output: np.ndarray,
+    crops: List[Tuple[int, Rectangle, np.ndarray]],
+    images_count: int,
+    label_lookup: LabelLookup,
+    threshold: float,
+) -> List[DetectionBatch]:
+    # Rows are [crop index, class id, confidence, x1, y1, x2, y2] with
+    # coordinates relative to the crop
+    raw_predictions = output[0, 0, :, :]
+    # Most rows are below the threshold, they are dropped before any math
+    raw_predictions = raw_predictions[raw_predictions[:, 2] > threshold]
+    crop_indices = raw_predictions[:, 0].astype(np.int64)
+    crop_sizes = np.array(
+        [
+            [crop.shape[1], crop.shape[0], crop.shape[1], crop.shape[0]]
+            for _, _, crop in crops
+        ],
+        dtype=np.float32,
+    ).reshape(-1, 4)
+
+    return decode_detections(
+        boxes=raw_predictions[:, 3:7] * crop_sizes[crop_indices],
+        scores=raw_predictions[:, 2],
+        class_ids=raw_predictions[:, 1],
+        crop_indices=crop_indices,
+        crop_dimensions=[dimensions for _, dimensions, _ in crops],
+        crop_image_indices=[img_index for img_index, _, _ in crops],
+        images_count=images_count,
+        label_lookup=label_lookup,
+        threshold=threshold,
+    )
+
+
+def dnn_backends() -> Dict[str, Tuple[int, int]]:
+    import cv2
+
+    # Backend and target pairs usable on this host
+    backends = {"cpu": (cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_CPU)}
+    if cv2.ocl.haveOpenCL():
+        backends["opencl"] = (cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_OPENCL)
+        backends["opencl_fp16"] = (
+            cv2.dnn.DNN_BACKEND_OPENCV,
+            cv2.dnn.DNN_TARGET_OPENCL_FP16,
+        )
+    if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+        backends["cuda"] = (cv2.dnn.DNN_BACKEND_CUDA, cv2.dnn.DNN_TARGET_CUDA)
+        backends["cuda_fp16"] = (
+            cv2.dnn.DNN_BACKEND_CUDA,
+            cv2.dnn.DNN_TARGET_CUDA_FP16,
+        )
+    return backends
+
+
 class OpenCVTensorflowDetectionModel(BaseDetectionModel):
+    _image_size: Optional[Tuple[int, int]] = None
+
     def model_name(self) -> SSDModelName:
         raise NotImplementedError()
 
     def model_image_size(self) -> Tuple[int, int]:
         raise NotImplementedError()
 
+    def image_size(self) -> Tuple[int, int]:
+        # SSD graphs take any input size, the autotuner may pick another one
+        return (
+            self._image_size
+            if self._image_size is not None
+            else self.model_image_size()
+        )
+
+    def labels(self) -> Dict[int, str]:
+        return COCO_LABELS
+
     def load(self):
         import cv2
 
@@ -60,49 +130,64 @@ class OpenCVTensorflowDetectionModel(BaseDetectionModel):
             self._model.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
             self._model.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
 
+    def tuning_backends(self) -> List[str]:
+        return list(dnn_backends())
+
+    def apply_tuning(self, backend: str, threads: int, image_size: Optional[int]):
+        dnn_backend, dnn_target = dnn_backends()[backend]
+        self._model.setPreferableBackend(dnn_backend)
+        self._model.setPreferableTarget(dnn_target)
+        self._image_size = (image_size, image_size) if image_size is not None else None
+
     def detect(
         self, img: CameraImageContainer, threshold: float = 0.5
-    ) -> List[Detection]:
+    ) -> Sequence[Detection]:
+        return self.detect_batch([img], threshold)[0]
+
+    def detect_batch(
+        self, imgs: List[CameraImageContainer], threshold: float = 0.5
+    ) -> List[Sequence[Detection]]:
         import cv2
 
-        detections: List[Detection] = []
-
-        for dimensions, cropped_image in zip(img.dimensions, img.cropped_images):
-            t = int(time.perf_counter() * 1000)
-            model_img = cv2.resize(cropped_image, self.model_image_size())
-            # print(f"Img resize took {int(time.perf_counter() * 1000) - t} ms")
-
-            t = int(time.perf_counter() * 1000)
-            self._model.setInput(
-                cv2.dnn.blobFromImage(
-                    model_img, size=self.model_image_size(), swapRB=True
-                )
-            )
-            # print(f"Model set input took {int(time.perf_counter() * 1000) - t} ms")
-
-            t = int(time.perf_counter() * 1000)
-            output = self._model.forward()
-            logger.debug(f"Model infer took {int(time.perf_counter() * 1000) - t} ms")
-
-            for raw_prediction in output[0, 0, :, :]:
-                confidence = float(raw_prediction[2])
-
-                if confidence > threshold:
-                    detections.append(
-                        adjust_cropped_detection(
-                            Detection(
-                                name=COCO_LABELS.get(int(raw_prediction[1]), "unknown"),
-                                confidence=confidence,
-                                x1=int(raw_prediction[3] * cropped_image.shape[1]),
-                                y1=int(raw_prediction[4] * cropped_image.shape[0]),
-                                x2=int(raw_prediction[5] * cropped_image.shape[1]),
-                                y2=int(raw_prediction[6] * cropped_image.shape[0]),
-                            ),
-                            dimensions,
-                        )
-                    )
-
-        return detections
+        detections: List[Sequence[Detection]] = [[] for _ in imgs]
+
+        crops = [
+            (img_index, dimensions, cropped_image)
+            for img_index, img in enumerate(imgs)
+            for dimensions, cropped_image in zip(img.dimensions, img.cropped_images)
+        ]
+
+        if len(crops) == 0:
+            return detections
+
+        t = int(time.perf_counter() * 1000)
+        model_imgs = [
+            cv2.resize(cropped_image, self.image_size())
+            for _, _, cropped_image in crops
+        ]
+        # Blob is built from BGR, only the small resized crops get converted
+        for index, (img_index, _, _) in enumerate(crops):
+            if imgs[img_index].pixel_format == PixelFormat.rgb:
+                model_imgs[index] = cv2.cvtColor(model_imgs[index], cv2.COLOR_RGB2BGR)
+        # print(f"Img resize took {int(time.perf_counter() * 1000) - t} ms")
+
+        t = int(time.perf_counter() * 1000)
+        # Model expects RGB input
+        self._model.setInput(
+            cv2.dnn.blobFromImages(model_imgs, size=self.image_size(), swapRB=True)
+        )
+        # print(f"Model set input took {int(time.perf_counter() * 1000) - t} ms")
+
+        t = int(time.perf_counter() * 1000)
+        output = self._model.forward()
+        logger.debug(
+            f"Model infer of {len(crops)} crops took {int(time.perf_counter() * 1000) - t} ms"
+        )
+
+        batches = decode_ssd_output(
+            output, crops, len(imgs), self.label_lookup(), threshold
+        )
+        return list(batches)
 
 
 class OpenCVTensorflowSSDMobilenetDetectionModel(OpenCVTensorflowDetectionModel):
@@ -1,6 +1,11 @@
-from typing import Iterable, List
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 
-from .detection_types import Detection
+import numpy as np
+
+from ..utils.rectangle import Rectangle
+from .detection_types import Detection, DetectionBatch
+
+UNKNOWN_LABEL = "unknown"
 
 
 def filter_detections(
@@ -8,3 +13,72 @@ def filter_detections(
 ) -> List[Detection]:
     names_set = set(names)
     return [detection for detection in detections if detection.name in names_set]
+
+
+class LabelLookup:
+    def __init__(
+        self,
+        labels: Union[Dict[int, str], Sequence[str]],
+        allowlist: Optional[Iterable[str]] = None,
+    ):
+        labels_map = labels if isinstance(labels, dict) else dict(enumerate(labels))
+        size = max(labels_map.keys(), default=-1) + 1
+
+        # Last name stands for every class id outside the table
+        self.names = [UNKNOWN_LABEL] * (size + 1)
+        for class_id, name in labels_map.items():
+            self.names[class_id] = name
+
+        # Unknown class ids are only kept without allowlist
+        allowed_names = set(allowlist) if allowlist is not None else None
+        self._allowed = np.array(
+            [allowed_names is None or name in allowed_names for name in self.names],
+            dtype=bool,
+        )
+        if allowed_names is not None:
+            self._allowed[-1] = False
+
+    def name(self, class_id: int) -> str:
+        return self.names[self.class_indices(np.array([class_id]))[0]]
+
+    def class_indices(self, class_ids: np.ndarray) -> np.ndarray:
+        # Indices into names
+        unknown = len(self.names) - 1
+        return np.where(
+            (class_ids >= 0) & (class_ids < unknown), class_ids, unknown
+        ).astype(np.int32)
+
+    def allowed(self, class_ids: np.ndarray) -> np.ndarray:
+        return self._allowed[self.class_indices(class_ids)]
+
+
+def decode_detections(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: np.ndarray,
+    crop_indices: np.ndarray,
+    crop_dimensions: List[Rectangle],
+    crop_image_indices: List[int],
+    images_count: int,
+    label_lookup: LabelLookup,
+    threshold: float,
+) -> List[DetectionBatch]:
+    # Boxes are in pixels of their crop, everything below the threshold or
+    # outside the allowlist is dropped before the batch is built
+    class_ids = class_ids.astype(np.int64)
+    keep = np.flatnonzero((scores > threshold) & label_lookup.allowed(class_ids))
+
+    crop_indices = crop_indices[keep].astype(np.int64)
+    offsets = np.array(
+        [[d.x1, d.y1, d.x1, d.y1] for d in crop_dimensions], dtype=np.int64
+    ).reshape(-1, 4)
+    image_indices = np.array(crop_image_indices, dtype=np.int32)
+
+    batch = DetectionBatch.create(
+        label_lookup.names,
+        class_ids=label_lookup.class_indices(class_ids[keep]),
+        confidences=scores[keep],
+        boxes=boxes[keep].astype(np.int64) + offsets[crop_indices],
+        indices=image_indices[crop_indices],
+    )
+    return batch.split(images_count)
@@ -0,0 +1,269 @@
+from itertools import count
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..app_config import ModelConfig, TrackingConfig
+from ..camera.image import CameraImageContainer
+from ..metrics.pipeline import TRACKING_FRAMES
+from ..utils.rectangle import Rectangle
+from .base_model import BaseDetectionModel
+from .detection_types import Detection
+
+# Weight of the newest measurement in the velocity estimate
+VELOCITY_SMOOTHING = 0.5
+
+Box = Tuple[float, float, float, float]
+
+
+def iou(a: Rectangle, b: Rectangle) -> float:
+    overlap = a.overlap_area(b)
+    union = a.area + b.area - overlap
+    return overlap / union if union > 0 else 0.0
+
+
+class Track:
+    track_id: int
+    name: str
+    confidence: float
+    box: Box
+    velocity: Box
+    updated_at: int
+    hits: int
+    misses: int
+
+    def __init__(self, track_id: int, detection: Detection, timestamp: int):
+        self.track_id = track_id
+        self.name = detection.name
+        self.confidence = detection.confidence
+        self.box = self.detection_box(detection)
+        self.velocity = (0.0, 0.0, 0.0, 0.0)
+        self.updated_at = timestamp
+        self.hits = 1
+        self.misses = 0
+
+    @staticmethod
+    def detection_box(detection: Detection) -> Box:
+        r = detection.rectangle
+        return float(r.x1), float(r.y1), float(r.x2), float(r.y2)
+
+    def predict_box(self, timestamp: int) -> Box:
+        # Constant velocity of every box edge since the last measurement
+        dt = timestamp - self.updated_at
+        x1, y1, x2, y2 = (
+            value + speed * dt for value, speed in zip(self.box, self.velocity)
+        )
+        return x1, y1, x2, y2
+
+    def predict(self, timestamp: int) -> Detection:
+        x1, y1, x2, y2 = self.predict_box(timestamp)
+        return Detection(
+            self.name,
+            self.confidence,
+            int(round(x1)),
+            int(round(y1)),
+            int(round(x2)),
+            int(round(y2)),
+            track_id=self.track_id,
+        )
+
+    def update(self, detection: Detection, timestamp: int):
+        box = self.detection_box(detection)
+        dt = timestamp - self.updated_at
+        if dt > 0:
+            # First velocity is measured, later ones are smoothed
+            weight = 1.0 if self.hits == 1 else VELOCITY_SMOOTHING
+            x1, y1, x2, y2 = (
+                (1 - weight) * speed + weight * (value - previous) / dt
+                for value, previous, speed in zip(box, self.box, self.velocity)
+            )
+            self.velocity = x1, y1, x2, y2
+
+        self.box = box
+        self.confidence = detection.confidence
+        self.updated_at = timestamp
+        self.hits += 1
+        self.misses = 0
+
+
+class MultiObjectTracker:
+    _tracks: List[Track]
+
+    def __init__(self, config: TrackingConfig, track_ids: Iterator[int]):
+        self._config = config
+        self._track_ids = track_ids
+        self._tracks = []
+        self._frames_since_detection: Optional[int] = None
+        self._detected_at = 0
+
+    @property
+    def tracks(self) -> List[Track]:
+        return self._tracks
+
+    def predict(self, timestamp: int) -> List[Detection]:
+        # Tracks missed by the last inference are kept for matching only
+        return [track.predict(timestamp) for track in self._tracks if track.misses == 0]
+
+    def should_detect(self, img: CameraImageContainer) -> bool:
+        if (
+            self._frames_since_detection is None
+            or self._frames_since_detection + 1 >= self._config.detect_interval
+            or img.created_at - self._detected_at > self._config.max_prediction_millis
+        ):
+            return True
+
+        # Velocity of new tracks is only known after their second detection
+        if any(track.hits < 2 and track.misses == 0 for track in self._tracks):
+            return True
+
+        if img.motion is None:
+            return False
+
+        predicted = [detection.rectangle for detection in self.predict(img.created_at)]
+        for motion in img.motion:
+            covered = min(
+                motion.area, sum(motion.overlap_area(box) for box in predicted)
+            )
+            if motion.area > 0 and covered < self._config.motion_coverage * motion.area:
+                return True
+
+        return False
+
+    def skip(self, img: CameraImageContainer) -> List[Detection]:
+        if self._frames_since_detection is not None:
+            self._frames_since_detection += 1
+        return self.predict(img.created_at)
+
+    def update(
+        self, detections: Sequence[Detection], timestamp: int
+    ) -> List[Detection]:
+        # Batches create their detections on access, so they are created once
+        detections = list(detections)
+        self._frames_since_detection = 0
+        self._detected_at = timestamp
+
+        # Greedy association, best overlapping pairs of the same class first
+        predicted = [track.predict(timestamp) for track in self._tracks]
+        candidates = sorted(
+            (
+                (iou(prediction.rectangle, detection.rectangle), track_index, index)
+                for track_index, prediction in enumerate(predicted)
+                for index, detection in enumerate(detections)
+                if prediction.name == detection.name
+            ),
+            reverse=True,
+        )
+
+        matched_tracks: Dict[int, int] = {}
+        track_ids: Dict[int, int] = {}
+        for overlap, track_index, index in candidates:
+            if overlap < self._config.iou_threshold:
+                break
+            if track_index in matched_tracks or index in track_ids:
+                continue
+            matched_tracks[track_index] = index
+            track_ids[index] = self._tracks[track_index].track_id
+
+        tracks: List[Track] = []
+        for track_index, track in enumerate(self._tracks):
+            match = matched_tracks.get(track_index)
+            if match is not None:
+                track.update(detections[match], timestamp)
+            else:
+                track.misses += 1
+                if track.misses > self._config.max_misses:
+                    continue
+            tracks.append(track)
+
+        for index, detection in enumerate(detections):
+            if index not in track_ids:
+                track = Track(next(self._track_ids), detection, timestamp)
+                track_ids[index] = track.track_id
+                tracks.append(track)
+        self._tracks = tracks
+
+        return [
+            Detection(
+                detection.name,
+                detection.confidence,
+                detection.rectangle.x1,
+                detection.rectangle.y1,
+                detection.rectangle.x2,
+                detection.rectangle.y2,
+                track_id=track_ids[index],
+            )
+            for index, detection in enumerate(detections)
+        ]
+
+
+class TrackingDetectionModel(BaseDetectionModel):
+    _trackers: Dict[str, MultiObjectTracker]
+
+    def __init__(self, model: BaseDetectionModel, config: TrackingConfig):
+        self._model = model
+        self._config = config
+        self._trackers = {}
+        # Ids are unique across cameras
+        self._track_ids = count(1)
+
+        self.inference_count = 0
+        self.skipped_count = 0
+        self._inferred_frames = TRACKING_FRAMES.labels("inferred")
+        self._predicted_frames = TRACKING_FRAMES.labels("predicted")
+
+    def configure(self, config: ModelConfig):
+        self._model.configure(config)
+
+    def load(self):
+        self._model.load()
+
+    def tuning_backends(self) -> List[str]:
+        return self._model.tuning_backends()
+
+    def apply_tuning(self, backend: str, threads: int, image_size: Optional[int]):
+        self._model.apply_tuning(backend, threads, image_size)
+
+    def set_label_allowlist(self, names: Optional[Iterable[str]]):
+        self._model.set_label_allowlist(names)
+
+    def get_tracker(self, camera_name: str) -> MultiObjectTracker:
+        tracker = self._trackers.get(camera_name)
+        if tracker is None:
+            tracker = MultiObjectTracker(self._config, self._track_ids)
+            self._trackers[camera_name] = tracker
+        return tracker
+
+    def detect(
+        self, img: CameraImageContainer, threshold: float = 0.5
+    ) -> Sequence[Detection]:
+        return self.detect_batch([img], threshold)[0]
+
+    def detect_batch(
+        self, imgs: List[CameraImageContainer], threshold: float = 0.5
+    ) -> List[Sequence[Detection]]:
+        results: List[Optional[Sequence[Detection]]] = [None] * len(imgs)
+        detect_indices: List[int] = []
+
+        for index, img in enumerate(imgs):
+            tracker = self.get_tracker(img.camera_name)
+            if tracker.should_detect(img):
+                detect_indices.append(index)
+            else:
+                results[index] = tracker.skip(img)
+
+        self.skipped_count += len(imgs) - len(detect_indices)
+        self._predicted_frames.inc(len(imgs) - len(detect_indices))
+        if len(detect_indices) > 0:
+            self.inference_count += len(detect_indices)
+            self._inferred_frames.inc(len(detect_indices))
+            detect_imgs = [imgs[index] for index in detect_indices]
+            if len(detect_imgs) == 1:
+                detections_list = [self._model.detect(detect_imgs[0], threshold)]
+            else:
+                detections_list = self._model.detect_batch(detect_imgs, threshold)
+
+            for index, detections in zip(detect_indices, detections_list):
+                img = imgs[index]
+                results[index] = self.get_tracker(img.camera_name).update(
+                    detections, img.created_at
+                )
+
+        return [detections if detections is not None else [] for detections in results]
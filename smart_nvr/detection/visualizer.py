@@ -24,6 +24,8 @@ class Visualizer:
 
         confidence_percentage = "{0:.0%}".format(detection.confidence)
         label = "{}: {}".format(detection.name, confidence_percentage)
+        if detection.track_id is not None:
+            label = "#{} {}".format(detection.track_id, label)
 
         cv2.putText(
             image_np,
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Set
+
+import cv2
+
+from ..app_config import ModelConfig
+from ..camera.image import CameraImageContainer, get_split_image_dimensions
+from .autotune import cpu_model
+from .base_model import BaseDetectionModel
+
+logger = logging.getLogger(__name__)
+
+WARMUP_IMAGE_PATH = "data/images/cat.jpeg"
+
+
+def warmup_key(model: BaseDetectionModel, config: ModelConfig) -> str:
+    # A model that found the cat once finds it again on the same hardware with
+    # the same backends and runtime settings
+    fingerprint = hashlib.sha1(
+        "\n".join(
+            [
+                cpu_model(),
+                str(os.cpu_count()),
+                ",".join(model.tuning_backends()),
+                config.onnx.json(),
+            ]
+        ).encode()
+    ).hexdigest()[:12]
+    return f"{config.name.value}:{fingerprint}"
+
+
+def read_warmed_up(cache_path: str) -> Set[str]:
+    try:
+        with open(cache_path) as f:
+            return set(json.load(f))
+    except FileNotFoundError:
+        return set()
+    except Exception as error:
+        logger.warning(f"Ignoring unreadable warmup cache {cache_path}: {error}")
+        return set()
+
+
+def write_warmed_up(cache_path: str, keys: Set[str]):
+    directory = os.path.dirname(cache_path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+
+    # Written aside and renamed, so an interrupted write keeps the old cache
+    temporary_path = f"{cache_path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(sorted(keys), f)
+    os.replace(temporary_path, cache_path)
+
+
+def detect_warmup_image(model: BaseDetectionModel):
+    img_raw = cv2.imread(WARMUP_IMAGE_PATH)
+    if img_raw is None:
+        raise FileNotFoundError(f"Warmup image {WARMUP_IMAGE_PATH} not found")
+
+    img = CameraImageContainer.create(
+        "warmup", img_raw, get_split_image_dimensions(img_raw)
+    )
+    detections = model.detect(img)
+    assert "cat" in {d.name for d in detections}
+
+
+def warmup_model(model: BaseDetectionModel, config: ModelConfig):
+    # Cached models skip the check, their first detection on a camera frame
+    # pays for lazy initialization instead
+    key = warmup_key(model, config)
+    warmed_up = read_warmed_up(config.warmup_cache_path)
+    if key in warmed_up:
+        logger.info(f"Skipping warmup of {config.name.value}, passed it before")
+        return
+
+    detect_warmup_image(model)
+    write_warmed_up(config.warmup_cache_path, warmed_up | {key})
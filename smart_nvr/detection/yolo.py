@@ -1,11 +1,12 @@
-from functools import reduce
-from typing import List, Union, cast
+from typing import Dict, List, Sequence, Union
 
+import numpy as np
 from typing_extensions import Literal
 
-from ..camera.image import CameraImageContainer
-from .base_model import BaseDetectionModel, adjust_cropped_detection
+from ..camera.image import CameraImageContainer, PixelFormat
+from .base_model import BaseDetectionModel
 from .detection_types import Detection
+from .post_processing import decode_detections
 
 YoloModelName = Union[
     Literal["yolov5s"], Literal["yolov5m"], Literal["yolov5l"], Literal["yolov5x"]
@@ -18,6 +19,9 @@ class YoloDetectionModel(BaseDetectionModel):
     ) -> YoloModelName:
         raise NotImplementedError()
 
+    def labels(self) -> Union[Dict[int, str], Sequence[str]]:
+        return self._model.names
+
     def load(self):
         import torch
 
@@ -27,37 +31,53 @@ class YoloDetectionModel(BaseDetectionModel):
 
     def detect(
         self, img: CameraImageContainer, threshold: float = 0.5
-    ) -> List[Detection]:
-        result = self._model(img.cropped_images)
-
-        result.print()
-
-        detections_list = [
-            [
-                adjust_cropped_detection(
-                    Detection(
-                        name=result.names[int(raw_prediction[5])],
-                        confidence=float(raw_prediction[4]),
-                        x1=int(raw_prediction[0]),
-                        y1=int(raw_prediction[1]),
-                        x2=int(raw_prediction[2]),
-                        y2=int(raw_prediction[3]),
-                    ),
-                    dimensions,
-                )
-                for raw_prediction in raw_predictions
-                if float(raw_prediction[4]) > threshold
-            ]
-            for dimensions, raw_predictions in zip(img.dimensions, result.pred)
+    ) -> Sequence[Detection]:
+        return self.detect_batch([img], threshold)[0]
+
+    def detect_batch(
+        self, imgs: List[CameraImageContainer], threshold: float = 0.5
+    ) -> List[Sequence[Detection]]:
+        # Model expects RGB input, BGR crops are passed as reversed views
+        crops = [
+            (
+                img_index,
+                dimensions,
+                cropped_image[..., ::-1]
+                if img.pixel_format == PixelFormat.bgr
+                else cropped_image,
+            )
+            for img_index, img in enumerate(imgs)
+            for dimensions, cropped_image in zip(img.dimensions, img.cropped_images)
         ]
 
-        detections = reduce(
-            lambda acc, value: [*acc, *value],
-            detections_list,
-            cast(List[Detection], []),
+        detections_list: List[Sequence[Detection]] = [[] for _ in imgs]
+
+        if len(crops) == 0:
+            return detections_list
+
+        import torch
+
+        result = self._model([cropped_image for _, _, cropped_image in crops])
+
+        # Rows are [x1, y1, x2, y2, confidence, class id] in crop pixels, all
+        # crops are decoded at once
+        raw_predictions = torch.cat(result.pred).cpu().numpy()
+        crop_indices = np.repeat(
+            np.arange(len(crops)), [len(pred) for pred in result.pred]
         )
 
-        return detections
+        batches = decode_detections(
+            boxes=raw_predictions[:, :4],
+            scores=raw_predictions[:, 4],
+            class_ids=raw_predictions[:, 5],
+            crop_indices=crop_indices,
+            crop_dimensions=[dimensions for _, dimensions, _ in crops],
+            crop_image_indices=[img_index for img_index, _, _ in crops],
+            images_count=len(imgs),
+            label_lookup=self.label_lookup(),
+            threshold=threshold,
+        )
+        return list(batches)
 
 
 class YoloSDetectionModel(YoloDetectionModel):
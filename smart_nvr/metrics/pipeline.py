@@ -0,0 +1,60 @@
+from .registry import REGISTRY
+
+WORKER_PROCESSING_SECONDS = REGISTRY.histogram(
+    "smart_nvr_worker_processing_seconds",
+    "Time a worker spent on one item, waiting for input excluded",
+    ("worker",),
+)
+WORKER_ERRORS = REGISTRY.counter(
+    "smart_nvr_worker_errors_total",
+    "Processing iterations that raised",
+    ("worker",),
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "smart_nvr_queue_depth",
+    "Items waiting in a queue between workers",
+    ("queue",),
+)
+FRAMES_DROPPED = REGISTRY.counter(
+    "smart_nvr_frames_dropped_total",
+    "Frames dropped before detection or recording",
+    ("camera", "reason"),
+)
+INFERENCE_SECONDS = REGISTRY.histogram(
+    "smart_nvr_inference_seconds",
+    "Model inference time of one batch",
+    ("model", "crops"),
+)
+TRACKING_FRAMES = REGISTRY.counter(
+    "smart_nvr_tracking_frames_total",
+    "Frames sent to the model or predicted by the tracker",
+    ("result",),
+)
+ENCODED_FRAMES = REGISTRY.counter(
+    "smart_nvr_encoded_frames_total",
+    "Frames written to recordings",
+    ("camera",),
+)
+UPLOADS = REGISTRY.counter(
+    "smart_nvr_uploads_total",
+    "Finished upload attempts",
+    ("result",),
+)
+UPLOADED_BYTES = REGISTRY.counter(
+    "smart_nvr_uploaded_bytes_total",
+    "Bytes of successfully uploaded files",
+)
+UPLOAD_SECONDS = REGISTRY.histogram(
+    "smart_nvr_upload_seconds",
+    "Time of one upload attempt",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+UPLOAD_SPOOL_BYTES = REGISTRY.gauge(
+    "smart_nvr_upload_spool_bytes",
+    "Bytes of files waiting for upload",
+)
+STARTUP_PHASE_SECONDS = REGISTRY.gauge(
+    "smart_nvr_startup_phase_seconds",
+    "Duration of a startup phase, phases may overlap",
+    ("phase",),
+)
@@ -0,0 +1,300 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, LabelValues, Tuple[Tuple[str, str], ...], float]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class CounterValue:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class GaugeValue:
+    __slots__ = ("_value", "_lock", "_function")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        # Evaluated on scrape, nothing is recorded on the hot path
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception:
+                return math.nan
+        return self._value
+
+
+class Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: "HistogramValue"):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class HistogramValue:
+    __slots__ = ("_upper_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self._upper_bounds = upper_bounds
+        # Last count is the +Inf bucket
+        self._counts = [0] * (len(upper_bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> Timer:
+        return Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+
+        cumulative = []
+        count = 0
+        for bucket_count in counts:
+            count += bucket_count
+            cumulative.append(count)
+        return cumulative, total
+
+
+T = TypeVar("T", CounterValue, GaugeValue, HistogramValue)
+
+
+class Metric(Generic[T]):
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Tuple[str, ...] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+
+        self._children: Dict[LabelValues, T] = {}
+        self._lock = threading.Lock()
+
+    def create_child(self) -> T:
+        raise NotImplementedError()
+
+    def labels(self, *values: str) -> T:
+        # Callers on the hot path keep the child instead of looking it up
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(values, self.create_child())
+        return child
+
+    def children(self) -> List[Tuple[LabelValues, T]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def samples(self) -> Iterator[Sample]:
+        for values, child in self.children():
+            yield self.name, values, (), child.value  # type: ignore
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, values, extra_labels, value in self.samples():
+            labels = [
+                f'{label}="{escape_label_value(value)}"'
+                for label, value in list(zip(self.label_names, values))
+                + list(extra_labels)
+            ]
+            labels_text = "{" + ",".join(labels) + "}" if len(labels) > 0 else ""
+            lines.append(f"{name}{labels_text} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric[CounterValue]):
+    kind = "counter"
+
+    def create_child(self) -> CounterValue:
+        return CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric[GaugeValue]):
+    kind = "gauge"
+
+    def create_child(self) -> GaugeValue:
+        return GaugeValue()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(Metric[HistogramValue]):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def create_child(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> Timer:
+        return self.labels().time()
+
+    def samples(self) -> Iterator[Sample]:
+        for values, child in self.children():
+            cumulative, total = child.snapshot()
+            for upper_bound, count in zip(self.buckets + (math.inf,), cumulative):
+                yield (
+                    f"{self.name}_bucket",
+                    values,
+                    (("le", format_value(upper_bound)),),
+                    count,
+                )
+            yield f"{self.name}_sum", values, (), total
+            yield f"{self.name}_count", values, (), cumulative[-1]
+
+
+M = TypeVar("M", Counter, Gauge, Histogram)
+
+
+class MetricsRegistry:
+    _metrics: Dict[str, "Metric[Any]"]
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: M) -> M:
+        # Registering a name again returns the existing metric
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if not isinstance(existing, type(metric)):
+                    raise ValueError(f"{metric.name} is already a {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(
+        self, name: str, documentation: str, label_names: Tuple[str, ...] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(
+        self, name: str, documentation: str, label_names: Tuple[str, ...] = ()
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,50 @@
+import cProfile
+import logging
+import os
+import time
+from typing import Optional
+
+from ..app_config import ProfilingConfig
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerProfiler:
+    def __init__(self):
+        self._config: Optional[ProfilingConfig] = None
+        self._active = False
+        # Workers compare generations instead of asking on every iteration
+        self.generation = 0
+
+    def configure(self, config: ProfilingConfig):
+        self._config = config if config.enabled else None
+
+    def toggle(self):
+        if self._config is None:
+            return
+
+        self._active = not self._active
+        self.generation += 1
+        logger.info(f"Worker profiling {'started' if self._active else 'stopped'}")
+
+    def should_profile(self, worker_name: str) -> bool:
+        if self._config is None or not self._active:
+            return False
+
+        workers = self._config.workers
+        return len(workers) == 0 or any(worker_name.startswith(w) for w in workers)
+
+    def dump(self, worker_name: str, profile: cProfile.Profile):
+        if self._config is None:
+            return
+
+        os.makedirs(self._config.output_directory, exist_ok=True)
+        file_path = os.path.join(
+            self._config.output_directory,
+            f"{worker_name}-{time.strftime('%Y%m%d-%H%M%S')}.prof",
+        )
+        profile.dump_stats(file_path)
+        logger.info(f"Wrote profile of {worker_name} to {file_path}")
+
+
+PROFILER = WorkerProfiler()
@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import threading
+import time
+from itertools import count
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
+
+from ..app_config import TracingConfig
+
+logger = logging.getLogger(__name__)
+
+Event = Dict[str, Any]
+
+
+def now_micros() -> float:
+    # Chrome trace timestamps are microseconds on one clock for all threads
+    return time.perf_counter() * 1e6
+
+
+def complete_event(name: str, start: float, end: float, args: Dict[str, Any]) -> Event:
+    thread = threading.current_thread()
+    return {
+        "name": name,
+        "ph": "X",
+        "ts": start,
+        "dur": end - start,
+        "pid": os.getpid(),
+        "tid": thread.ident,
+        "thread_name": thread.name,
+        "args": args,
+    }
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class FrameSpan:
+    __slots__ = ("_trace", "_name", "_start")
+
+    def __init__(self, trace: "FrameTrace", name: str):
+        self._trace = trace
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> "FrameSpan":
+        self._start = now_micros()
+        return self
+
+    def __exit__(self, *args):
+        self._trace.add_span(self._name, self._start, now_micros())
+
+
+class FrameTrace:
+    __slots__ = ("frame_id", "camera_name", "started_at", "events", "_enqueued")
+
+    def __init__(self, frame_id: int, camera_name: str):
+        self.frame_id = frame_id
+        self.camera_name = camera_name
+        self.started_at = now_micros()
+        self.events: List[Event] = []
+        self._enqueued: Optional[Tuple[str, float]] = None
+
+    def add_span(self, name: str, start: float, end: float):
+        self.events.append(
+            complete_event(
+                name,
+                start,
+                end,
+                {"frame_id": self.frame_id, "camera": self.camera_name},
+            )
+        )
+
+    def span(self, name: str) -> FrameSpan:
+        return FrameSpan(self, name)
+
+    def enqueue(self, queue_name: str):
+        self._enqueued = (queue_name, now_micros())
+
+    def dequeue(self):
+        # Time spent waiting in the queue shows up as its own span
+        if self._enqueued is not None:
+            queue_name, start = self._enqueued
+            self._enqueued = None
+            self.add_span(f"queue {queue_name}", start, now_micros())
+
+
+def span(trace: Optional[FrameTrace], name: str) -> Union[FrameSpan, NullSpan]:
+    return trace.span(name) if trace is not None else NULL_SPAN
+
+
+class TracerSpan:
+    __slots__ = ("_tracer", "_name", "_args", "_start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+        self._start = 0.0
+
+    def __enter__(self) -> "TracerSpan":
+        self._start = now_micros()
+        return self
+
+    def __exit__(self, *args):
+        self._tracer.write(
+            [complete_event(self._name, self._start, now_micros(), self._args)]
+        )
+
+
+class Tracer:
+    _file: Optional[IO[str]]
+
+    def __init__(self):
+        self._config: Optional[TracingConfig] = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._frame_ids = count()
+        self._thread_ids: Dict[Tuple[int, int], str] = {}
+        self._events_written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._config is not None
+
+    def configure(self, config: TracingConfig):
+        self.close()
+        if not config.enabled:
+            return
+
+        directory = os.path.dirname(config.output_path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            # Written as a JSON array, events are appended as frames finish
+            self._file = open(config.output_path, "w")
+            self._file.write("[\n")
+            self._events_written = 0
+            self._thread_ids = {}
+            self._config = config
+        logger.info(f"Tracing every {config.sample_interval} frames")
+
+    def start_trace(self, camera_name: str) -> Optional[FrameTrace]:
+        config = self._config
+        if config is None:
+            return None
+
+        frame_id = next(self._frame_ids)
+        if frame_id % config.sample_interval != 0:
+            return None
+        return FrameTrace(frame_id, camera_name)
+
+    def finish(self, trace: Optional[FrameTrace], outcome: str = "done"):
+        if trace is None:
+            return
+
+        # Async begin and end events span the whole life of the frame
+        frame_event = {
+            "name": f"frame {trace.camera_name}",
+            "cat": "frame",
+            "id": trace.frame_id,
+            "pid": os.getpid(),
+            "tid": 0,
+        }
+        self.write(
+            [
+                dict(frame_event, ph="b", ts=trace.started_at),
+                *trace.events,
+                dict(frame_event, ph="e", ts=now_micros(), args={"outcome": outcome}),
+            ]
+        )
+
+    def span(self, name: str, **args: Any) -> Union[TracerSpan, NullSpan]:
+        # Work not tied to a frame, only recorded while tracing
+        if self._config is None:
+            return NULL_SPAN
+        return TracerSpan(self, name, args)
+
+    def write(self, events: List[Event]):
+        with self._lock:
+            if self._file is None or self._config is None:
+                return
+
+            lines = []
+            for event in events:
+                thread_name = event.pop("thread_name", None)
+                thread_key = (event["pid"], event["tid"])
+                if thread_name is not None and thread_key not in self._thread_ids:
+                    self._thread_ids[thread_key] = thread_name
+                    lines.append(
+                        json.dumps(
+                            {
+                                "name": "thread_name",
+                                "ph": "M",
+                                "pid": event["pid"],
+                                "tid": event["tid"],
+                                "args": {"name": thread_name},
+                            }
+                        )
+                    )
+                lines.append(json.dumps(event))
+
+            for line in lines:
+                self._file.write(("," if self._events_written > 0 else "") + line)
+                self._file.write("\n")
+                self._events_written += 1
+            self._file.flush()
+
+            if self._events_written >= self._config.max_events:
+                logger.warning(f"Trace reached {self._events_written} events")
+                self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.write("]\n")
+            self._file.close()
+            self._file = None
+        self._config = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+
+TRACER = Tracer()
@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from ..utils.backoff import ExponentialBackoff
+from ..video.output_file import OutputFile
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".json"
+
+
+class SpoolEntry:
+    sequence: int
+    output_file: OutputFile
+    size: int
+    attempts: int
+    next_attempt_time: float
+
+    def __init__(self, sequence: int, output_file: OutputFile, size: int):
+        self.sequence = sequence
+        self.output_file = output_file
+        self.size = size
+        self.attempts = 0
+        self.next_attempt_time = 0.0
+
+    def __repr__(self) -> str:
+        kws = [f"{key}={value!r}" for key, value in self.__dict__.items()]
+        return f"{self.__class__.__name__}({', '.join(kws)})"
+
+
+class UploadSpool:
+    _entries: Dict[int, SpoolEntry]
+    _in_flight: Set[int]
+
+    def __init__(
+        self, spool_directory: str, max_bytes: int, backoff: ExponentialBackoff
+    ):
+        self._spool_directory = spool_directory
+        self._max_bytes = max_bytes
+        self._backoff = backoff
+
+        self._cv = threading.Condition()
+        # Insertion order is the upload and the eviction order
+        self._entries = {}
+        self._in_flight = set()
+        self._size = 0
+        self._sequence = 0
+
+        os.makedirs(spool_directory, exist_ok=True)
+        self.replay()
+
+    def __len__(self) -> int:
+        with self._cv:
+            return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        with self._cv:
+            return self._size
+
+    def journal_path(self, sequence: int) -> str:
+        return os.path.join(self._spool_directory, f"{sequence:012d}{JOURNAL_SUFFIX}")
+
+    def replay(self):
+        file_names = sorted(
+            file_name
+            for file_name in os.listdir(self._spool_directory)
+            if file_name.endswith(JOURNAL_SUFFIX)
+        )
+
+        for file_name in file_names:
+            sequence = int(file_name[: -len(JOURNAL_SUFFIX)])
+            journal_path = os.path.join(self._spool_directory, file_name)
+            self._sequence = max(self._sequence, sequence)
+
+            try:
+                output_file = OutputFile.parse_file(journal_path)
+                size = os.path.getsize(output_file.file_path)
+            except Exception as error:
+                logger.warning(f"Dropping spool entry {file_name}: {error}")
+                os.remove(journal_path)
+                continue
+
+            self._entries[sequence] = SpoolEntry(sequence, output_file, size)
+            self._size += size
+
+        if len(self._entries) > 0:
+            logger.info(f"Replayed {len(self._entries)} pending uploads")
+        self.evict()
+
+    def add(self, output_file: OutputFile):
+        size = os.path.getsize(output_file.file_path)
+
+        with self._cv:
+            self._sequence += 1
+            entry = SpoolEntry(self._sequence, output_file, size)
+
+            # Journal entry is renamed into place so a crash never leaves half of it
+            journal_path = self.journal_path(entry.sequence)
+            with open(journal_path + ".tmp", "w") as f:
+                f.write(output_file.json())
+            os.replace(journal_path + ".tmp", journal_path)
+
+            self._entries[entry.sequence] = entry
+            self._size += size
+            self.evict()
+            self._cv.notify()
+
+    def evict(self):
+        for entry in list(self._entries.values()):
+            if self._size <= self._max_bytes:
+                break
+            if entry.sequence in self._in_flight:
+                continue
+
+            logger.warning(f"Spool over {self._max_bytes} bytes, evicting {entry}")
+            self.remove(entry)
+
+    def remove(self, entry: SpoolEntry):
+        del self._entries[entry.sequence]
+        self._size -= entry.size
+
+        for path in [entry.output_file.file_path, self.journal_path(entry.sequence)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as error:
+                logger.error(f"Failed to remove spooled file: {error}")
+
+    def get(self, timeout: float) -> Optional[SpoolEntry]:
+        deadline = time.monotonic() + timeout
+
+        with self._cv:
+            while True:
+                now = time.monotonic()
+                ready = self.ready_entries(now)
+                if len(ready) > 0:
+                    entry = ready[0]
+                    self._in_flight.add(entry.sequence)
+                    return entry
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    return None
+
+                # Wake up for the next retry even when nothing new is added
+                next_attempt_time = min(
+                    (
+                        entry.next_attempt_time
+                        for entry in self._entries.values()
+                        if entry.sequence not in self._in_flight
+                    ),
+                    default=deadline,
+                )
+                self._cv.wait(max(0.0, min(remaining, next_attempt_time - now)))
+
+    def ready_entries(self, now: float) -> List[SpoolEntry]:
+        return [
+            entry
+            for entry in self._entries.values()
+            if entry.sequence not in self._in_flight and entry.next_attempt_time <= now
+        ]
+
+    def complete(self, entry: SpoolEntry):
+        # Local file is only removed once the upload succeeded
+        with self._cv:
+            self._in_flight.discard(entry.sequence)
+            if entry.sequence in self._entries:
+                self.remove(entry)
+
+    def retry(self, entry: SpoolEntry):
+        with self._cv:
+            self._in_flight.discard(entry.sequence)
+            entry.attempts += 1
+            delay = self._backoff.delay(entry.attempts)
+            entry.next_attempt_time = time.monotonic() + delay
+            logger.info(f"Retrying upload of {entry} in {delay:.1f}s")
+
+            self.evict()
+            self._cv.notify()
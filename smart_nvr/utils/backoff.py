@@ -0,0 +1,34 @@
+import math
+import random
+from typing import Optional
+
+
+class ExponentialBackoff:
+    def __init__(
+        self,
+        initial_seconds: float,
+        max_seconds: float,
+        factor: float = 2.0,
+        jitter: float = 0.1,
+    ):
+        self._initial_seconds = initial_seconds
+        self._max_seconds = max_seconds
+        self._factor = factor
+        self._jitter = jitter
+        # Exponent that reaches max_seconds, growing it further only risks
+        # overflowing the power
+        self._max_exponent: Optional[int] = None
+        if factor > 1:
+            self._max_exponent = (
+                math.ceil(math.log(max_seconds / initial_seconds, factor))
+                if 0 < initial_seconds < max_seconds
+                else 0
+            )
+
+    def delay(self, attempt: int) -> float:
+        # First retry waits initial_seconds, jitter spreads simultaneous retries
+        exponent = max(0, attempt - 1)
+        if self._max_exponent is not None:
+            exponent = min(exponent, self._max_exponent)
+        delay = min(self._max_seconds, self._initial_seconds * self._factor**exponent)
+        return delay * (1 + random.uniform(-self._jitter, self._jitter))
@@ -0,0 +1,217 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .rectangle import Rectangle
+
+# Below this many boxes merging runs on plain Python lists, building the
+# arrays costs more than the loops
+VECTORIZE_MIN_BOXES = 32
+
+# x1, y1, x2, y2
+Row = Tuple[int, int, int, int]
+
+
+def boxes_from_rectangles(rectangles: List[Rectangle]) -> np.ndarray:
+    return np.array(
+        [[r.x1, r.y1, r.x2, r.y2] for r in rectangles], dtype=np.int64
+    ).reshape(-1, 4)
+
+
+def rectangles_from_boxes(boxes: np.ndarray) -> List[Rectangle]:
+    return [Rectangle(x1, y1, x2, y2) for x1, y1, x2, y2 in boxes.tolist()]
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def overlap_areas(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    # Pairwise intersection areas, boxes along rows and others along columns
+    dx = np.minimum(boxes[:, None, 2], others[None, :, 2]) - np.maximum(
+        boxes[:, None, 0], others[None, :, 0]
+    )
+    dy = np.minimum(boxes[:, None, 3], others[None, :, 3]) - np.maximum(
+        boxes[:, None, 1], others[None, :, 1]
+    )
+    return np.clip(dx, 0, None) * np.clip(dy, 0, None)
+
+
+def overlapping_pairs(
+    boxes: np.ndarray,
+    overlap_ratio_threshold: float,
+    classes: Optional[np.ndarray] = None,
+) -> Iterator[Tuple[int, int]]:
+    # Pairs overlapping by more than the threshold of the smaller box
+    areas = box_areas(boxes)
+    adjacent = overlap_areas(boxes, boxes) > overlap_ratio_threshold * np.minimum(
+        areas[:, None], areas[None, :]
+    )
+    if classes is not None:
+        adjacent &= classes[:, None] == classes[None, :]
+
+    for a, b in zip(*np.nonzero(np.triu(adjacent, 1))):
+        yield int(a), int(b)
+
+
+def union_labels(count: int, pairs: Iterable[Tuple[int, int]]) -> List[int]:
+    # Connected pairs share a group, groups are numbered in order of their
+    # first box
+    parents = list(range(count))
+
+    def find(index: int) -> int:
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    # Roots are the first box of every group
+    group_labels: Dict[int, int] = {}
+    return [
+        group_labels.setdefault(find(index), len(group_labels))
+        for index in range(count)
+    ]
+
+
+def group_rows(
+    rows: List[Row],
+    overlap_ratio_threshold: float,
+    class_ids: Optional[List[int]] = None,
+) -> List[int]:
+    # Same groups as group_boxes, for a handful of boxes
+    if class_ids is not None and len(set(class_ids)) > 1:
+        # Only boxes of one class can overlap, every class is grouped alone
+        members: Dict[int, List[int]] = {}
+        for index, class_id in enumerate(class_ids):
+            members.setdefault(class_id, []).append(index)
+
+        firsts = list(range(len(rows)))
+        for indices in members.values():
+            class_firsts: Dict[int, int] = {}
+            class_labels = group_rows(
+                [rows[index] for index in indices], overlap_ratio_threshold
+            )
+            for index, label in zip(indices, class_labels):
+                firsts[index] = class_firsts.setdefault(label, index)
+
+        class_group_labels: Dict[int, int] = {}
+        return [
+            class_group_labels.setdefault(first, len(class_group_labels))
+            for first in firsts
+        ]
+
+    # Pairs already in one group aren't compared, groups are relabeled in place
+    groups = list(range(len(rows)))
+    areas = [(x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in rows]
+
+    for b in range(1, len(rows)):
+        bx1, by1, bx2, by2 = rows[b]
+        for a in range(b):
+            if groups[a] == groups[b]:
+                continue
+
+            ax1, ay1, ax2, ay2 = rows[a]
+            dx = (ax2 if ax2 < bx2 else bx2) - (ax1 if ax1 > bx1 else bx1)
+            if dx <= 0:
+                continue
+            dy = (ay2 if ay2 < by2 else by2) - (ay1 if ay1 > by1 else by1)
+            if dy <= 0:
+                continue
+
+            smaller_area = areas[a] if areas[a] < areas[b] else areas[b]
+            if dx * dy > overlap_ratio_threshold * smaller_area:
+                merged, kept = max(groups[a], groups[b]), min(groups[a], groups[b])
+                groups = [kept if group == merged else group for group in groups]
+
+    group_labels: Dict[int, int] = {}
+    return [group_labels.setdefault(group, len(group_labels)) for group in groups]
+
+
+def group_boxes(
+    boxes: np.ndarray,
+    overlap_ratio_threshold: float,
+    classes: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    if len(boxes) < VECTORIZE_MIN_BOXES:
+        labels = group_rows(
+            boxes.tolist(),
+            overlap_ratio_threshold,
+            classes.tolist() if classes is not None else None,
+        )
+    else:
+        labels = union_labels(
+            len(boxes), overlapping_pairs(boxes, overlap_ratio_threshold, classes)
+        )
+    return np.array(labels, dtype=np.int64)
+
+
+def outer_rows(rows: List[Row], labels: List[int]) -> List[Row]:
+    groups: Dict[int, List[int]] = {}
+    for label, (x1, y1, x2, y2) in zip(labels, rows):
+        group = groups.get(label)
+        if group is None:
+            groups[label] = [x1, y1, x2, y2]
+        else:
+            group[0] = min(group[0], x1)
+            group[1] = min(group[1], y1)
+            group[2] = max(group[2], x2)
+            group[3] = max(group[3], y2)
+    return [(x1, y1, x2, y2) for x1, y1, x2, y2 in groups.values()]
+
+
+def group_starts(labels: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+
+
+def outer_boxes(boxes: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    if len(boxes) < VECTORIZE_MIN_BOXES:
+        return np.array(
+            outer_rows(boxes.tolist(), labels.tolist()), dtype=boxes.dtype
+        ).reshape(-1, 4)
+
+    order = np.argsort(labels, kind="stable")
+    sorted_boxes = boxes[order]
+    starts = group_starts(labels[order])
+
+    return np.concatenate(
+        [
+            np.minimum.reduceat(sorted_boxes[:, :2], starts, axis=0),
+            np.maximum.reduceat(sorted_boxes[:, 2:], starts, axis=0),
+        ],
+        axis=1,
+    )
+
+
+def non_max_suppression(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float,
+    classes: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if classes is not None:
+        # Shifting every class to its own area keeps classes from suppressing
+        # each other
+        boxes = boxes + (classes * (int(boxes.max()) + 1))[:, None]
+
+    areas = box_areas(boxes)
+    order = np.argsort(-scores, kind="stable")
+    keep: List[int] = []
+
+    while len(order) > 0:
+        index = order[0]
+        keep.append(int(index))
+
+        rest = order[1:]
+        overlaps = overlap_areas(boxes[index : index + 1], boxes[rest])[0]
+        ious = overlaps / np.maximum(areas[index] + areas[rest] - overlaps, 1)
+        order = rest[ious <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
@@ -1,5 +1,14 @@
 from typing import List, Tuple
 
+from .box_merging import (
+    VECTORIZE_MIN_BOXES,
+    boxes_from_rectangles,
+    group_boxes,
+    group_rows,
+    outer_boxes,
+    outer_rows,
+    rectangles_from_boxes,
+)
 from .rectangle import Rectangle
 
 
@@ -41,39 +50,26 @@ def outer_box_rectangles(rectangles: List[Rectangle]) -> Rectangle:
     return Rectangle(
         min([r.x1 for r in rectangles]),
         min([r.y1 for r in rectangles]),
-        min([r.x2 for r in rectangles]),
-        min([r.y2 for r in rectangles]),
+        max([r.x2 for r in rectangles]),
+        max([r.y2 for r in rectangles]),
     )
 
 
 def merge_rectangles(
     rectangles: List[Rectangle], overlap_ratio_threshold: float = 0.65
 ) -> List[Rectangle]:
-    rectangle_groups: List[List[Rectangle]] = []
-
-    for rectangle in rectangles:
-        rectangle_grouped = False
-        for rectangle_group in rectangle_groups:
-            for other_rectangle in rectangle_group:
-                smaller_area = min(rectangle.area, other_rectangle.area)
-                if (
-                    rectangle.overlap_area(other_rectangle)
-                    > overlap_ratio_threshold * smaller_area
-                ):
-                    rectangle_group.append(rectangle)
-                    rectangle_grouped = True
-                    break
-
-            if rectangle_grouped:
-                break
-
-        if not rectangle_grouped:
-            rectangle_groups.append([rectangle])
-
-        rectangle_groups = sorted(
-            rectangle_groups, key=lambda rectangle_group: len(rectangle_group)
-        )
-
-    return [
-        outer_box_rectangles(rectangle_group) for rectangle_group in rectangle_groups
-    ]
+    if len(rectangles) <= 1:
+        return list(rectangles)
+
+    if len(rectangles) < VECTORIZE_MIN_BOXES:
+        rows = [(r.x1, r.y1, r.x2, r.y2) for r in rectangles]
+        return [
+            Rectangle(x1, y1, x2, y2)
+            for x1, y1, x2, y2 in outer_rows(
+                rows, group_rows(rows, overlap_ratio_threshold)
+            )
+        ]
+
+    boxes = boxes_from_rectangles(rectangles)
+    labels = group_boxes(boxes, overlap_ratio_threshold)
+    return rectangles_from_boxes(outer_boxes(boxes, labels))
@@ -1,4 +1,6 @@
 class Rectangle:
+    __slots__ = ("x1", "y1", "x2", "y2")
+
     # topleft
     x1: int
     y1: int
@@ -35,5 +37,5 @@ class Rectangle:
         return 0
 
     def __repr__(self) -> str:
-        kws = [f"{key}={value!r}" for key, value in self.__dict__.items()]
+        kws = [f"{key}={getattr(self, key)!r}" for key in self.__slots__]
         return f"{self.__class__.__name__}({', '.join(kws)})"
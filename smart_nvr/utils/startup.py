@@ -0,0 +1,56 @@
+import logging
+import threading
+import time
+from typing import List, Tuple
+
+from ..metrics.pipeline import STARTUP_PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class StartupPhase:
+    def __init__(self, report: "StartupReport", name: str):
+        self._report = report
+        self._name = name
+        self._started_at = 0.0
+
+    def __enter__(self) -> "StartupPhase":
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._report.record(self._name, time.perf_counter() - self._started_at)
+
+
+class StartupReport:
+    def __init__(self):
+        self._started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases: List[Tuple[str, float]] = []
+
+    def phase(self, name: str) -> StartupPhase:
+        return StartupPhase(self, name)
+
+    def record(self, name: str, seconds: float):
+        # Phases run on other threads too, the model loads while cameras connect
+        with self._lock:
+            self._phases.append((name, seconds))
+        STARTUP_PHASE_SECONDS.labels(name).set(seconds)
+
+    def phases(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return list(self._phases)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started_at
+
+    def format(self) -> str:
+        phases = self.phases()
+        width = max([len(name) for name, _ in phases] + [len("total")])
+        lines = [f"  {name:<{width}} {seconds:7.3f} s" for name, seconds in phases]
+        lines.append(f"  {'total':<{width}} {self.elapsed():7.3f} s")
+        return "\n".join(["Startup phases:", *lines])
+
+    def log(self):
+        STARTUP_PHASE_SECONDS.labels("total").set(self.elapsed())
+        logger.info(self.format())
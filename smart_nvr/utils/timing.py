@@ -1,5 +1,77 @@
+import threading
 import time
+from typing import Dict, Optional, Union
+
+
+class SystemClock:
+    def time_millis(self) -> int:
+        return int(time.time() * 1000.0)
+
+
+class SimulatedClock:
+    # Time is driven by replayed sources, every source advances its own lane
+    # and the clock follows the slowest one
+    _lanes: Dict[str, int]
+
+    def __init__(self, start_millis: Optional[int] = None, max_skew_millis: int = 1000):
+        self._time = (
+            start_millis if start_millis is not None else SystemClock().time_millis()
+        )
+        self._max_skew_millis = max_skew_millis
+        self._lanes = {}
+        self._cv = threading.Condition()
+
+    @property
+    def start_millis(self) -> int:
+        return self._time
+
+    def time_millis(self) -> int:
+        return self._time
+
+    def add_lane(self, name: str):
+        with self._cv:
+            self._lanes[name] = self._time
+
+    def remove_lane(self, name: str):
+        with self._cv:
+            self._lanes.pop(name, None)
+            self._update_time()
+            self._cv.notify_all()
+
+    def advance(self, name: str, millis: int):
+        with self._cv:
+            # Lanes ahead of the others wait, so frames of every source stay
+            # within the skew of the clock
+            self._cv.wait_for(
+                lambda: name not in self._lanes
+                or millis <= self._time + self._max_skew_millis
+                or min(self._lanes.values()) == self._lanes[name]
+            )
+            if name not in self._lanes:
+                return
+
+            self._lanes[name] = max(self._lanes[name], millis)
+            self._update_time()
+            self._cv.notify_all()
+
+    def _update_time(self):
+        if len(self._lanes) > 0:
+            self._time = max(self._time, min(self._lanes.values()))
+
+
+Clock = Union[SystemClock, SimulatedClock]
+
+_clock: Clock = SystemClock()
+
+
+def set_clock(clock: Clock):
+    global _clock
+    _clock = clock
+
+
+def get_clock() -> Clock:
+    return _clock
 
 
 def get_current_time_millis() -> int:
-    return int(time.time() * 1000.0)
+    return _clock.time_millis()
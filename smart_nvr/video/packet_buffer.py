@@ -0,0 +1,120 @@
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedPacket:
+    sequence: int
+    session: int
+    packet: Any
+    pts: Optional[int]
+    dts: Optional[int]
+    is_keyframe: bool
+
+    def __init__(self, sequence: int, session: int, packet: Any):
+        self.sequence = sequence
+        self.session = session
+        self.packet = packet
+        # Writers rewrite timestamps on the packet, originals are kept here
+        self.pts = packet.pts
+        self.dts = packet.dts
+        self.is_keyframe = bool(packet.is_keyframe)
+
+    @property
+    def time(self) -> float:
+        timestamp = self.dts if self.dts is not None else self.pts
+        if timestamp is None or self.packet.time_base is None:
+            return 0.0
+        return float(timestamp * self.packet.time_base)
+
+
+class PacketRingBuffer:
+    _stream: Optional[Any]
+
+    def __init__(self, max_seconds: float):
+        self._max_seconds = max_seconds
+        self._packets: Deque[BufferedPacket] = deque()
+        self._keyframes: Deque[BufferedPacket] = deque()
+        self._stream = None
+        self._session = 0
+        self._sequence = 0
+        self._mutex = threading.Lock()
+        # Held by the output muxing packets from this buffer
+        self.write_lock = threading.Lock()
+
+    def start_session(self, stream: Any):
+        with self._mutex:
+            self._session += 1
+            self._stream = stream
+
+    def end_session(self):
+        # Stream of the closed session must not be used as template anymore
+        with self._mutex:
+            self._stream = None
+            self._packets.clear()
+            self._keyframes.clear()
+
+    def has_stream(self) -> bool:
+        with self._mutex:
+            return self._stream is not None
+
+    def add_output_stream(self, container: Any) -> Any:
+        with self._mutex:
+            if self._stream is None:
+                raise ValueError("No active session to copy stream from")
+            # Newer PyAV versions moved templates into a separate method
+            add_stream_from_template = getattr(
+                container, "add_stream_from_template", None
+            )
+            if add_stream_from_template is not None:
+                return add_stream_from_template(self._stream)
+            return container.add_stream(template=self._stream)
+
+    def append(self, packet: Any):
+        with self._mutex:
+            self._sequence += 1
+            buffered_packet = BufferedPacket(self._sequence, self._session, packet)
+
+            # Buffer always starts with a keyframe
+            if len(self._packets) == 0 and not buffered_packet.is_keyframe:
+                return
+
+            self._packets.append(buffered_packet)
+            if buffered_packet.is_keyframe:
+                self._keyframes.append(buffered_packet)
+
+            self._trim(buffered_packet.time)
+
+    def _trim(self, current_time: float):
+        # Whole GOPs are dropped only while the rest still covers max_seconds
+        while (
+            len(self._keyframes) > 1
+            and current_time - self._keyframes[1].time >= self._max_seconds
+        ):
+            self._keyframes.popleft()
+            next_keyframe = self._keyframes[0]
+            while self._packets[0] is not next_keyframe:
+                self._packets.popleft()
+
+    def packets_after(self, sequence: Optional[int]) -> List[BufferedPacket]:
+        with self._mutex:
+            if len(self._packets) == 0:
+                return []
+
+            if sequence is None:
+                return list(self._packets)
+
+            if self._packets[0].sequence > sequence + 1:
+                # Reader fell behind, continue from the first buffered keyframe
+                logger.warning(
+                    f"Dropped {self._packets[0].sequence - sequence - 1} buffered packets"
+                )
+                return list(self._packets)
+
+            # Sequences are contiguous within the buffer
+            start = sequence - self._packets[0].sequence + 1
+            return list(islice(self._packets, start, None))
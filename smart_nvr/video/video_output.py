@@ -1,36 +1,48 @@
 import logging
+import os.path
 from datetime import datetime
 from fractions import Fraction
-from typing import Optional
-
-import av
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, cast
 
 from smart_nvr.utils.timing import get_current_time_millis
 
+from ..app_config import RecordingProfileConfig, VideoCodecEnum
 from ..camera.image import DetectionCameraImageContainer
+from .packet_buffer import BufferedPacket, PacketRingBuffer
 
 logger = logging.getLogger(__name__)
 
 VIDEO_MAX_TIME_MILLIS = 20 * 1000  # 20 seconds
 VIDEO_MAX_NO_DETECTION_TIME_MILLIS = 10 * 1000  # 10 seconds
 
+# Encoders tried in order for every codec
+CODEC_ENCODERS = {
+    VideoCodecEnum.mpeg4: ["mpeg4"],
+    VideoCodecEnum.h264: ["libx264", "h264"],
+    VideoCodecEnum.hevc: ["libx265", "hevc"],
+}
+X26X_ENCODERS = {"libx264", "libx265"}
+
 
-class VideoOutput:
+class BaseVideoOutput:
     _first_frame_time: Optional[int]
     _last_detection_time: Optional[int]
 
-    def __init__(self, file_path: str, width: int, height: int):
+    def __init__(self, file_path: str):
         self._file_path = file_path
-        self._container, self._stream = self.create_video_output(
-            file_path, width, height
-        )
         self._first_frame_time = None
         self._last_detection_time = None
+        self._split_requested = False
 
     @property
     def file_path(self) -> str:
         return self._file_path
 
+    @property
+    def first_frame_time(self) -> Optional[int]:
+        return self._first_frame_time
+
     @property
     def timestamp(self) -> datetime:
         if self._first_frame_time is None:
@@ -66,14 +78,78 @@ class VideoOutput:
 
         return value
 
+    def update_times(self, img: DetectionCameraImageContainer):
+        if self._first_frame_time is None:
+            self._first_frame_time = img.camera_image_container.created_at
+
+        if img.has_detections():
+            self._last_detection_time = img.camera_image_container.created_at
+
+    def request_split(self):
+        self._split_requested = True
+
+    def is_split_ready(self) -> bool:
+        # Encoded outputs can end at any frame
+        return self._split_requested
+
+    def pop_finished_segments(self) -> List["BaseVideoOutput"]:
+        return []
+
+    def write_image(self, img: DetectionCameraImageContainer):
+        raise NotImplementedError()
+
+    def close(self):
+        raise NotImplementedError()
+
+
+@lru_cache(maxsize=None)
+def get_encoder_name(codec: VideoCodecEnum) -> str:
+    import av
+
+    for encoder_name in CODEC_ENCODERS[codec]:
+        try:
+            # Generic names resolve to the default encoder of the FFmpeg build
+            return av.codec.Codec(encoder_name, "w").name
+        except Exception:
+            continue
+
+    logger.warning(f"No encoder available for {codec.value}, using mpeg4")
+    return "mpeg4"
+
+
+class VideoOutput(BaseVideoOutput):
+    def __init__(
+        self,
+        file_path: str,
+        width: int,
+        height: int,
+        profile: Optional[RecordingProfileConfig] = None,
+    ):
+        super().__init__(file_path)
+        self._container, self._stream = self.create_video_output(
+            file_path,
+            width,
+            height,
+            profile if profile is not None else RecordingProfileConfig(),
+        )
+        self._scaled = self._stream.width != width or self._stream.height != height
+
     def write_image(self, img: DetectionCameraImageContainer):
+        import av
+
         frame = av.VideoFrame.from_ndarray(
-            img.camera_image_container.raw_image_np, format="rgb24"
+            img.camera_image_container.raw_image_np,
+            format=img.camera_image_container.pixel_format.value,
         )
+        if self._scaled:
+            frame = frame.reformat(
+                width=self._stream.width,
+                height=self._stream.height,
+                format=self._stream.pix_fmt,
+            )
 
         if self._first_frame_time is None:
             frame.pts = 0
-            self._first_frame_time = img.camera_image_container.created_at
         else:
             frame.pts = int(
                 (img.camera_image_container.created_at - self._first_frame_time)
@@ -84,8 +160,7 @@ class VideoOutput:
         for packet in self._stream.encode(frame):
             self._container.mux(packet)
 
-        if img.has_detections():
-            self._last_detection_time = img.camera_image_container.created_at
+        self.update_times(img)
 
     def close(self):
         for packet in self._stream.encode():
@@ -93,13 +168,189 @@ class VideoOutput:
         self._container.close()
 
     @staticmethod
-    def create_video_output(file_path: str, width: int, height: int):
+    def create_video_output(
+        file_path: str, width: int, height: int, profile: RecordingProfileConfig
+    ):
+        import av
+
+        encoder_name = get_encoder_name(profile.codec)
+
         container = av.open(file_path, mode="w")
-        stream = container.add_stream("mpeg4", rate=25)  # alibi frame rate
-        stream.width = width
-        stream.height = height
-        stream.pix_fmt = "yuv420p"
+        stream = cast(
+            "av.video.stream.VideoStream",
+            container.add_stream(encoder_name, rate=profile.frame_rate),
+        )
+        # Encoders of yuv420p need even dimensions
+        stream.width = max(2, int(width * profile.scale) // 2 * 2)
+        stream.height = max(2, int(height * profile.scale) // 2 * 2)
+        stream.pix_fmt = profile.pix_fmt
+
+        codec_context = stream.codec_context
+        codec_context.time_base = Fraction(1, 1000)
+        codec_context.thread_count = profile.thread_count
+        if profile.thread_type is not None:
+            codec_context.thread_type = profile.thread_type
+        if profile.gop_size is not None:
+            codec_context.gop_size = profile.gop_size
+        if profile.bit_rate is not None:
+            codec_context.bit_rate = profile.bit_rate
 
-        stream.codec_context.time_base = Fraction(1, 1000)
+        options: Dict[str, str] = {}
+        if encoder_name in X26X_ENCODERS:
+            if profile.preset is not None:
+                options["preset"] = profile.preset
+            if profile.crf is not None:
+                options["crf"] = str(profile.crf)
+        elif profile.preset is not None or profile.crf is not None:
+            logger.warning(f"Encoder {encoder_name} ignores preset and crf")
+        codec_context.options = options
 
         return container, stream
+
+
+class PassthroughVideoOutput(BaseVideoOutput):
+    _last_sequence: Optional[int]
+    _session: Optional[int]
+
+    def __init__(
+        self,
+        file_path: str,
+        packet_buffer: PacketRingBuffer,
+        last_sequence: Optional[int] = None,
+    ):
+        import av
+
+        super().__init__(file_path)
+        self._packet_buffer = packet_buffer
+        self._container = av.open(file_path, mode="w")
+        self._stream = packet_buffer.add_output_stream(self._container)
+
+        # Continues after packets of a previous segment, otherwise starts with
+        # the pre-roll buffered before the clip was opened
+        self._last_sequence = last_sequence
+        self._session = None
+        self._timestamp_offset = 0
+        self._last_dts: Optional[int] = None
+        self._split_done = False
+
+        self.mux_buffered_packets()
+
+    @property
+    def last_sequence(self) -> Optional[int]:
+        return self._last_sequence
+
+    def is_split_ready(self) -> bool:
+        return self._split_done
+
+    def mux_buffered_packets(self):
+        with self._packet_buffer.write_lock:
+            for buffered_packet in self._packet_buffer.packets_after(
+                self._last_sequence
+            ):
+                # Segments end right before a keyframe, the next one starts with it
+                if (
+                    self._split_requested
+                    and buffered_packet.is_keyframe
+                    and self._last_dts is not None
+                ):
+                    self._split_done = True
+                if self._split_done:
+                    break
+
+                self.mux_packet(buffered_packet)
+
+    def mux_packet(self, buffered_packet: BufferedPacket):
+        pts = buffered_packet.pts
+        dts = buffered_packet.dts if buffered_packet.dts is not None else pts
+        self._last_sequence = buffered_packet.sequence
+        if dts is None:
+            return
+
+        if buffered_packet.session != self._session:
+            # Clip starts at zero, a new camera session continues where last one ended
+            next_dts = self._last_dts + 1 if self._last_dts is not None else 0
+            self._timestamp_offset = next_dts - dts
+            self._session = buffered_packet.session
+
+        dts += self._timestamp_offset
+        if self._last_dts is not None and dts <= self._last_dts:
+            return
+
+        packet = buffered_packet.packet
+        packet.dts = dts
+        packet.pts = pts + self._timestamp_offset if pts is not None else None
+        packet.stream = self._stream
+
+        self._container.mux(packet)
+        self._last_dts = dts
+
+    def write_image(self, img: DetectionCameraImageContainer):
+        self.mux_buffered_packets()
+        self.update_times(img)
+
+    def close(self):
+        try:
+            self.mux_buffered_packets()
+        finally:
+            self._container.close()
+
+
+class SegmentedVideoOutput(BaseVideoOutput):
+    _finished_segments: List[BaseVideoOutput]
+
+    def __init__(
+        self,
+        file_path: str,
+        segment_millis: int,
+        create_segment: Callable[[str, Optional[BaseVideoOutput]], BaseVideoOutput],
+    ):
+        super().__init__(file_path)
+        self._file_root, self._file_extension = os.path.splitext(file_path)
+        self._segment_millis = segment_millis
+        self._create_segment = create_segment
+
+        self._segment_index = 0
+        self._segment = create_segment(self.segment_file_path(0), None)
+        self._finished_segments = []
+
+    @property
+    def file_path(self) -> str:
+        return self._segment.file_path
+
+    @property
+    def timestamp(self) -> datetime:
+        return self._segment.timestamp
+
+    def segment_file_path(self, index: int) -> str:
+        return f"{self._file_root}_{index:03d}{self._file_extension}"
+
+    def rotate(self):
+        segment = self._create_segment(
+            self.segment_file_path(self._segment_index + 1), self._segment
+        )
+        self._finished_segments.append(self._segment)
+        self._segment_index += 1
+        self._segment = segment
+
+    def pop_finished_segments(self) -> List[BaseVideoOutput]:
+        finished_segments = self._finished_segments
+        self._finished_segments = []
+        return finished_segments
+
+    def write_image(self, img: DetectionCameraImageContainer):
+        segment_start = self._segment.first_frame_time
+        if (
+            segment_start is not None
+            and img.camera_image_container.created_at - segment_start
+            >= self._segment_millis
+        ):
+            self._segment.request_split()
+
+        if self._segment.is_split_ready():
+            self.rotate()
+
+        self._segment.write_image(img)
+        self.update_times(img)
+
+    def close(self):
+        self._segment.close()
@@ -1,14 +1,21 @@
 import datetime
 import logging
 import os.path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 
 import cv2
 
 from smart_nvr.video.output_file import OutputFile, OutputFileType
 
-from ..camera.image import DetectionCameraImageContainer
-from .video_output import VideoOutput
+from ..app_config import RecordingConfig, RecordingModeEnum
+from ..camera.image import DetectionCameraImageContainer, PixelFormat
+from .packet_buffer import PacketRingBuffer
+from .video_output import (
+    BaseVideoOutput,
+    PassthroughVideoOutput,
+    SegmentedVideoOutput,
+    VideoOutput,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +25,22 @@ VIDEO_MAX_NO_DETECTION_TIME_MILLIS = 10 * 1000  # 10 seconds
 
 class VideoWriterManager:
     _output_directory: str
-    _video_outputs: Dict[str, VideoOutput]
-
-    def __init__(self, output_directory: str):
+    _video_outputs: Dict[str, BaseVideoOutput]
+    _recording_configs: Dict[str, RecordingConfig]
+    _packet_buffers: Dict[str, PacketRingBuffer]
+
+    def __init__(
+        self,
+        output_directory: str,
+        recording_configs: Optional[Dict[str, RecordingConfig]] = None,
+        packet_buffers: Optional[Dict[str, PacketRingBuffer]] = None,
+    ):
         self._output_directory = output_directory
         self._video_outputs = {}
+        self._recording_configs = (
+            recording_configs if recording_configs is not None else {}
+        )
+        self._packet_buffers = packet_buffers if packet_buffers is not None else {}
 
     def write_image(self, img: DetectionCameraImageContainer) -> Optional[OutputFile]:
         if not img.has_detections() and not self.has_video_output(
@@ -54,7 +72,9 @@ class VideoWriterManager:
     def has_video_output(self, camera_name: str) -> bool:
         return camera_name in self._video_outputs
 
-    def create_video_output(self, img: DetectionCameraImageContainer) -> VideoOutput:
+    def create_video_output(
+        self, img: DetectionCameraImageContainer
+    ) -> BaseVideoOutput:
         camera_name = img.camera_image_container.camera_name
         height = img.camera_image_container.raw_image_np.shape[0]
         width = img.camera_image_container.raw_image_np.shape[1]
@@ -67,7 +87,41 @@ class VideoWriterManager:
             self._output_directory,
             f"{camera_name}_{img_datetime.strftime('%Y-%m-%dT%H%M%S')}.mp4",
         )
-        video_output = VideoOutput(file_path, width, height)
+        packet_buffer = self._packet_buffers.get(camera_name)
+        recording_config = self._recording_configs.get(camera_name, RecordingConfig())
+
+        passthrough = (
+            recording_config.mode == RecordingModeEnum.passthrough
+            and packet_buffer is not None
+            and packet_buffer.has_stream()
+        )
+        if recording_config.mode == RecordingModeEnum.passthrough and not passthrough:
+            logger.warning(
+                f"No camera packets to remux for {camera_name}, encoding frames"
+            )
+
+        def create_segment(
+            segment_file_path: str, previous: Optional[BaseVideoOutput]
+        ) -> BaseVideoOutput:
+            if passthrough and packet_buffer is not None:
+                return PassthroughVideoOutput(
+                    segment_file_path,
+                    packet_buffer,
+                    previous.last_sequence
+                    if isinstance(previous, PassthroughVideoOutput)
+                    else None,
+                )
+            return VideoOutput(
+                segment_file_path, width, height, recording_config.profile
+            )
+
+        video_output: BaseVideoOutput
+        if recording_config.segment_seconds is None:
+            video_output = create_segment(file_path, None)
+        else:
+            video_output = SegmentedVideoOutput(
+                file_path, int(recording_config.segment_seconds * 1000), create_segment
+            )
         logger.info(f"Created video output: {file_path}, {video_output}")
         self._video_outputs[camera_name] = video_output
 
@@ -82,60 +136,56 @@ class VideoWriterManager:
             f"{img.camera_image_container.camera_name}_{img_datetime.strftime('%Y-%m-%dT%H%M%S')}.jpeg",
         )
 
-        #  Convert from RGB to BGR
-        raw_image_np = img.camera_image_container.raw_image_np[..., ::-1]
+        raw_image_np = img.camera_image_container.raw_image_np
+        if img.camera_image_container.pixel_format == PixelFormat.rgb:
+            #  Convert from RGB to BGR
+            raw_image_np = raw_image_np[..., ::-1]
 
         cv2.imwrite(file_path, raw_image_np)
 
         return file_path
 
-    @staticmethod
-    def close_video_outputs(
-        video_outputs: List[Tuple[str, VideoOutput]]
-    ) -> List[Tuple[str, VideoOutput]]:
-        closed_video_outputs: List[Tuple[str, VideoOutput]] = []
+    def pop_finished_segments(self) -> List[BaseVideoOutput]:
+        return [
+            segment
+            for video_output in self._video_outputs.values()
+            for segment in video_output.pop_finished_segments()
+        ]
 
-        for name, video_output in video_outputs:
-            video_output.close()
-            closed_video_outputs.append((name, video_output))
+    def pop_eligible_video_outputs(self) -> List[BaseVideoOutput]:
+        names = [
+            name
+            for name, video_output in self._video_outputs.items()
+            if video_output.is_max_time_running()
+            or video_output.is_max_time_no_detection_running()
+        ]
 
-        return closed_video_outputs
+        return [self._video_outputs.pop(name) for name in names]
 
-    def close_eligible_video_outputs(self) -> List[OutputFile]:
-        closed_video_outputs = self.close_video_outputs(
-            [
-                (name, video_worker)
-                for name, video_worker in self._video_outputs.items()
-                if video_worker.is_max_time_running()
-                or video_worker.is_max_time_no_detection_running()
-            ]
-        )
+    def pop_all_video_outputs(self) -> List[BaseVideoOutput]:
+        video_outputs = list(self._video_outputs.values())
+        self._video_outputs.clear()
 
-        for name, _ in closed_video_outputs:
-            del self._video_outputs[name]
+        return video_outputs
 
-        return [
-            OutputFile(
-                file_type=OutputFileType.video,
-                file_path=video_output.file_path,
-                timestamp=video_output.timestamp,
-            )
-            for _, video_output in closed_video_outputs
-        ]
+    @staticmethod
+    def close_video_output(video_output: BaseVideoOutput) -> OutputFile:
+        video_output.close()
 
-    def close_all_video_outputs(self) -> List[OutputFile]:
-        closed_video_outputs = self.close_video_outputs(
-            list(self._video_outputs.items())
+        return OutputFile(
+            file_type=OutputFileType.video,
+            file_path=video_output.file_path,
+            timestamp=video_output.timestamp,
         )
 
-        for name, _ in closed_video_outputs:
-            del self._video_outputs[name]
+    def close_eligible_video_outputs(self) -> List[OutputFile]:
+        return [
+            self.close_video_output(video_output)
+            for video_output in self.pop_eligible_video_outputs()
+        ]
 
+    def close_all_video_outputs(self) -> List[OutputFile]:
         return [
-            OutputFile(
-                file_type=OutputFileType.video,
-                file_path=video_output.file_path,
-                timestamp=video_output.timestamp,
-            )
-            for _, video_output in closed_video_outputs
+            self.close_video_output(video_output)
+            for video_output in self.pop_all_video_outputs()
         ]
@@ -1,13 +1,23 @@
+import cProfile
 import logging
 import threading
+from typing import Optional
+
+from ..metrics.pipeline import WORKER_ERRORS, WORKER_PROCESSING_SECONDS
+from ..metrics.registry import Timer
+from ..tracing.profiler import PROFILER
 
 logger = logging.getLogger(__name__)
 
 
 class BaseWorker(threading.Thread):
-    def __init__(self, name: str = None):
+    def __init__(self, name: Optional[str] = None):
         super().__init__(name=name)
         self._should_exit = threading.Event()
+        self._processing_seconds = WORKER_PROCESSING_SECONDS.labels(self.name)
+        self._errors = WORKER_ERRORS.labels(self.name)
+        self._profile: Optional[cProfile.Profile] = None
+        self._profiler_generation = PROFILER.generation
 
     def run_processing(self):
         raise NotImplementedError()
@@ -15,13 +25,40 @@ class BaseWorker(threading.Thread):
     def teardown(self):
         pass
 
+    def processing(self) -> Timer:
+        # Wraps the work on an item, waiting for the item is left out
+        return self._processing_seconds.time()
+
+    def check_profiling(self):
+        # cProfile only sees the thread that enabled it, so every worker
+        # starts its own when profiling is toggled
+        if self._profiler_generation == PROFILER.generation:
+            return
+        self._profiler_generation = PROFILER.generation
+
+        if PROFILER.should_profile(self.name):
+            if self._profile is None:
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+        else:
+            self.stop_profiling()
+
+    def stop_profiling(self):
+        if self._profile is not None:
+            self._profile.disable()
+            PROFILER.dump(self.name, self._profile)
+            self._profile = None
+
     def run(self):
         while not self._should_exit.is_set():
+            self.check_profiling()
             try:
                 self.run_processing()
             except Exception as error:
+                self._errors.inc()
                 logger.error(f"{self.__class__.__name__} processing failed {error}")
         self.teardown()
+        self.stop_profiling()
 
     def stop(self):
         logger.info(f"Stopping {self.__class__.__name__}")
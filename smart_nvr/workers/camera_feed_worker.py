@@ -3,33 +3,58 @@ import threading
 import time
 from typing import Optional
 
-import cv2
 import numpy as np
 
-from ..app_config import CameraFeedConfig
-from ..camera.feed_multiplexer import CameraFeedMultiplexer
+from ..app_config import BaseCameraFeedConfig
+from ..camera.capture import CAPTURE_MAP, BaseCapture
+from ..camera.feed_multiplexer import CameraFeedMultiplexer, FrameSink
 from ..camera.image import CameraImageContainer, get_split_image_dimensions
-from ..camera.motion_detection.detection import detect_motion
+from ..camera.motion_detection.detection import rectangles_to_dimensions
 from ..camera.motion_detection.hikvision import HikvisionMotionDetection
+from ..camera.motion_detection.motion_detector_map import MOTION_DETECTOR_MAP
+from ..metrics.pipeline import FRAMES_DROPPED
+from ..tracing.trace import TRACER, span
+from ..utils.backoff import ExponentialBackoff
+from ..utils.timing import get_current_time_millis
+from ..video.packet_buffer import PacketRingBuffer
 from .base_worker import BaseWorker
 
 logger = logging.getLogger(__name__)
 
+RECONNECT_INITIAL_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 30.0
+
 
 class CameraFeedWorker(BaseWorker):
     def __init__(
         self,
         camera_name: str,
-        feed_multiplexer: CameraFeedMultiplexer,
-        config: CameraFeedConfig,
+        feed_multiplexer: FrameSink,
+        config: BaseCameraFeedConfig,
+        motion_detection: Optional[HikvisionMotionDetection] = None,
+        packet_buffer: Optional[PacketRingBuffer] = None,
     ):
         super().__init__(name=f"CameraFeedWorker[{camera_name}]")
         self._camera_name = camera_name
         self._feed_multiplexer = feed_multiplexer
         self._config = config
         self._should_read = threading.Event()
-        self._motion_detection = HikvisionMotionDetection(config.motion)
-        self._motion_detection.set_callback(self._handle_motion_changed)
+        self._motion_detector = MOTION_DETECTOR_MAP[config.motion_detection.backend](
+            config.motion_detection
+        )
+        self._packet_buffer = packet_buffer
+        self._dropped_busy = FRAMES_DROPPED.labels(camera_name, "busy")
+        self._dropped_full = FRAMES_DROPPED.labels(camera_name, "full")
+        # Frames put into the multiplexer
+        self.forwarded_count = 0
+        self._reconnect_backoff = ExponentialBackoff(
+            RECONNECT_INITIAL_SECONDS, RECONNECT_MAX_SECONDS
+        )
+        # Failed attempts since a frame or packet was last read
+        self._reconnect_attempt = 0
+        self._motion_detection = motion_detection
+        if self._motion_detection is not None:
+            self._motion_detection.set_callback(self._handle_motion_changed)
 
     def _handle_motion_changed(self, motion: bool):
         logger.info(f"{self._camera_name} motion: {motion}")
@@ -40,74 +65,63 @@ class CameraFeedWorker(BaseWorker):
 
     def start(self):
         super().start()
-        self._motion_detection.start()
-
-    def run_processing(self):
-        cap: Optional[cv2.VideoCapture] = None
+        if self._motion_detection is not None:
+            self._motion_detection.start()
 
-        try:
-            if not self._should_read.wait(timeout=1):
-                return
+    def open_capture(self) -> BaseCapture:
+        capture_config = self._config.capture
+        cap = CAPTURE_MAP[capture_config.backend](
+            self._config.source_url, capture_config, self._packet_buffer
+        )
+        return cap
 
-            cap = cv2.VideoCapture(self._config.rtsp_url)
-            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            previous_raw_image_np: Optional[np.ndarray] = None
-
-            time.sleep(1)
-
-            while self._should_read.is_set():
-                ret = cap.grab()
-
-                if ret is not True:
-                    logger.error(
-                        f"Failed to grab image from camera: {self._camera_name}"
-                    )
-                    time.sleep(5)
-                    break
+    def slot_available(self) -> bool:
+        return not self._feed_multiplexer.contains(self._camera_name)
 
-                if self._feed_multiplexer.contains(self._camera_name):
-                    continue
+    def handle_capture_ended(self):
+        logger.error(f"Failed to grab image from camera: {self._camera_name}")
 
-                ret, raw_image_np = cap.retrieve()
-                if ret is not True:
-                    logger.error(
-                        f"Failed to retrieve image from camera: {self._camera_name}"
-                    )
-                    time.sleep(5)
-                    break
+    def reading_stopped(self):
+        pass
 
-                raw_image_np = raw_image_np[..., ::-1]  #  Convert from BGR to RGB
-                raw_image_np = raw_image_np.astype(np.uint8)
+    def wait_reconnect(self):
+        self._reconnect_attempt += 1
+        delay = self._reconnect_backoff.delay(self._reconnect_attempt)
+        logger.info(f"Reconnecting {self._camera_name} in {delay:.1f} s")
+        self._should_exit.wait(delay)
 
-                if previous_raw_image_np is None:
-                    previous_raw_image_np = raw_image_np
-                    continue
+    def run_processing(self):
+        cap: Optional[BaseCapture] = None
+        standby = self._config.capture.standby
+        failed = False
 
-                motion_dimensions = detect_motion(previous_raw_image_np, raw_image_np)
+        try:
+            if not standby and not self._should_read.wait(timeout=1):
+                return
 
-                if len(motion_dimensions) > 0:
-                    image_container = CameraImageContainer.create(
-                        self._camera_name,
-                        raw_image_np,
-                        motion_dimensions,
-                    )
+            cap = self.open_capture()
+
+            while not self._should_exit.is_set():
+                if self._should_read.is_set():
+                    self._motion_detector.reset()
+                    finished = self.read_frames(cap)
+                    self.reading_stopped()
+                    if not finished:
+                        failed = True
+                        break
+                    if not standby:
+                        break
+                # Session stays open without motion, packets are only demuxed
+                elif cap.standby():
+                    self._reconnect_attempt = 0
                 else:
-                    image_container = CameraImageContainer.create(
-                        self._camera_name,
-                        raw_image_np,
-                        get_split_image_dimensions(raw_image_np),
-                    )
-
-                try:
-                    self._feed_multiplexer.put_nowait(image_container)
-                except CameraFeedMultiplexer.Full:
-                    pass
+                    self.handle_capture_ended()
+                    failed = True
+                    break
         except Exception as error:
             logger.error(f"Camera feed failed: {self._camera_name}")
             logger.error(error)
-            if cap is not None:
-                cap.release()
-            time.sleep(5)
+            failed = True
         finally:
             try:
                 if cap is not None:
@@ -116,6 +130,102 @@ class CameraFeedWorker(BaseWorker):
                 logger.error(f"Failed to release camera feed: {self._camera_name}")
                 logger.error(error)
 
+        if failed:
+            self.wait_reconnect()
+
+    def read_frames(self, cap: BaseCapture) -> bool:
+        # Reads until motion ends, False when the capture failed
+        capture_config = self._config.capture
+        frames_count = 0
+        last_analysed_at = 0
+        min_analyse_interval = (
+            int(1000 / capture_config.target_fps)
+            if capture_config.target_fps is not None
+            else 0
+        )
+
+        while self._should_read.is_set():
+            # Profiling is toggled per frame
+            self.check_profiling()
+            ret = cap.grab()
+
+            if ret is not True:
+                self.handle_capture_ended()
+                return False
+
+            self._reconnect_attempt = 0
+            frames_count += 1
+            if frames_count % capture_config.frame_step != 0:
+                continue
+
+            current_time = cap.timestamp_millis()
+            if current_time is None:
+                current_time = get_current_time_millis()
+            if current_time - last_analysed_at < min_analyse_interval:
+                continue
+
+            if not self.slot_available():
+                self._dropped_busy.inc()
+                continue
+
+            last_analysed_at = current_time
+            processing_started = time.perf_counter()
+            trace = TRACER.start_trace(self._camera_name)
+
+            with span(trace, "retrieve"):
+                raw_image_np = self.retrieve_image(cap)
+            if raw_image_np is None:
+                logger.error(
+                    f"Failed to retrieve image from camera: {self._camera_name}"
+                )
+                TRACER.finish(trace, "failed")
+                return False
+
+            with span(trace, "motion"):
+                motion = self._motion_detector.detect_rectangles(raw_image_np)
+            # Motion detector is still warming up, frame is not forwarded
+            if motion is None:
+                TRACER.finish(trace, "warmup")
+                continue
+
+            (height, width, _) = raw_image_np.shape
+            motion_dimensions = rectangles_to_dimensions(motion, height, width)
+
+            if len(motion_dimensions) > 0:
+                image_container = CameraImageContainer.create(
+                    self._camera_name,
+                    raw_image_np,
+                    motion_dimensions,
+                    created_at=current_time,
+                    motion=motion,
+                    trace=trace,
+                )
+            else:
+                image_container = CameraImageContainer.create(
+                    self._camera_name,
+                    raw_image_np,
+                    get_split_image_dimensions(raw_image_np),
+                    created_at=current_time,
+                    motion=motion,
+                    trace=trace,
+                )
+
+            self._processing_seconds.observe(time.perf_counter() - processing_started)
+            if trace is not None:
+                trace.enqueue("camera_feed")
+            try:
+                self._feed_multiplexer.put_nowait(image_container)
+                self.forwarded_count += 1
+            except CameraFeedMultiplexer.Full:
+                self._dropped_full.inc()
+                TRACER.finish(trace, "dropped")
+
+        return True
+
+    def retrieve_image(self, cap: BaseCapture) -> Optional[np.ndarray]:
+        # Decoded frames are kept in native BGR
+        return cap.retrieve()
+
     def enable_read(self):
         if self._should_exit.is_set():
             raise RuntimeError("Can't enable read on destroyed CameraFeed")
@@ -125,6 +235,7 @@ class CameraFeedWorker(BaseWorker):
         self._should_read.clear()
 
     def stop(self):
-        self._motion_detection.stop()
+        if self._motion_detection is not None:
+            self._motion_detection.stop()
         super().stop()
         self.disable_read()
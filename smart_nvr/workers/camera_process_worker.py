@@ -0,0 +1,184 @@
+import logging
+import multiprocessing
+import queue
+import signal
+from typing import Any, Optional
+
+import numpy as np
+
+from ..app_config import CameraFeedConfig, SharedMemoryConfig
+from ..camera.capture import BaseCapture
+from ..camera.feed_multiplexer import CameraFeedMultiplexer
+from ..camera.motion_detection.hikvision import HikvisionMotionDetection
+from ..camera.shared_frame_buffer import (
+    FrameTooLargeError,
+    SharedFrameReader,
+    SharedFrameRingBuffer,
+    SharedFrameWriter,
+)
+from .base_worker import BaseWorker
+from .camera_feed_worker import CameraFeedWorker
+
+logger = logging.getLogger(__name__)
+
+PROCESS_JOIN_TIMEOUT = 5
+
+
+class SharedMemoryCameraFeedWorker(CameraFeedWorker):
+    _feed_multiplexer: SharedFrameWriter
+
+    def __init__(
+        self,
+        camera_name: str,
+        frame_writer: SharedFrameWriter,
+        config: CameraFeedConfig,
+        should_read: Any,
+    ):
+        super().__init__(camera_name, frame_writer, config)
+        # Read flag is toggled by the motion detection in the parent process
+        self._should_read = should_read
+
+    def run_processing(self):
+        try:
+            super().run_processing()
+        finally:
+            self._feed_multiplexer.reset()
+
+    def reading_stopped(self):
+        # Standby sessions outlive a read, slots are handed back after each
+        self._feed_multiplexer.reset()
+
+    def retrieve_image(self, cap: BaseCapture) -> Optional[np.ndarray]:
+        frame_shape = cap.frame_shape()
+        try:
+            raw_image_np = self._feed_multiplexer.allocate(frame_shape)
+        except FrameTooLargeError:
+            # Reconnecting won't shrink the frame, feed stays down until reconfigured
+            height, width = frame_shape[:2]
+            logger.error(
+                f"Frame of {self._camera_name} is {width}x{height}, larger than "
+                "shared_memory.max_frame_width/max_frame_height allow, "
+                "stopping camera feed"
+            )
+            self.stop()
+            return None
+        if raw_image_np is None:
+            return None
+
+        # Decode straight into the shared slot
+        decoded_image_np = cap.retrieve(raw_image_np)
+        if decoded_image_np is None:
+            return None
+
+        if decoded_image_np.__array_interface__["data"][0] != (
+            raw_image_np.__array_interface__["data"][0]
+        ):
+            np.copyto(raw_image_np, decoded_image_np)
+
+        return raw_image_np
+
+
+def run_camera_feed_process(
+    camera_name: str,
+    config: CameraFeedConfig,
+    ring: SharedFrameRingBuffer,
+    handle_queue: Any,
+    pending: Any,
+    should_read: Any,
+    should_exit: Any,
+):
+    # Parent process takes care of the shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    worker = SharedMemoryCameraFeedWorker(
+        camera_name,
+        SharedFrameWriter(ring, handle_queue, pending),
+        config,
+        should_read,
+    )
+    worker.start()
+
+    should_exit.wait()
+
+    worker.stop()
+    worker.join()
+
+
+class CameraFeedProcessWorker(BaseWorker):
+    def __init__(
+        self,
+        camera_name: str,
+        feed_multiplexer: CameraFeedMultiplexer,
+        config: CameraFeedConfig,
+        motion_detection: HikvisionMotionDetection,
+        shared_memory_config: SharedMemoryConfig,
+    ):
+        super().__init__(name=f"CameraFeedProcessWorker[{camera_name}]")
+        self._camera_name = camera_name
+
+        ctx = multiprocessing.get_context("spawn")
+        ring = SharedFrameRingBuffer(
+            ctx, shared_memory_config.slots, shared_memory_config.slot_size
+        )
+        handle_queue = ctx.Queue()
+        pending = ctx.Event()
+        self._should_read = ctx.Event()
+        self._process_should_exit = ctx.Event()
+
+        self._frame_reader = SharedFrameReader(
+            ring, handle_queue, pending, feed_multiplexer
+        )
+        self._process = ctx.Process(
+            target=run_camera_feed_process,
+            name=f"CameraFeedProcess[{camera_name}]",
+            args=(
+                camera_name,
+                config,
+                ring,
+                handle_queue,
+                pending,
+                self._should_read,
+                self._process_should_exit,
+            ),
+            daemon=True,
+        )
+
+        self._motion_detection = motion_detection
+        self._motion_detection.set_callback(self._handle_motion_changed)
+
+    def _handle_motion_changed(self, motion: bool):
+        logger.info(f"{self._camera_name} motion: {motion}")
+        if motion:
+            self._should_read.set()
+        else:
+            self._should_read.clear()
+
+    def start(self):
+        self._process.start()
+        super().start()
+        self._motion_detection.start()
+
+    def run_processing(self):
+        try:
+            camera_name = self._frame_reader.forward(timeout=1)
+        except queue.Empty:
+            return
+
+        if camera_name is None:
+            return
+
+        while not self._should_exit.is_set():
+            if self._frame_reader.wait_taken(camera_name, timeout=1):
+                break
+
+    def teardown(self):
+        self._process.join(timeout=PROCESS_JOIN_TIMEOUT)
+        if self._process.is_alive():
+            logger.error(f"Terminating camera feed process: {self._camera_name}")
+            self._process.terminate()
+
+    def stop(self):
+        self._motion_detection.stop()
+        self._should_read.clear()
+        self._process_should_exit.set()
+        super().stop()
@@ -1,10 +1,14 @@
 import queue
+import time
+from typing import List, Optional, Sequence
 
+from ..app_config import BoxMergingEnum
 from ..camera.feed_multiplexer import CameraFeedMultiplexer
-from ..camera.image import DetectionCameraImageContainer
+from ..camera.image import CameraImageContainer, DetectionCameraImageContainer
 from ..detection.base_model import BaseDetectionModel
-from ..detection.detection_types import merge_detections
-from ..detection.post_processing import filter_detections
+from ..detection.detection_types import Detection, DetectionBatch
+from ..metrics.pipeline import INFERENCE_SECONDS, QUEUE_DEPTH
+from ..tracing.trace import now_micros, span
 from .base_worker import BaseWorker
 
 
@@ -15,29 +19,94 @@ class DetectionWorker(BaseWorker):
         self,
         model: BaseDetectionModel,
         image_queue: CameraFeedMultiplexer,
+        batch_size: int = 1,
+        batch_max_wait_millis: int = 20,
+        detection_names: Optional[List[str]] = None,
+        box_merging: BoxMergingEnum = BoxMergingEnum.merge,
+        nms_iou_threshold: float = 0.5,
+        model_name: Optional[str] = None,
     ):
         super().__init__(name="DetectionWorker")
         self._model = model
         self._image_queue = image_queue
+        self._batch_size = batch_size
+        self._batch_max_wait_millis = batch_max_wait_millis
+        self._box_merging = box_merging
+        self._nms_iou_threshold = nms_iou_threshold
         self._detection_queue = queue.Queue(10)
-        self._detection_names = ["person", "car", "cat"]
+        self._model_name = (
+            model_name if model_name is not None else model.__class__.__name__
+        )
+
+        QUEUE_DEPTH.labels("detection").set_function(self._detection_queue.qsize)
+        # Models with an allowlist drop other labels already, this catches
+        # the ones decoding every label
+        self._detection_names = (
+            detection_names if detection_names is not None else ["person", "car", "cat"]
+        )
 
     @property
     def detection_queue(self) -> "queue.Queue[DetectionCameraImageContainer]":
         return self._detection_queue
 
+    def get_batch(self) -> List[CameraImageContainer]:
+        imgs = [self._image_queue.get(timeout=1)]
+        crops_count = len(imgs[0].cropped_images)
+
+        deadline = time.monotonic() + self._batch_max_wait_millis / 1000.0
+
+        while crops_count < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                img = self._image_queue.get(timeout=remaining)
+            except CameraFeedMultiplexer.Empty:
+                break
+
+            imgs.append(img)
+            crops_count += len(img.cropped_images)
+
+        return imgs
+
+    def post_process(self, detections: Sequence[Detection]) -> DetectionBatch:
+        batch = DetectionBatch.from_detections(detections).filter_names(
+            self._detection_names
+        )
+        if self._box_merging == BoxMergingEnum.nms:
+            return batch.suppress(self._nms_iou_threshold)
+        return batch.merge()
+
     def run_processing(self):
         try:
-            img = self._image_queue.get(timeout=1)
+            imgs = self.get_batch()
+        except CameraFeedMultiplexer.Empty:
+            return
 
-            detections = self._model.detect(img)
+        traces = [img.trace for img in imgs if img.trace is not None]
+        for trace in traces:
+            trace.dequeue()
 
-            detections = filter_detections(
-                detections,
-                self._detection_names,
-            )
-            detections = merge_detections(detections)
+        with self.processing():
+            crops_count = sum(len(img.cropped_images) for img in imgs)
+            inference_started = now_micros()
+            with INFERENCE_SECONDS.labels(self._model_name, str(crops_count)).time():
+                if len(imgs) == 1:
+                    detections_list = [self._model.detect(imgs[0])]
+                else:
+                    detections_list = self._model.detect_batch(imgs)
+            # Every frame of the batch waited for the whole inference
+            for trace in traces:
+                trace.add_span("inference", inference_started, now_micros())
 
-            self._detection_queue.put(DetectionCameraImageContainer(img, detections))
-        except CameraFeedMultiplexer.Empty:
-            pass
+            results = []
+            for img, detections in zip(imgs, detections_list):
+                with span(img.trace, "post_process"):
+                    batch = self.post_process(detections)
+                results.append(DetectionCameraImageContainer(img, batch))
+
+        for result in results:
+            if result.trace is not None:
+                result.trace.enqueue("detection")
+            self._detection_queue.put(result)
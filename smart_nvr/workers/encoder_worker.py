@@ -0,0 +1,113 @@
+import logging
+import queue
+from typing import Callable, Dict, Optional
+
+from ..app_config import RecordingConfig
+from ..camera.image import DetectionCameraImageContainer
+from ..metrics.pipeline import ENCODED_FRAMES, QUEUE_DEPTH
+from ..tracing.trace import TRACER, span
+from ..video.output_file import OutputFile
+from ..video.packet_buffer import PacketRingBuffer
+from ..video.video_writer_manager import VideoWriterManager
+from .base_worker import BaseWorker
+from .video_finalizer_worker import VideoFinalizerWorker
+
+logger = logging.getLogger(__name__)
+
+ENCODER_QUEUE_SIZE = 25
+
+RecordingCallback = Callable[[str, bool], None]
+
+
+class EncoderWorker(BaseWorker):
+    _image_queue: "queue.Queue[DetectionCameraImageContainer]"
+
+    def __init__(
+        self,
+        camera_name: str,
+        output_directory: str,
+        output_file_queue: "queue.Queue[OutputFile]",
+        finalizer: VideoFinalizerWorker,
+        recording_configs: Optional[Dict[str, RecordingConfig]] = None,
+        packet_buffers: Optional[Dict[str, PacketRingBuffer]] = None,
+        recording_callback: Optional[RecordingCallback] = None,
+    ):
+        super().__init__(name=f"EncoderWorker[{camera_name}]")
+        self._camera_name = camera_name
+        self._video_writer_manager = VideoWriterManager(
+            output_directory, recording_configs, packet_buffers
+        )
+        self._output_file_queue = output_file_queue
+        self._finalizer = finalizer
+        # Single consumer per camera keeps the frames of a clip in order
+        self._image_queue = queue.Queue(ENCODER_QUEUE_SIZE)
+        self._encoded_frames = ENCODED_FRAMES.labels(camera_name)
+
+        QUEUE_DEPTH.labels(f"encoder[{camera_name}]").set_function(
+            self._image_queue.qsize
+        )
+
+        self._recording_callback = recording_callback
+        self._recording = False
+
+    def put_nowait(self, img: DetectionCameraImageContainer):
+        self._image_queue.put_nowait(img)
+
+    def write_image(self, img: DetectionCameraImageContainer):
+        image_output_file = self._video_writer_manager.write_image(img)
+        if self._video_writer_manager.has_video_output(self._camera_name):
+            self._encoded_frames.inc()
+        if image_output_file is not None:
+            try:
+                self._output_file_queue.put_nowait(image_output_file)
+            except queue.Full:
+                logger.warning(f"Dropped image file: {image_output_file}")
+
+    def update_recording(self):
+        recording = self._video_writer_manager.has_video_output(self._camera_name)
+        if recording != self._recording:
+            self._recording = recording
+            if self._recording_callback is not None:
+                self._recording_callback(self._camera_name, recording)
+
+    def run_processing(self):
+        try:
+            img = self._image_queue.get(block=True, timeout=1)
+            if img.trace is not None:
+                img.trace.dequeue()
+
+            with self.processing(), span(img.trace, "encode"):
+                self.write_image(img)
+            TRACER.finish(img.trace)
+        except queue.Empty:
+            pass
+
+        # Flushing the encoder and closing the file happens on the finalizer,
+        # finished segments are uploaded while the clip is still recording
+        for segment in self._video_writer_manager.pop_finished_segments():
+            self._finalizer.put(segment)
+
+        for video_output in self._video_writer_manager.pop_eligible_video_outputs():
+            self._finalizer.put(video_output)
+
+        self.update_recording()
+
+    def teardown(self):
+        while True:
+            try:
+                img = self._image_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                self.write_image(img)
+            except Exception as error:
+                logger.error(f"{self.name} failed to write image: {error}")
+
+        for segment in self._video_writer_manager.pop_finished_segments():
+            self._finalizer.put(segment)
+
+        for video_output in self._video_writer_manager.pop_all_video_outputs():
+            self._finalizer.put(video_output)
+
+        self.update_recording()
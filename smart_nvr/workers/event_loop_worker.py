@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from typing import Any, Callable, Coroutine, Dict
+
+from .base_worker import BaseWorker
+
+logger = logging.getLogger(__name__)
+
+# Longest the loop runs before the worker checks for stop
+STOP_CHECK_SECONDS = 1.0
+
+
+class EventLoopWorker(BaseWorker):
+    # Runs the coroutines of many sources on a single thread
+    def __init__(self, name: str = "EventLoopWorker"):
+        super().__init__(name=name)
+        self._loop = asyncio.new_event_loop()
+        # Only touched on the loop thread
+        self._tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+    def start_task(
+        self, name: str, coroutine_function: Callable[[], Coroutine[Any, Any, Any]]
+    ):
+        # Coroutine is created on the loop, tasks scheduled after stop never start
+        self._call_soon(self._start_task, name, coroutine_function)
+
+    def cancel_task(self, name: str):
+        self._call_soon(self._cancel_task, name)
+
+    def _call_soon(self, callback: Callable[..., Any], *args: Any):
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Loop is closed once the worker stopped
+            logger.debug(f"{self.name} stopped, ignoring {callback.__name__}")
+
+    def _start_task(
+        self, name: str, coroutine_function: Callable[[], Coroutine[Any, Any, Any]]
+    ):
+        self._cancel_task(name)
+        self._tasks[name] = self._loop.create_task(coroutine_function())
+
+    def _cancel_task(self, name: str):
+        task = self._tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+    def run(self):
+        asyncio.set_event_loop(self._loop)
+        super().run()
+
+    def run_processing(self):
+        self._loop.run_until_complete(asyncio.sleep(STOP_CHECK_SECONDS))
+
+    def teardown(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        if len(tasks) > 0:
+            self._loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True)
+            )
+            # Transports closed by the tasks finish closing on the next pass
+            self._loop.run_until_complete(asyncio.sleep(0))
+        self._loop.close()
@@ -0,0 +1,54 @@
+import logging
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Tuple
+
+from ..metrics.registry import REGISTRY, MetricsRegistry
+from .base_worker import BaseWorker
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    server: "MetricsServer"
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class MetricsServer(HTTPServer):
+    def __init__(self, address: Tuple[str, int], registry: MetricsRegistry):
+        super().__init__(address, MetricsRequestHandler)
+        self.registry = registry
+        # Lets the worker check for stop between requests
+        self.timeout = 1
+
+
+class MetricsWorker(BaseWorker):
+    def __init__(self, host: str, port: int, registry: MetricsRegistry = REGISTRY):
+        super().__init__(name="MetricsWorker")
+        self._server = MetricsServer((host, port), registry)
+        logger.info(f"Serving metrics on {host}:{self.server_port}/metrics")
+
+    @property
+    def server_port(self) -> int:
+        return self._server.server_address[1]
+
+    def run_processing(self):
+        self._server.handle_request()
+
+    def teardown(self):
+        self._server.server_close()
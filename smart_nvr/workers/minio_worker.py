@@ -1,14 +1,27 @@
 import logging
 import os
 import queue
+import threading
 from pathlib import PosixPath
+from typing import TYPE_CHECKING, List, Optional
 
-from minio import Minio
-
-from ..app_config import MinioConfig
+from ..app_config import MinioConfig, UploadConfig
+from ..metrics.pipeline import (
+    QUEUE_DEPTH,
+    UPLOAD_SECONDS,
+    UPLOAD_SPOOL_BYTES,
+    UPLOADED_BYTES,
+    UPLOADS,
+)
+from ..tracing.trace import TRACER
+from ..upload.spool import SpoolEntry, UploadSpool
+from ..utils.backoff import ExponentialBackoff
 from ..video.output_file import OutputFile
 from .base_worker import BaseWorker
 
+if TYPE_CHECKING:
+    from minio import Minio
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,55 +36,155 @@ def get_object_name(output_file: OutputFile) -> str:
     )
 
 
+class MinioUploader:
+    _minio_client: Optional["Minio"]
+
+    def __init__(
+        self,
+        config: MinioConfig,
+        upload_config: UploadConfig,
+        minio_client: Optional["Minio"] = None,
+    ):
+        self._config = config
+        self._bucket_name = config.bucket
+        self._part_size = upload_config.part_size
+        self._parallel_parts = upload_config.parallel_parts
+
+        self._mutex = threading.Lock()
+        self._minio_client = minio_client
+        self._bucket_checked = False
+
+    def get_minio_client(self) -> "Minio":
+        # Connecting is retried with the upload, MinIO may not be up yet
+        with self._mutex:
+            if self._minio_client is None:
+                from minio import Minio
+
+                self._minio_client = Minio(
+                    f"{self._config.host}:{self._config.port}",
+                    secure=self._config.secure,
+                    access_key=self._config.access_key,
+                    secret_key=self._config.secret_key,
+                )
+
+            if not self._bucket_checked:
+                if not self._minio_client.bucket_exists(self._bucket_name):
+                    self._minio_client.make_bucket(self._bucket_name)
+                self._bucket_checked = True
+
+            return self._minio_client
+
+    def upload_file(self, output_file: OutputFile):
+        object_name = get_object_name(output_file)
+
+        logger.info(
+            f"Uploading file from {output_file.file_path} to {self._bucket_name}/{object_name}"
+        )
+        # Files larger than a part are sent as multipart upload
+        self.get_minio_client().fput_object(
+            bucket_name=self._bucket_name,
+            object_name=object_name,
+            file_path=output_file.file_path,
+            part_size=self._part_size,
+            num_parallel_uploads=self._parallel_parts,
+        )
+
+
+class MinioUploadWorker(BaseWorker):
+    def __init__(self, index: int, spool: UploadSpool, uploader: MinioUploader):
+        super().__init__(name=f"MinioUploadWorker[{index}]")
+        self._spool = spool
+        self._uploader = uploader
+
+    def upload(self, entry: SpoolEntry):
+        try:
+            with UPLOAD_SECONDS.time(), self.processing(), TRACER.span(
+                "upload", file_path=entry.output_file.file_path, size=entry.size
+            ):
+                self._uploader.upload_file(entry.output_file)
+        except Exception as error:
+            UPLOADS.labels("failure").inc()
+            logger.error(f"Failed to upload file to minio: {error}")
+            self._spool.retry(entry)
+            return
+
+        UPLOADS.labels("success").inc()
+        UPLOADED_BYTES.inc(entry.size)
+        self._spool.complete(entry)
+
+    def run_processing(self):
+        entry = self._spool.get(timeout=1)
+        if entry is not None:
+            self.upload(entry)
+
+
 class MinioWorker(BaseWorker):
+    _upload_workers: List[MinioUploadWorker]
+
     def __init__(
         self,
         config: MinioConfig,
         file_queue: "queue.Queue[OutputFile]",
+        upload_config: Optional[UploadConfig] = None,
+        minio_client: Optional["Minio"] = None,
     ):
         super().__init__(name="MinioWorker")
         self._file_queue = file_queue
 
-        self._bucket_name = config.bucket
+        upload_config = upload_config if upload_config is not None else UploadConfig()
+        self._spool = UploadSpool(
+            upload_config.spool_directory,
+            upload_config.max_spool_bytes,
+            ExponentialBackoff(
+                upload_config.retry_initial_seconds, upload_config.retry_max_seconds
+            ),
+        )
 
-        try:
-            self._minio_client = Minio(
-                f"{config.host}:{config.port}",
-                secure=config.secure,
-                access_key=config.access_key,
-                secret_key=config.secret_key,
-            )
-            if not self._minio_client.bucket_exists(self._bucket_name):
-                self._minio_client.make_bucket(self._bucket_name)
-        except Exception as error:
-            logger.error(error)
-            self._minio_client = None
+        QUEUE_DEPTH.labels("upload_spool").set_function(self._spool.__len__)
+        UPLOAD_SPOOL_BYTES.labels().set_function(lambda: self._spool.size)
+
+        uploader = MinioUploader(config, upload_config, minio_client)
+        self._upload_workers = [
+            MinioUploadWorker(index, self._spool, uploader)
+            for index in range(upload_config.workers)
+        ]
+
+    @property
+    def spool(self) -> UploadSpool:
+        return self._spool
+
+    def start(self):
+        for upload_worker in self._upload_workers:
+            upload_worker.start()
+        super().start()
 
     def run_processing(self):
+        # Only journals the file, the queue from video worker never backs up
         try:
             output_file = self._file_queue.get(block=True, timeout=1)
-
-            self.upload_file(output_file)
         except queue.Empty:
-            pass
+            return
 
-    def upload_file(self, output_file: OutputFile):
         try:
-            if self._minio_client is not None:
-                object_name = get_object_name(output_file)
-
-                logger.info(
-                    f"Uploading file from {output_file.file_path} to {self._bucket_name}/{object_name}"
-                )
-                self._minio_client.fput_object(
-                    bucket_name=self._bucket_name,
-                    object_name=object_name,
-                    file_path=output_file.file_path,
-                )
+            with self.processing(), TRACER.span(
+                "spool", file_path=output_file.file_path
+            ):
+                self._spool.add(output_file)
         except Exception as error:
-            logger.error(f"Failed to upload file to minio: {error}")
-        finally:
+            logger.error(f"Failed to spool {output_file}: {error}")
+
+    def teardown(self):
+        # Files still queued are journaled, pending uploads resume on restart
+        while True:
             try:
-                os.remove(output_file.file_path)
+                self._spool.add(self._file_queue.get_nowait())
+            except queue.Empty:
+                break
             except Exception as error:
-                logger.error(f"Failed to remove local file: {error}")
+                logger.error(f"Failed to spool file: {error}")
+
+        for upload_worker in self._upload_workers:
+            upload_worker.stop()
+
+        for upload_worker in self._upload_workers:
+            upload_worker.join()
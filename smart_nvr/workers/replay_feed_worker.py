@@ -0,0 +1,77 @@
+import logging
+import threading
+from typing import Optional
+
+from ..app_config import ReplayFeedConfig
+from ..camera.capture import BaseCapture
+from ..camera.feed_multiplexer import CameraFeedMultiplexer
+from ..camera.replay import ReplayCapture
+from ..utils.timing import SimulatedClock, get_current_time_millis
+from .camera_feed_worker import CameraFeedWorker
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayFeedWorker(CameraFeedWorker):
+    def __init__(
+        self,
+        camera_name: str,
+        feed_multiplexer: CameraFeedMultiplexer,
+        config: ReplayFeedConfig,
+        clock: Optional[SimulatedClock] = None,
+    ):
+        super().__init__(camera_name, feed_multiplexer, config)
+        self._multiplexer = feed_multiplexer
+        self._replay_config = config
+        self._clock = clock
+        self.finished = threading.Event()
+
+        if self._clock is not None:
+            self._clock.add_lane(camera_name)
+
+        # Triggers decide which frames are analysed, the file is read right away
+        self.enable_read()
+
+    def open_capture(self) -> BaseCapture:
+        return ReplayCapture(
+            self._camera_name,
+            self._replay_config,
+            self._clock.time_millis()
+            if self._clock is not None
+            else get_current_time_millis(),
+            self._clock,
+        )
+
+    def slot_available(self) -> bool:
+        if self._clock is None:
+            return super().slot_available()
+
+        # Fast replay waits for the pipeline instead of dropping frames
+        while self._multiplexer.contains(self._camera_name):
+            if self._should_exit.is_set():
+                return False
+            self._multiplexer.wait_taken(self._camera_name, timeout=1)
+        return True
+
+    def handle_capture_ended(self):
+        logger.info(f"Replay ended: {self._camera_name}")
+        self.disable_read()
+        self._release_lane()
+        self.finished.set()
+
+    def wait_reconnect(self):
+        # Finished replays are not reopened
+        if not self.finished.is_set():
+            super().wait_reconnect()
+
+    def _release_lane(self):
+        if self._clock is not None:
+            self._clock.remove_lane(self._camera_name)
+
+    def teardown(self):
+        self._release_lane()
+
+    def stop(self):
+        super().stop()
+        # Feeds waiting for slower lanes are woken up to exit
+        self._release_lane()
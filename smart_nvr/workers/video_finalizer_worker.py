@@ -0,0 +1,59 @@
+import logging
+import queue
+
+from ..metrics.pipeline import QUEUE_DEPTH
+from ..video.output_file import OutputFile
+from ..video.video_output import BaseVideoOutput
+from ..video.video_writer_manager import VideoWriterManager
+from .base_worker import BaseWorker
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FILE_PUT_TIMEOUT = 10
+
+
+class VideoFinalizerWorker(BaseWorker):
+    _video_output_queue: "queue.Queue[BaseVideoOutput]"
+
+    def __init__(self, output_file_queue: "queue.Queue[OutputFile]"):
+        super().__init__(name="VideoFinalizerWorker")
+        self._output_file_queue = output_file_queue
+        # Unbounded, encoder lanes must never block on finished clips
+        self._video_output_queue = queue.Queue()
+
+        QUEUE_DEPTH.labels("finalize").set_function(self._video_output_queue.qsize)
+
+    def put(self, video_output: BaseVideoOutput):
+        self._video_output_queue.put_nowait(video_output)
+
+    def finalize(self, video_output: BaseVideoOutput):
+        try:
+            with self.processing():
+                output_file = VideoWriterManager.close_video_output(video_output)
+        except Exception as error:
+            logger.error(f"Failed to close video output {video_output}: {error}")
+            return
+
+        logger.info(f"Closed video writer: {output_file}")
+        try:
+            # Waiting is fine here, it only delays other finished clips
+            self._output_file_queue.put(output_file, timeout=OUTPUT_FILE_PUT_TIMEOUT)
+        except queue.Full:
+            logger.error(f"Dropped video file: {output_file}")
+
+    def run_processing(self):
+        try:
+            video_output = self._video_output_queue.get(block=True, timeout=1)
+        except queue.Empty:
+            return
+
+        self.finalize(video_output)
+
+    def teardown(self):
+        while True:
+            try:
+                video_output = self._video_output_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            self.finalize(video_output)
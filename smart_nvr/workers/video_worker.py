@@ -1,57 +1,98 @@
 import logging
 import queue
+from typing import Dict, Optional
 
+from ..app_config import RecordingConfig
 from ..camera.image import DetectionCameraImageContainer
+from ..metrics.pipeline import FRAMES_DROPPED, QUEUE_DEPTH
+from ..tracing.trace import TRACER
 from ..video.output_file import OutputFile
-from ..video.video_writer_manager import VideoWriterManager
+from ..video.packet_buffer import PacketRingBuffer
 from .base_worker import BaseWorker
+from .encoder_worker import EncoderWorker, RecordingCallback
+from .video_finalizer_worker import VideoFinalizerWorker
 
 logger = logging.getLogger(__name__)
 
 
 class VideoWorker(BaseWorker):
     _output_file_queue: "queue.Queue[OutputFile]"
+    _encoder_workers: Dict[str, EncoderWorker]
 
     def __init__(
         self,
         output_directory: str,
         detection_queue: "queue.Queue[DetectionCameraImageContainer]",
+        recording_configs: Optional[Dict[str, RecordingConfig]] = None,
+        packet_buffers: Optional[Dict[str, PacketRingBuffer]] = None,
+        recording_callback: Optional[RecordingCallback] = None,
     ):
         super().__init__(name="VideoWorker")
-        self._video_writer_manager = VideoWriterManager(output_directory)
+        self._output_directory = output_directory
+        self._recording_configs = recording_configs
+        self._packet_buffers = packet_buffers
+        self._recording_callback = recording_callback
         self._detection_queue = detection_queue
         self._output_file_queue = queue.Queue(10)
 
+        QUEUE_DEPTH.labels("output_file").set_function(self._output_file_queue.qsize)
+
+        self._finalizer = VideoFinalizerWorker(self._output_file_queue)
+        self._encoder_workers = {}
+
     @property
     def file_path_queue(self) -> "queue.Queue[OutputFile]":
         return self._output_file_queue
 
+    def start(self):
+        self._finalizer.start()
+        super().start()
+
+    def get_encoder_worker(self, camera_name: str) -> EncoderWorker:
+        encoder_worker = self._encoder_workers.get(camera_name)
+        if encoder_worker is None:
+            # Lanes are started the first time a camera sends a frame
+            encoder_worker = EncoderWorker(
+                camera_name,
+                self._output_directory,
+                self._output_file_queue,
+                self._finalizer,
+                self._recording_configs,
+                self._packet_buffers,
+                self._recording_callback,
+            )
+            encoder_worker.start()
+            self._encoder_workers[camera_name] = encoder_worker
+
+        return encoder_worker
+
     def run_processing(self):
         try:
             img: DetectionCameraImageContainer = self._detection_queue.get(
                 block=True, timeout=1
             )
-
-            image_output_file = self._video_writer_manager.write_image(img)
-            if image_output_file is not None:
-                self._output_file_queue.put_nowait(image_output_file)
         except queue.Empty:
-            pass
-        except queue.Full:
-            pass
+            return
 
-        output_files = self._video_writer_manager.close_eligible_video_outputs()
+        camera_name = img.camera_image_container.camera_name
+        if img.trace is not None:
+            img.trace.dequeue()
+            img.trace.enqueue("encoder")
 
-        for output_file in output_files:
-            logger.info(f"Closed video writer: {output_file}")
-            try:
-                self._output_file_queue.put_nowait(output_file)
-            except queue.Full:
-                pass
+        try:
+            with self.processing():
+                self.get_encoder_worker(camera_name).put_nowait(img)
+        except queue.Full:
+            FRAMES_DROPPED.labels(camera_name, "encoder_full").inc()
+            TRACER.finish(img.trace, "dropped")
+            logger.warning(f"Encoder of {camera_name} is behind, dropped frame")
 
     def teardown(self):
-        output_files = self._video_writer_manager.close_all_video_outputs()
+        for encoder_worker in self._encoder_workers.values():
+            encoder_worker.stop()
+
+        for encoder_worker in self._encoder_workers.values():
+            encoder_worker.join()
 
-        for output_file in output_files:
-            logger.info(f"Closed video writer: {output_file}")
-            self._output_file_queue.put(output_file)
+        self._finalizer.stop()
+        self._finalizer.join()
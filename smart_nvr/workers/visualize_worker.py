@@ -2,6 +2,8 @@ import queue
 
 from ..camera.image import DetectionCameraImageContainer
 from ..detection.visualizer import Visualizer
+from ..metrics.pipeline import QUEUE_DEPTH
+from ..tracing.trace import span
 from .base_worker import BaseWorker
 
 
@@ -16,6 +18,8 @@ class VisualizeWorker(BaseWorker):
         self._detection_queue = detection_queue
         self._output_queue = queue.Queue(10)
 
+        QUEUE_DEPTH.labels("visualize").set_function(self._output_queue.qsize)
+
     @property
     def output_queue(self) -> "queue.Queue[DetectionCameraImageContainer]":
         return self._output_queue
@@ -26,11 +30,17 @@ class VisualizeWorker(BaseWorker):
                 block=True, timeout=1
             )
 
-            for detection in img.detections:
-                Visualizer.draw_detection(
-                    img.camera_image_container.raw_image_np, detection
-                )
+            if img.trace is not None:
+                img.trace.dequeue()
+
+            with self.processing(), span(img.trace, "draw"):
+                for detection in img.detections:
+                    Visualizer.draw_detection(
+                        img.camera_image_container.raw_image_np, detection
+                    )
 
+            if img.trace is not None:
+                img.trace.enqueue("visualize")
             self._output_queue.put(img)
         except queue.Empty:
             pass
@@ -0,0 +1,94 @@
+import json
+import os
+import time
+from typing import List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from smart_nvr.app_config import AutotuneConfig
+from smart_nvr.camera.image import CameraImageContainer
+from smart_nvr.detection.autotune import tune_candidates, tune_model
+from smart_nvr.detection.base_model import BaseDetectionModel
+from smart_nvr.detection.detection_types import Detection
+
+# Seconds per crop of every backend
+BACKEND_DELAYS = {"slow": 0.004, "fast": 0.001, "blind": 0.0}
+
+
+class FakeTunableModel(BaseDetectionModel):
+    def __init__(self):
+        self.backend = "slow"
+        self.calls = 0
+
+    def load(self):
+        pass
+
+    def tuning_backends(self) -> List[str]:
+        return list(BACKEND_DELAYS)
+
+    def apply_tuning(self, backend: str, threads: int, image_size: Optional[int]):
+        self.backend = backend
+
+    def detect_batch(
+        self, imgs: List[CameraImageContainer], threshold: float = 0.5
+    ) -> List[Sequence[Detection]]:
+        self.calls += 1
+        # Fixed cost per pass makes larger batches cheaper per crop
+        time.sleep(0.002 + BACKEND_DELAYS[self.backend] * len(imgs))
+        if self.backend == "blind":
+            return [[] for _ in imgs]
+        return [[Detection("cat", 0.9, 0, 0, 10, 10)] for _ in imgs]
+
+
+def create_images_directory(tmp_path) -> str:
+    images_directory = os.path.join(str(tmp_path), "images")
+    os.makedirs(images_directory)
+    cv2.imwrite(
+        os.path.join(images_directory, "frame.png"),
+        np.zeros((90, 160, 3), dtype=np.uint8),
+    )
+    return images_directory
+
+
+def test_autotune_picks_fastest_configuration_and_caches_it(tmp_path):
+    images_directory = create_images_directory(tmp_path)
+
+    config = AutotuneConfig(
+        enabled=True,
+        cache_path=os.path.join(str(tmp_path), "autotune.json"),
+        images_directory=images_directory,
+        latency_budget_millis=12,
+        threads=[1],
+        batch_sizes=[1, 2, 16],
+        runs=1,
+    )
+
+    model = FakeTunableModel()
+    settings = tune_model(model, "fake", config)
+
+    # Blind backend misses the cat, batch of 16 exceeds the budget
+    assert (settings.backend, settings.batch_size) == ("fast", 2)
+    assert model.backend == "fast"
+
+    with open(config.cache_path) as f:
+        assert len(json.load(f)) == 1
+
+    cached_model = FakeTunableModel()
+    assert tune_model(cached_model, "fake", config) == settings
+    assert cached_model.backend == "fast"
+    assert cached_model.calls == 0
+
+
+def test_autotune_restores_opencv_threads(tmp_path):
+    config = AutotuneConfig(
+        enabled=True,
+        images_directory=create_images_directory(tmp_path),
+        threads=[1, 2],
+        batch_sizes=[1],
+        runs=1,
+    )
+
+    previous_threads = cv2.getNumThreads()
+    assert len(tune_candidates(FakeTunableModel(), config)) > 0
+    assert cv2.getNumThreads() == previous_threads
@@ -0,0 +1,20 @@
+from benchmarks.suite import compare_results, run_suite
+
+
+def test_suite_results_compare_against_baseline():
+    results = run_suite(["merge", "multiplexer"], ["720p"], min_time=0.01)
+
+    assert {result["benchmark"] for result in results} == {
+        "merge_rectangles",
+        "merge_detections",
+        "multiplexer",
+    }
+    assert all(result["runs"] >= 3 for result in results)
+
+    baseline = [dict(result, median_us=result["median_us"] / 2) for result in results]
+    baseline.append(dict(results[0], key="removed[]"))
+
+    assert compare_results(results, results, tolerance=0.25) == []
+    assert [key for key, _, _ in compare_results(results, baseline, 0.25)] == [
+        result["key"] for result in results
+    ]
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from smart_nvr.detection.detection_types import (
+    Detection,
+    merge_detections,
+    suppress_detections,
+)
+from smart_nvr.utils.box_merging import group_boxes
+from smart_nvr.utils.geometry import merge_rectangles
+from smart_nvr.utils.rectangle import Rectangle
+
+
+def rectangle_tuples(rectangles):
+    return [(r.x1, r.y1, r.x2, r.y2) for r in rectangles]
+
+
+def test_merge_rectangles_returns_outer_boxes():
+    rectangles = [
+        Rectangle(0, 0, 100, 100),
+        Rectangle(10, 10, 110, 105),
+        Rectangle(300, 300, 350, 350),
+        # Chain of overlaps ends up in the first group
+        Rectangle(20, 20, 130, 120),
+    ]
+
+    assert rectangle_tuples(merge_rectangles(rectangles)) == [
+        (0, 0, 130, 120),
+        (300, 300, 350, 350),
+    ]
+
+
+@pytest.mark.parametrize("count", [5, 40])
+def test_group_boxes_small_and_vectorized_paths_agree(count):
+    rng = np.random.RandomState(count)
+    xy = rng.randint(0, 200, size=(count, 2))
+    boxes = np.concatenate([xy, xy + rng.randint(10, 80, size=(count, 2))], axis=1)
+    classes = rng.randint(0, 2, size=count)
+
+    labels = group_boxes(boxes, 0.3, classes)
+
+    # Reference with plain pairwise checks and repeated relabeling
+    expected = list(range(count))
+    changed = True
+    while changed:
+        changed = False
+        for a in range(count):
+            for b in range(count):
+                ra = Rectangle(*boxes[a].tolist())
+                rb = Rectangle(*boxes[b].tolist())
+                if (
+                    classes[a] == classes[b]
+                    and ra.overlap_area(rb) > 0.3 * min(ra.area, rb.area)
+                    and expected[b] < expected[a]
+                ):
+                    expected[a] = expected[b]
+                    changed = True
+
+    assert len(set(labels.tolist())) == len(set(expected))
+    for a in range(count):
+        for b in range(count):
+            assert (labels[a] == labels[b]) == (expected[a] == expected[b])
+
+
+def test_merge_detections_is_class_aware():
+    detections = [
+        Detection("person", 0.6, 0, 0, 100, 200, track_id=3),
+        Detection("car", 0.9, 5, 5, 100, 200),
+        Detection("person", 0.8, 10, 10, 105, 210, track_id=4),
+    ]
+
+    merged = merge_detections(detections)
+
+    assert [(d.name, d.confidence, d.track_id) for d in merged] == [
+        ("person", 0.8, 4),
+        ("car", 0.9, None),
+    ]
+    assert rectangle_tuples([merged[0].rectangle]) == [(0, 0, 105, 210)]
+
+
+def test_suppress_detections_keeps_most_confident_per_class():
+    detections = [
+        Detection("person", 0.6, 0, 0, 100, 200),
+        Detection("person", 0.8, 10, 10, 105, 210),
+        Detection("car", 0.7, 0, 0, 100, 200),
+        Detection("person", 0.5, 300, 300, 400, 400),
+    ]
+
+    kept = suppress_detections(detections, iou_threshold=0.5)
+
+    assert [(d.name, d.confidence) for d in kept] == [
+        ("person", 0.8),
+        ("car", 0.7),
+        ("person", 0.5),
+    ]
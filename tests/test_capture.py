@@ -0,0 +1,219 @@
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from smart_nvr.app_config import (
+    CameraFeedConfig,
+    CaptureBackendEnum,
+    CaptureConfig,
+    DecodeModeEnum,
+    HikvisionMotionConfig,
+    TracingConfig,
+)
+from smart_nvr.camera.capture import BaseCapture, PyAVCapture
+from smart_nvr.camera.feed_multiplexer import CameraFeedMultiplexer
+from smart_nvr.tracing.trace import TRACER
+from smart_nvr.workers import camera_feed_worker
+from smart_nvr.workers.camera_feed_worker import CameraFeedWorker
+
+from .video_utils import write_test_video
+
+FRAMES_COUNT = 20
+GOP_SIZE = 5
+
+
+@pytest.fixture
+def video_file_path(tmp_path) -> str:
+    file_path = os.path.join(str(tmp_path), "video.mp4")
+    write_test_video(file_path, FRAMES_COUNT, GOP_SIZE)
+    return file_path
+
+
+def count_grabbed_frames(cap: PyAVCapture) -> int:
+    count = 0
+    while cap.grab():
+        count += 1
+    cap.release()
+    return count
+
+
+def test_pyav_capture_decodes_all_frames(video_file_path: str):
+    cap = PyAVCapture(video_file_path, CaptureConfig())
+
+    assert cap.grab()
+    raw_image_np = cap.retrieve()
+    assert raw_image_np is not None
+    assert raw_image_np.shape == cap.frame_shape() == (96, 160, 3)
+
+    assert count_grabbed_frames(cap) + 1 == FRAMES_COUNT
+
+
+def test_pyav_capture_decodes_keyframes_only(video_file_path: str):
+    cap = PyAVCapture(video_file_path, CaptureConfig(decode=DecodeModeEnum.keyframes))
+
+    assert count_grabbed_frames(cap) == FRAMES_COUNT // GOP_SIZE
+
+
+def test_pyav_capture_retrieves_into_buffer(video_file_path: str):
+    cap = PyAVCapture(video_file_path, CaptureConfig())
+    buffer = np.zeros((96, 160, 3), dtype=np.uint8)
+
+    assert cap.grab()
+    assert cap.retrieve(buffer) is buffer
+    cap.release()
+
+
+def test_pyav_capture_resumes_from_standby_keyframe(video_file_path: str):
+    config = CaptureConfig(backend=CaptureBackendEnum.pyav, standby=True)
+    reference = PyAVCapture(video_file_path, config)
+    for _ in range(GOP_SIZE + 2):
+        assert reference.grab()
+    expected = reference.retrieve()
+    reference.release()
+
+    cap = PyAVCapture(video_file_path, config)
+    for _ in range(GOP_SIZE + 2):
+        assert cap.standby()
+
+    # Packets since the second keyframe are decoded, the newest frame is kept
+    assert cap.grab()
+    np.testing.assert_array_equal(cap.retrieve(), expected)
+    assert count_grabbed_frames(cap) == FRAMES_COUNT - GOP_SIZE - 2
+
+
+def test_standby_requires_pyav():
+    with pytest.raises(ValidationError):
+        CaptureConfig(standby=True)
+
+
+class StandbyCapture(BaseCapture):
+    def __init__(self, worker: "StandbyCameraFeedWorker"):
+        self._worker = worker
+        self.standby_count = 0
+        self.grab_count = 0
+
+    def standby(self) -> bool:
+        self.standby_count += 1
+        if self.standby_count == 3:
+            self._worker.enable_read()
+        return True
+
+    def grab(self) -> bool:
+        self.grab_count += 1
+        if self.grab_count == 5:
+            self._worker.stop()
+        return True
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        return np.zeros((96, 160, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+class StandbyCameraFeedWorker(CameraFeedWorker):
+    def __init__(self, config: CameraFeedConfig):
+        super().__init__("cam1", CameraFeedMultiplexer(), config)
+        self.opened: List[StandbyCapture] = []
+
+    def open_capture(self) -> BaseCapture:
+        cap = StandbyCapture(self)
+        self.opened.append(cap)
+        return cap
+
+
+def standby_camera_feed_worker() -> StandbyCameraFeedWorker:
+    return StandbyCameraFeedWorker(
+        CameraFeedConfig(
+            host="camera",
+            path="/stream",
+            auth=None,
+            motion=HikvisionMotionConfig(
+                type="hikvision", host="camera", port=80, auth=None
+            ),
+            capture=CaptureConfig(backend=CaptureBackendEnum.pyav, standby=True),
+        )
+    )
+
+
+def test_camera_feed_stays_connected_in_standby():
+    worker = standby_camera_feed_worker()
+
+    worker.run_processing()
+
+    assert len(worker.opened) == 1
+    assert worker.opened[0].standby_count == 3
+    assert worker.opened[0].grab_count == 5
+
+
+def test_camera_feed_finishes_traces_of_warmup_frames(tmp_path):
+    output_path = os.path.join(str(tmp_path), "trace.json")
+    TRACER.configure(
+        TracingConfig(enabled=True, sample_interval=1, output_path=output_path)
+    )
+    try:
+        standby_camera_feed_worker().run_processing()
+    finally:
+        TRACER.close()
+
+    with open(output_path) as f:
+        events = json.load(f)
+
+    # First frame only warms up the motion detector, the forwarded one is
+    # still waiting in the multiplexer
+    outcomes = [
+        event["args"]["outcome"]
+        for event in events
+        if event.get("cat") == "frame" and event["ph"] == "e"
+    ]
+    assert outcomes == ["warmup"]
+
+
+def unreachable_camera_feed_worker(monkeypatch) -> CameraFeedWorker:
+    worker = StandbyCameraFeedWorker(
+        CameraFeedConfig(
+            host="camera",
+            path="/stream",
+            auth=None,
+            motion=HikvisionMotionConfig(
+                type="hikvision", host="camera", port=80, auth=None
+            ),
+        )
+    )
+
+    def fail_to_open() -> BaseCapture:
+        raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(worker, "open_capture", fail_to_open)
+    worker.enable_read()
+    return worker
+
+
+def test_camera_feed_backs_off_when_connecting_fails(monkeypatch):
+    monkeypatch.setattr(camera_feed_worker, "RECONNECT_INITIAL_SECONDS", 0.01)
+    worker = unreachable_camera_feed_worker(monkeypatch)
+
+    worker.run_processing()
+    worker.run_processing()
+
+    assert worker._reconnect_attempt == 2
+
+
+def test_camera_feed_keeps_backing_off_through_long_outage(monkeypatch):
+    monkeypatch.setattr(camera_feed_worker, "RECONNECT_INITIAL_SECONDS", 0.00001)
+    monkeypatch.setattr(camera_feed_worker, "RECONNECT_MAX_SECONDS", 0.0001)
+    worker = unreachable_camera_feed_worker(monkeypatch)
+    waits: List[float] = []
+    monkeypatch.setattr(worker._should_exit, "wait", waits.append)
+
+    for _ in range(1200):
+        worker.run_processing()
+
+    # Unclamped, the power overflows a float past attempt 1024
+    assert len(waits) == 1200
+    assert worker._reconnect_attempt == 1200
+    assert max(waits) <= 0.0001 * 1.1
@@ -0,0 +1,56 @@
+import numpy as np
+
+from smart_nvr.detection.detection_types import Detection, DetectionBatch
+from smart_nvr.utils.rectangle import Rectangle
+
+
+def describe(detections):
+    return [
+        (
+            d.name,
+            d.confidence,
+            d.rectangle.x1,
+            d.rectangle.y1,
+            d.rectangle.x2,
+            d.rectangle.y2,
+            d.track_id,
+        )
+        for d in detections
+    ]
+
+
+def test_detection_batch_round_trips_detections():
+    detections = [
+        Detection("person", 0.9, 0, 0, 10, 20, track_id=7),
+        Detection("car", 0.6, 5, 5, 50, 40),
+    ]
+
+    batch = DetectionBatch.from_detections(detections)
+
+    assert len(batch) == 2
+    assert describe(batch) == describe(detections)
+    assert describe([batch[1]]) == describe(detections[1:])
+    assert describe(batch.filter_names(["car", "cat"])) == describe(detections[1:])
+
+
+def test_detection_batch_splits_by_index():
+    batch = DetectionBatch.create(
+        ["person", "car"],
+        class_ids=np.array([0, 1, 0]),
+        confidences=np.array([0.9, 0.8, 0.7]),
+        boxes=np.array([[0, 0, 1, 1], [1, 1, 2, 2], [2, 2, 3, 3]]),
+        indices=np.array([2, 0, 2]),
+    )
+
+    batches = batch.split(3)
+
+    assert [len(b) for b in batches] == [1, 0, 2]
+    assert [d.confidence for d in batches[2]] == [0.9, 0.7]
+
+
+def test_geometry_types_have_no_instance_dict():
+    detection = Detection("person", 0.9, 0, 0, 10, 20)
+
+    assert not hasattr(detection, "__dict__")
+    assert not hasattr(detection.rectangle, "__dict__")
+    assert repr(Rectangle(1, 2, 3, 4)) == "Rectangle(x1=1, y1=2, x2=3, y2=4)"
@@ -0,0 +1,74 @@
+from typing import List, Sequence
+
+import numpy as np
+
+from smart_nvr.camera.feed_multiplexer import CameraFeedMultiplexer
+from smart_nvr.camera.image import CameraImageContainer, get_split_image_dimensions
+from smart_nvr.detection.base_model import BaseDetectionModel
+from smart_nvr.detection.detection_types import Detection
+from smart_nvr.workers.detection_worker import DetectionWorker
+
+
+class FakeDetectionModel(BaseDetectionModel):
+    def __init__(self):
+        self.batches: List[List[str]] = []
+
+    def load(self):
+        pass
+
+    def detect(
+        self, img: CameraImageContainer, threshold: float = 0.5
+    ) -> Sequence[Detection]:
+        return self.detect_batch([img], threshold)[0]
+
+    def detect_batch(
+        self, imgs: List[CameraImageContainer], threshold: float = 0.5
+    ) -> List[Sequence[Detection]]:
+        self.batches.append([img.camera_name for img in imgs])
+        return [
+            [Detection("person", 0.9, index, index, index + 10, index + 10)]
+            for index, _ in enumerate(imgs)
+        ]
+
+
+def create_image(camera_name: str) -> CameraImageContainer:
+    raw_image_np = np.zeros((90, 160, 3), dtype=np.uint8)
+    return CameraImageContainer.create(
+        camera_name, raw_image_np, get_split_image_dimensions(raw_image_np)
+    )
+
+
+def test_detection_worker_batches_across_cameras():
+    multiplexer = CameraFeedMultiplexer()
+    model = FakeDetectionModel()
+    worker = DetectionWorker(
+        model=model, image_queue=multiplexer, batch_size=4, batch_max_wait_millis=100
+    )
+
+    for camera_name in ["cam1", "cam2", "cam3"]:
+        multiplexer.put_nowait(create_image(camera_name))
+
+    worker.run_processing()
+
+    # Two crops per image, so only two images fit into batch of four crops
+    assert len(model.batches) == 1
+    assert len(model.batches[0]) == 2
+
+    results = [worker.detection_queue.get_nowait() for _ in range(2)]
+    assert [r.camera_image_container.camera_name for r in results] == model.batches[0]
+    assert [r.detections[0].rectangle.x1 for r in results] == [0, 1]
+
+
+def test_detection_worker_without_batching():
+    multiplexer = CameraFeedMultiplexer()
+    model = FakeDetectionModel()
+    worker = DetectionWorker(model=model, image_queue=multiplexer)
+
+    multiplexer.put_nowait(create_image("cam1"))
+    multiplexer.put_nowait(create_image("cam2"))
+
+    worker.run_processing()
+
+    assert len(model.batches) == 1
+    assert len(model.batches[0]) == 1
+    assert worker.detection_queue.qsize() == 1
@@ -0,0 +1,81 @@
+from typing import Counter
+
+import numpy as np
+import pytest
+
+from smart_nvr.camera.feed_multiplexer import CameraFeedMultiplexer
+from smart_nvr.camera.image import CameraImageContainer, get_split_image_dimensions
+from smart_nvr.utils.timing import get_current_time_millis
+
+
+def create_image(camera_name: str, created_at=None) -> CameraImageContainer:
+    raw_image_np = np.zeros((90, 160, 3), dtype=np.uint8)
+    return CameraImageContainer.create(
+        camera_name,
+        raw_image_np,
+        get_split_image_dimensions(raw_image_np),
+        created_at=created_at,
+    )
+
+
+def serve(multiplexer: CameraFeedMultiplexer, camera_names, turns: int) -> Counter[str]:
+    # Every camera has a new frame ready as soon as its last one was taken
+    for camera_name in camera_names:
+        multiplexer.put_nowait(create_image(camera_name))
+
+    served: Counter[str] = Counter()
+    for _ in range(turns):
+        img = multiplexer.get()
+        served[img.camera_name] += 1
+        multiplexer.put_nowait(create_image(img.camera_name))
+    return served
+
+
+def test_multiplexer_keeps_one_frame_per_camera():
+    multiplexer = CameraFeedMultiplexer()
+    multiplexer.put_nowait(create_image("cam1"))
+
+    assert multiplexer.contains("cam1")
+    assert not multiplexer.contains("cam2")
+    with pytest.raises(CameraFeedMultiplexer.Full):
+        multiplexer.put_nowait(create_image("cam1"))
+
+    assert multiplexer.get().camera_name == "cam1"
+    assert multiplexer.wait_taken("cam1", timeout=0)
+    with pytest.raises(CameraFeedMultiplexer.Empty):
+        multiplexer.get(timeout=0.01)
+
+
+def test_multiplexer_serves_cameras_in_turn():
+    multiplexer = CameraFeedMultiplexer()
+    for camera_name in ["cam1", "cam2", "cam3"]:
+        multiplexer.put_nowait(create_image(camera_name))
+
+    # First come first served instead of the last added camera
+    assert [multiplexer.get().camera_name for _ in range(3)] == [
+        "cam1",
+        "cam2",
+        "cam3",
+    ]
+
+    served = serve(multiplexer, ["cam1", "cam2", "cam3"], 300)
+    assert served == {"cam1": 100, "cam2": 100, "cam3": 100}
+
+
+def test_multiplexer_boosts_recording_cameras():
+    multiplexer = CameraFeedMultiplexer(recording_weight=2)
+    multiplexer.set_weight("cam3", 2)
+    multiplexer.set_recording("cam1", True)
+
+    served = serve(multiplexer, ["cam1", "cam2", "cam3"], 500)
+    assert served == {"cam1": 200, "cam2": 100, "cam3": 200}
+
+
+def test_multiplexer_drops_stale_frames():
+    multiplexer = CameraFeedMultiplexer(max_frame_age_millis=1000)
+    multiplexer.put_nowait(create_image("cam1", get_current_time_millis() - 5000))
+    multiplexer.put_nowait(create_image("cam2"))
+
+    assert multiplexer.get().camera_name == "cam2"
+    assert multiplexer.dropped_frames == {"cam1": 1}
+    assert not multiplexer.contains("cam1")
@@ -0,0 +1,262 @@
+import asyncio
+import queue
+import socket
+import time
+from typing import Callable, List
+
+from smart_nvr.app_config import AuthConfig, HikvisionMotionConfig
+from smart_nvr.camera.motion_detection.hikvision import (
+    HikvisionMotionDetection,
+    digest_authorization,
+    is_motion_event,
+    parse_alert,
+    parse_challenge,
+    split_alerts,
+)
+from smart_nvr.camera.motion_detection.hysteresis import MotionHysteresis
+from smart_nvr.utils.backoff import ExponentialBackoff
+from smart_nvr.workers.event_loop_worker import EventLoopWorker
+
+AUTH = AuthConfig(username="admin", password="secret")
+CHALLENGE = 'Digest realm="camera", nonce="4e6f6e6365", qop="auth"'
+
+
+def alert_part(event_type: str, state: str) -> bytes:
+    document = (
+        '<?xml version="1.0" encoding="UTF-8"?>\r\n'
+        '<EventNotificationAlert version="2.0" '
+        'xmlns="http://www.hikvision.com/ver20/XMLSchema">\r\n'
+        "<channelID>1</channelID>\r\n"
+        f"<eventType>{event_type}</eventType>\r\n"
+        f"<eventState>{state}</eventState>\r\n"
+        "</EventNotificationAlert>\r\n"
+    ).encode()
+    return (
+        b'--boundary\r\nContent-Type: application/xml; charset="UTF-8"\r\n'
+        + f"Content-Length: {len(document)}\r\n\r\n".encode()
+        + document
+    )
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_hysteresis_ignores_chattering_sensor():
+    hysteresis = MotionHysteresis(
+        on_delay_seconds=0, off_delay_seconds=2, min_hold_seconds=5
+    )
+
+    states = [hysteresis.update(i % 2 == 0, now=i * 0.5) for i in range(20)]
+
+    assert states == [True] * 20
+
+
+def test_hysteresis_delays_and_holds():
+    hysteresis = MotionHysteresis(
+        on_delay_seconds=1, off_delay_seconds=2, min_hold_seconds=5
+    )
+
+    assert not hysteresis.update(True, now=0)
+    assert hysteresis.next_change_at() == 1
+    assert hysteresis.update(True, now=1)
+    # Sensor is quiet long enough, but the state is held
+    assert hysteresis.update(False, now=3.5)
+    assert hysteresis.next_change_at() == 6
+    assert not hysteresis.update(False, now=6)
+
+
+def test_digest_authorization_matches_rfc_2617():
+    authorization = digest_authorization(
+        AuthConfig(username="Mufasa", password="Circle Of Life"),
+        "GET",
+        "/dir/index.html",
+        parse_challenge(
+            'Digest realm="testrealm@host.com", qop="auth,auth-int", '
+            'nonce="dcd98b7102dd2f0e8b11d0f600bfb0c093", '
+            'opaque="5ccc069c403ebaf9f0171e9517f40e41"'
+        )[1],
+        cnonce="0a4f113b",
+    )
+
+    assert 'response="6629fae49393a05397450978507c4ef1"' in authorization
+    assert 'opaque="5ccc069c403ebaf9f0171e9517f40e41"' in authorization
+
+
+def test_split_alerts_keeps_partial_documents():
+    stream = alert_part("VMD", "active") + alert_part("videoloss", "inactive")
+
+    documents, remaining = split_alerts(stream[:-40])
+    assert len(documents) == 1
+    documents, remaining = split_alerts(remaining + stream[-40:])
+    assert len(documents) == 1
+    assert b"EventNotificationAlert" not in remaining
+
+    event = parse_alert(documents[0])
+    assert event is not None
+    assert event.event_type == "videoloss" and not event.active
+    assert not is_motion_event(event)
+
+
+def start_camera_server(worker: EventLoopWorker, states: List[str]) -> int:
+    ports: "queue.Queue[int]" = queue.Queue()
+    handlers: List["asyncio.Future[None]"] = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await respond(reader, writer)
+        finally:
+            writer.close()
+
+    async def respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        head = (await reader.readuntil(b"\r\n\r\n")).decode()
+        authorization = [
+            line.split(": ", 1)[1]
+            for line in head.split("\r\n")
+            if line.startswith("Authorization: ")
+        ]
+        cnonce = (
+            parse_challenge(authorization[0])[1].get("cnonce")
+            if len(authorization) > 0
+            else None
+        )
+        expected = digest_authorization(
+            AUTH,
+            "GET",
+            "/ISAPI/Event/notification/alertStream",
+            parse_challenge(CHALLENGE)[1],
+            cnonce=cnonce,
+        )
+        if authorization != [expected]:
+            writer.write(
+                "HTTP/1.1 401 Unauthorized\r\n"
+                f"WWW-Authenticate: {CHALLENGE}\r\n"
+                "Content-Length: 0\r\n\r\n".encode()
+            )
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: multipart/mixed; boundary=boundary\r\n\r\n"
+        )
+        for state in states:
+            writer.write(alert_part("VMD", state))
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(30)
+
+    def track(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        handlers.append(asyncio.ensure_future(handle(reader, writer)))
+
+    async def serve():
+        server = await asyncio.start_server(track, "127.0.0.1", 0)
+        ports.put(server.sockets[0].getsockname()[1])
+        try:
+            await asyncio.sleep(60)
+        finally:
+            server.close()
+            for handler in handlers:
+                handler.cancel()
+            await asyncio.gather(*handlers, return_exceptions=True)
+
+    worker.start_task("server", serve)
+    return ports.get(timeout=5)
+
+
+def test_alert_stream_drives_motion_callback():
+    worker = EventLoopWorker()
+    worker.start()
+    try:
+        port = start_camera_server(worker, ["active", "active", "inactive"])
+        motion_detection = HikvisionMotionDetection(
+            HikvisionMotionConfig(
+                type="hikvision",
+                host="127.0.0.1",
+                port=port,
+                auth=AUTH,
+                off_delay_seconds=0.2,
+                min_hold_seconds=0,
+            ),
+            worker,
+        )
+        motions: List[bool] = []
+        motion_detection.set_callback(motions.append)
+
+        motion_detection.start()
+        assert motion_detection.connected.wait(timeout=5)
+        assert wait_until(lambda: motions == [True, False])
+        motion_detection.stop()
+    finally:
+        worker.stop()
+        worker.join()
+
+
+def test_unreachable_camera_retries_in_background():
+    # Port of a closed socket refuses connections
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        port = closed.getsockname()[1]
+
+    worker = EventLoopWorker()
+    worker.start()
+    try:
+        motion_detection = HikvisionMotionDetection(
+            HikvisionMotionConfig(
+                type="hikvision", host="127.0.0.1", port=port, auth=None
+            ),
+            worker,
+        )
+        started_at = time.monotonic()
+        motion_detection.start()
+        assert time.monotonic() - started_at < 0.1
+
+        assert not motion_detection.connected.wait(timeout=0.3)
+        motion_detection.stop()
+    finally:
+        worker.stop()
+        worker.join()
+
+
+class RecordingBackoff(ExponentialBackoff):
+    def __init__(self, initial_seconds: float, max_seconds: float):
+        super().__init__(initial_seconds, max_seconds)
+        self.attempts: List[int] = []
+        self.delays: List[float] = []
+
+    def delay(self, attempt: int) -> float:
+        delay = super().delay(attempt)
+        self.attempts.append(attempt)
+        self.delays.append(delay)
+        return delay
+
+
+def test_long_outage_keeps_retrying(monkeypatch):
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        port = closed.getsockname()[1]
+
+    worker = EventLoopWorker()
+    worker.start()
+    try:
+        motion_detection = HikvisionMotionDetection(
+            HikvisionMotionConfig(
+                type="hikvision", host="127.0.0.1", port=port, auth=None
+            ),
+            worker,
+        )
+        backoff = RecordingBackoff(0.00001, 0.0001)
+        monkeypatch.setattr(motion_detection, "_backoff", backoff)
+
+        motion_detection.start()
+        # Unclamped, the power overflows a float past attempt 1024
+        assert wait_until(lambda: len(backoff.attempts) > 1100, timeout=30)
+        assert backoff.attempts[:1100] == list(range(1, 1101))
+        assert max(backoff.delays) <= 0.0001 * 1.1
+        motion_detection.stop()
+    finally:
+        worker.stop()
+        worker.join()
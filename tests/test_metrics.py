@@ -0,0 +1,62 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from smart_nvr.metrics.registry import MetricsRegistry
+from smart_nvr.workers.metrics_worker import MetricsWorker
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    frames = registry.counter("frames_total", "Frames", ("camera",))
+    depth = registry.gauge("queue_depth", "Depth", ("queue",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+    frames.labels('cam "1"').inc()
+    frames.labels('cam "1"').inc(2)
+    items = [1, 2, 3]
+    depth.labels("detection").set_function(lambda: len(items))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    # Registering again hands out the same metric
+    assert registry.counter("frames_total", "Frames", ("camera",)) is frames
+    assert registry.render().splitlines() == [
+        "# HELP frames_total Frames",
+        "# TYPE frames_total counter",
+        'frames_total{camera="cam \\"1\\""} 3.0',
+        "# HELP queue_depth Depth",
+        "# TYPE queue_depth gauge",
+        'queue_depth{queue="detection"} 3.0',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1.0',
+        'latency_seconds_bucket{le="1.0"} 2.0',
+        'latency_seconds_bucket{le="+Inf"} 3.0',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3.0",
+    ]
+
+
+def test_metrics_worker_serves_registry():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests").inc()
+
+    worker = MetricsWorker("127.0.0.1", 0, registry)
+    worker.start()
+    try:
+        url = f"http://127.0.0.1:{worker.server_port}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            body = response.read().decode("utf-8")
+            content_type = response.headers["Content-Type"]
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other", timeout=5)
+    finally:
+        worker.stop()
+        worker.join()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert "requests_total 1.0" in body.splitlines()
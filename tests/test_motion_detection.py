@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from smart_nvr.app_config import MotionBackendEnum, MotionDetectionConfig
+from smart_nvr.camera.motion_detection.detection import (
+    FrameDifferenceMotionDetector,
+    detect_motion,
+)
+from smart_nvr.camera.motion_detection.motion_detector_map import MOTION_DETECTOR_MAP
+
+
+def create_frame(x: int) -> np.ndarray:
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    frame[300:400, x : x + 100, :] = 255
+    return frame
+
+
+def test_motion_detector_needs_previous_frame():
+    detector = FrameDifferenceMotionDetector(MotionDetectionConfig(scale=0.5))
+
+    assert detector.detect(create_frame(100)) is None
+    assert detector.detect(create_frame(100)) == []
+
+
+def test_motion_detector_matches_full_resolution():
+    previous_frame = create_frame(100)
+    current_frame = create_frame(400)
+
+    detector = FrameDifferenceMotionDetector(MotionDetectionConfig(scale=0.25))
+    detector.detect(previous_frame)
+    rectangles = detector.detect(current_frame)
+
+    expected = detect_motion(previous_frame, current_frame)
+
+    assert rectangles is not None
+    assert len(rectangles) == len(expected) > 0
+    for rectangle, expected_rectangle in zip(rectangles, expected):
+        assert rectangle.width == expected_rectangle.width
+        assert abs(rectangle.x1 - expected_rectangle.x1) <= 16
+        assert abs(rectangle.y1 - expected_rectangle.y1) <= 16
+
+
+@pytest.mark.parametrize("backend", list(MotionBackendEnum))
+def test_motion_detector_backends(backend: MotionBackendEnum):
+    config = MotionDetectionConfig(backend=backend, scale=0.5)
+    detector = MOTION_DETECTOR_MAP[backend](config)
+
+    results = [detector.detect(create_frame(100)) for _ in range(10)]
+    assert results[0] is None
+    assert results[-1] == []
+
+    rectangles = detector.detect(create_frame(600))
+    assert rectangles is not None and len(rectangles) > 0
+
+
+def test_motion_rectangles_are_not_squared():
+    detector = FrameDifferenceMotionDetector(MotionDetectionConfig(scale=0.5))
+    assert detector.detect_rectangles(create_frame(100)) is None
+    rectangles = detector.detect_rectangles(create_frame(600))
+
+    # Bounding boxes of the object, squared crops span the full frame height
+    assert rectangles is not None and len(rectangles) > 0
+    for rectangle in rectangles:
+        assert 280 <= rectangle.y1 and rectangle.y2 <= 420
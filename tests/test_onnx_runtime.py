@@ -0,0 +1,133 @@
+import os
+from typing import List, Sequence
+
+import cv2
+import numpy as np
+import pytest
+
+from smart_nvr.camera.image import CameraImageContainer, get_split_image_dimensions
+from smart_nvr.detection.base_model import BaseDetectionModel
+from smart_nvr.detection.detection_types import Detection
+from smart_nvr.detection.onnx_runtime import (
+    YOLO_COCO_LABELS,
+    OnnxYoloSDetectionModel,
+    OnnxYoloSInt8DetectionModel,
+    decode_yolo_output,
+    letterbox,
+)
+from smart_nvr.detection.post_processing import LabelLookup
+from smart_nvr.detection.tracking import iou
+from smart_nvr.detection.yolo import YoloSDetectionModel
+from smart_nvr.utils.rectangle import Rectangle
+
+
+def test_letterbox_keeps_aspect_ratio():
+    out = np.empty((64, 64, 3), dtype=np.uint8)
+    scale, (pad_x, pad_y) = letterbox(np.zeros((16, 32, 3), dtype=np.uint8), 64, out)
+
+    assert (scale, pad_x, pad_y) == (2.0, 0, 16)
+    assert out[:16].min() == 114 and out[48:].min() == 114
+    assert out[16:48].max() == 0
+
+
+def yolo_row(
+    cx: float, cy: float, w: float, h: float, objectness: float, class_id: int
+) -> List[float]:
+    class_scores = [0.0] * len(YOLO_COCO_LABELS)
+    class_scores[class_id] = 1.0
+    return [cx, cy, w, h, objectness] + class_scores
+
+
+def test_decode_yolo_output_maps_boxes_to_crops():
+    crops = [
+        (0, Rectangle(0, 0, 32, 16), np.zeros((16, 32, 3), dtype=np.uint8)),
+        (0, Rectangle(32, 0, 64, 32), np.zeros((32, 32, 3), dtype=np.uint8)),
+    ]
+    # Letterboxed to 64 pixels, first crop is scaled by 2 and padded by 16 rows
+    scales = np.array([2.0, 2.0], dtype=np.float32)
+    pads = np.array([[0, 16], [0, 0]], dtype=np.float32)
+    output = np.array(
+        [
+            [
+                yolo_row(20, 36, 16, 8, 0.9, 0),
+                # Overlapping box of the same class is suppressed
+                yolo_row(21, 36, 16, 8, 0.8, 0),
+                # Other classes are kept
+                yolo_row(20, 36, 16, 8, 0.7, 15),
+                yolo_row(40, 40, 8, 8, 0.2, 0),
+            ],
+            [
+                yolo_row(32, 32, 32, 32, 0.6, 2),
+                yolo_row(8, 8, 8, 8, 0.4, 0),
+                yolo_row(8, 8, 8, 8, 0.1, 0),
+                yolo_row(8, 8, 8, 8, 0.1, 0),
+            ],
+        ],
+        dtype=np.float32,
+    )
+
+    detections = decode_yolo_output(
+        output, scales, pads, crops, 1, LabelLookup(YOLO_COCO_LABELS), 0.5
+    )[0]
+
+    assert sorted(
+        (d.name, round(d.confidence, 2), d.rectangle.x1, d.rectangle.y1)
+        for d in detections
+    ) == [("car", 0.6, 40, 8), ("cat", 0.7, 6, 8), ("person", 0.9, 6, 8)]
+    person = [d for d in detections if d.name == "person"][0]
+    assert (person.rectangle.x2, person.rectangle.y2) == (14, 12)
+
+
+def load_model(model: BaseDetectionModel) -> BaseDetectionModel:
+    pytest.importorskip("onnxruntime")
+    if isinstance(model, (OnnxYoloSDetectionModel, OnnxYoloSInt8DetectionModel)):
+        if not os.path.exists(model.model_path()):
+            pytest.skip(f"{model.model_path()} not found")
+
+    model.load()
+    return model
+
+
+def detect(model: BaseDetectionModel) -> Sequence[Detection]:
+    raw_image_np = cv2.imread("data/images/people-back-yard.jpeg")
+    assert raw_image_np is not None
+    img = CameraImageContainer.create(
+        "parity", raw_image_np, get_split_image_dimensions(raw_image_np)
+    )
+    return model.detect(img)
+
+
+def assert_matching(
+    detections: Sequence[Detection],
+    expected: Sequence[Detection],
+    min_iou: float,
+    max_confidence_difference: float,
+):
+    assert len(detections) == len(expected)
+    for detection in expected:
+        best = max(
+            (d for d in detections if d.name == detection.name),
+            key=lambda d: iou(d.rectangle, detection.rectangle),
+        )
+        assert iou(best.rectangle, detection.rectangle) >= min_iou
+        assert abs(best.confidence - detection.confidence) <= max_confidence_difference
+
+
+def test_onnx_model_matches_torch_model():
+    onnx_model = load_model(OnnxYoloSDetectionModel())
+    pytest.importorskip("torch")
+    try:
+        torch_model = load_model(YoloSDetectionModel())
+    except Exception as error:
+        pytest.skip(f"YOLOv5 torch hub model unavailable: {error}")
+
+    assert_matching(detect(onnx_model), detect(torch_model), 0.9, 0.05)
+
+
+def test_quantized_onnx_model_matches_float_model():
+    float_model = load_model(OnnxYoloSDetectionModel())
+    quantized_model = load_model(OnnxYoloSInt8DetectionModel())
+
+    float_detections = detect(float_model)
+    assert "person" in {d.name for d in float_detections}
+    assert_matching(detect(quantized_model), float_detections, 0.7, 0.15)
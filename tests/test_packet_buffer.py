@@ -0,0 +1,138 @@
+import os
+from fractions import Fraction
+
+import av
+import numpy as np
+
+from smart_nvr.app_config import CaptureConfig
+from smart_nvr.camera.capture import PyAVCapture
+from smart_nvr.camera.image import CameraImageContainer, DetectionCameraImageContainer
+from smart_nvr.video.packet_buffer import PacketRingBuffer
+from smart_nvr.video.video_output import PassthroughVideoOutput, SegmentedVideoOutput
+
+from .video_utils import write_test_video
+
+
+class FakePacket:
+    def __init__(self, pts: int, is_keyframe: bool):
+        self.pts = pts
+        self.dts = pts
+        self.is_keyframe = is_keyframe
+        self.time_base = Fraction(1, 10)
+
+
+def test_packet_buffer_keeps_whole_gops():
+    packet_buffer = PacketRingBuffer(max_seconds=1)
+    packet_buffer.start_session(object())
+
+    # Leading packets without keyframe can't be decoded and are skipped
+    packet_buffer.append(FakePacket(0, False))
+    for pts in range(1, 41):
+        packet_buffer.append(FakePacket(pts, pts % 5 == 1))
+
+    packets = packet_buffer.packets_after(None)
+    assert packets[0].is_keyframe
+    assert packets[-1].pts == 40
+    assert packets[-1].time - packets[0].time >= 1
+    assert packets[0].pts == 26
+
+    assert [p.pts for p in packet_buffer.packets_after(packets[-3].sequence)] == [
+        39,
+        40,
+    ]
+
+    packet_buffer.end_session()
+    assert not packet_buffer.has_stream()
+    assert packet_buffer.packets_after(None) == []
+
+
+def test_passthrough_video_output_writes_pre_roll(tmp_path):
+    input_file_path = os.path.join(str(tmp_path), "input.mp4")
+    output_file_path = os.path.join(str(tmp_path), "output.mp4")
+    write_test_video(input_file_path, frames_count=40, gop_size=5)
+
+    packet_buffer = PacketRingBuffer(max_seconds=1)
+    cap = PyAVCapture(input_file_path, CaptureConfig(), packet_buffer)
+
+    for _ in range(20):
+        assert cap.grab()
+
+    video_output = PassthroughVideoOutput(output_file_path, packet_buffer)
+
+    while cap.grab():
+        raw_image_np = cap.retrieve()
+        assert raw_image_np is not None
+        video_output.write_image(
+            DetectionCameraImageContainer(
+                CameraImageContainer.create("cam1", raw_image_np, []), []
+            )
+        )
+
+    video_output.close()
+    cap.release()
+
+    container = av.open(output_file_path)
+    frames = list(container.decode(video=0))
+    container.close()
+
+    # Pre-roll of at least a second plus the 20 live frames, nothing re-encoded
+    assert len(frames) >= 30
+    assert frames[0].key_frame
+    assert np.array_equal(frames[0].to_ndarray(format="bgr24").shape, (96, 160, 3))
+
+
+def test_segmented_passthrough_splits_on_keyframes(tmp_path):
+    input_file_path = os.path.join(str(tmp_path), "input.mp4")
+    write_test_video(input_file_path, frames_count=40, gop_size=5)
+
+    packet_buffer = PacketRingBuffer(max_seconds=0)
+    cap = PyAVCapture(input_file_path, CaptureConfig(), packet_buffer)
+    assert cap.grab()
+
+    video_output = SegmentedVideoOutput(
+        os.path.join(str(tmp_path), "output.mp4"),
+        segment_millis=700,
+        create_segment=lambda path, previous: PassthroughVideoOutput(
+            path,
+            packet_buffer,
+            previous.last_sequence if previous is not None else None,
+        ),
+    )
+
+    segments = []
+    index = 0
+    while True:
+        raw_image_np = cap.retrieve()
+        video_output.write_image(
+            DetectionCameraImageContainer(
+                CameraImageContainer.create(
+                    "cam1", raw_image_np, [], created_at=index * 100
+                ),
+                [],
+            )
+        )
+        segments.extend(video_output.pop_finished_segments())
+        index += 1
+        if not cap.grab():
+            break
+
+    for segment in segments:
+        segment.close()
+    video_output.close()
+    cap.release()
+
+    frames_counts = []
+    for file_path in [segment.file_path for segment in segments] + [
+        video_output.file_path
+    ]:
+        container = av.open(file_path)
+        frames = list(container.decode(video=0))
+        container.close()
+
+        # Every segment is playable on its own
+        assert frames[0].key_frame
+        frames_counts.append(len(frames))
+
+    assert len(frames_counts) > 2
+    assert all(frames_count % 5 == 0 for frames_count in frames_counts[:-1])
+    assert sum(frames_counts) == 40
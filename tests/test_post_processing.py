@@ -0,0 +1,69 @@
+from typing import Tuple
+
+import numpy as np
+
+from smart_nvr.detection.detection_types import Detection
+from smart_nvr.detection.opencv import COCO_LABELS, decode_ssd_output
+from smart_nvr.detection.post_processing import LabelLookup
+from smart_nvr.utils.rectangle import Rectangle
+
+
+def test_label_lookup_allowlist():
+    lookup = LabelLookup(COCO_LABELS, ["person", "cat"])
+
+    assert lookup.allowed(np.array([1, 3, 17, 12, -1, 500])).tolist() == [
+        True,
+        False,
+        True,
+        False,
+        False,
+        False,
+    ]
+    assert lookup.name(17) == "cat"
+    assert lookup.name(12) == "unknown"
+
+    # Without allowlist unknown ids are kept like before
+    assert LabelLookup(["person", "car"]).allowed(np.array([1, 7])).tolist() == [
+        True,
+        True,
+    ]
+
+
+def describe(detection: Detection) -> Tuple[str, int, int, int, int]:
+    r = detection.rectangle
+    return detection.name, r.x1, r.y1, r.x2, r.y2
+
+
+def test_decode_ssd_output_offsets_crops():
+    crops = [
+        (0, Rectangle(0, 0, 200, 100), np.zeros((100, 200, 3), dtype=np.uint8)),
+        (0, Rectangle(200, 0, 400, 100), np.zeros((100, 200, 3), dtype=np.uint8)),
+        (1, Rectangle(50, 20, 150, 70), np.zeros((50, 100, 3), dtype=np.uint8)),
+    ]
+    output = np.array(
+        [
+            [
+                [
+                    [0, 1, 0.9, 0.1, 0.2, 0.5, 0.6],
+                    [1, 17, 0.8, 0.0, 0.0, 0.5, 0.5],
+                    [1, 3, 0.95, 0.0, 0.0, 0.5, 0.5],
+                    [2, 1, 0.3, 0.0, 0.0, 1.0, 1.0],
+                    [2, 1, 0.7, 0.5, 0.5, 1.0, 1.0],
+                    [-1, 0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                ]
+            ]
+        ],
+        dtype=np.float32,
+    )
+
+    detections = decode_ssd_output(
+        output, crops, 2, LabelLookup(COCO_LABELS, ["person", "cat"]), 0.5
+    )
+
+    # Car is not allowed, the low confidence person is below the threshold
+    assert [describe(d) for d in detections[0]] == [
+        ("person", 20, 20, 100, 60),
+        ("cat", 200, 0, 300, 50),
+    ]
+    assert [describe(d) for d in detections[1]] == [("person", 100, 45, 150, 70)]
+    assert isinstance(detections[1][0].confidence, float)
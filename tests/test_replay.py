@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from smart_nvr.app_config import (
+    MotionDetectionConfig,
+    MotionTriggerConfig,
+    ReplayFeedConfig,
+)
+from smart_nvr.camera.feed_multiplexer import CameraFeedMultiplexer
+from smart_nvr.camera.image import CameraImageContainer, DetectionCameraImageContainer
+from smart_nvr.camera.motion_detection.triggers import ScheduleMotionTrigger
+from smart_nvr.utils.timing import SimulatedClock, get_clock, set_clock
+from smart_nvr.video.video_output import BaseVideoOutput
+from smart_nvr.workers.replay_feed_worker import ReplayFeedWorker
+
+
+def test_simulated_clock_follows_slowest_lane():
+    clock = SimulatedClock(start_millis=0, max_skew_millis=100)
+    clock.add_lane("cam1")
+    clock.add_lane("cam2")
+
+    clock.advance("cam1", 100)
+    assert clock.time_millis() == 0
+
+    # Lanes further ahead than the skew wait for the others
+    advanced = threading.Event()
+    thread = threading.Thread(
+        target=lambda: (clock.advance("cam1", 500), advanced.set())
+    )
+    thread.start()
+    assert not advanced.wait(0.1)
+
+    clock.advance("cam2", 450)
+    thread.join(timeout=1)
+    assert advanced.is_set()
+    assert clock.time_millis() == 450
+
+    clock.remove_lane("cam2")
+    assert clock.time_millis() == 500
+
+
+def test_video_output_timers_run_on_simulated_clock():
+    previous_clock = get_clock()
+    clock = SimulatedClock(start_millis=1000)
+    clock.add_lane("cam1")
+    set_clock(clock)
+    try:
+        video_output = BaseVideoOutput("video.mp4")
+        video_output.update_times(
+            DetectionCameraImageContainer(
+                CameraImageContainer.create(
+                    "cam1", np.zeros((90, 160, 3), dtype=np.uint8), []
+                ),
+                [],
+            )
+        )
+        assert video_output.first_frame_time == 1000
+        assert not video_output.is_max_time_running()
+
+        clock.advance("cam1", 21000)
+        assert video_output.is_max_time_running()
+    finally:
+        set_clock(previous_clock)
+
+
+def test_schedule_trigger_repeats_motion():
+    trigger = ScheduleMotionTrigger(
+        MotionTriggerConfig(type="schedule", on_seconds=2, off_seconds=1),
+        MotionDetectionConfig(),
+    )
+
+    assert [trigger.update(1000 + t * 500, None) for t in range(8)] == [
+        True,
+        True,
+        True,
+        True,
+        False,
+        False,
+        True,
+        True,
+    ]
+
+
+def test_fast_replay_forwards_every_frame_on_replayed_time(tmp_path):
+    for index in range(6):
+        raw_image_np = np.full((90, 160, 3), index * 40, dtype=np.uint8)
+        cv2.imwrite(os.path.join(str(tmp_path), f"{index:03}.png"), raw_image_np)
+
+    clock = SimulatedClock(start_millis=0)
+    multiplexer = CameraFeedMultiplexer()
+    worker = ReplayFeedWorker(
+        "cam1",
+        multiplexer,
+        ReplayFeedConfig(path=str(tmp_path), frame_rate=10),
+        clock,
+    )
+    worker.start()
+
+    created_at = []
+    deadline = time.monotonic() + 10
+    while not worker.finished.is_set() or multiplexer.qsize() > 0:
+        assert time.monotonic() < deadline
+        try:
+            created_at.append(multiplexer.get(timeout=0.1).created_at)
+        except CameraFeedMultiplexer.Empty:
+            pass
+
+    worker.stop()
+    worker.join()
+
+    # First frame only primes the motion detector, nothing is dropped as busy
+    assert created_at == [100, 200, 300, 400, 500]
+    assert worker.forwarded_count == 5
@@ -0,0 +1,109 @@
+import gc
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from smart_nvr.camera.feed_multiplexer import CameraFeedMultiplexer
+from smart_nvr.camera.image import CameraImageContainer, get_split_image_dimensions
+from smart_nvr.camera.shared_frame_buffer import (
+    FrameTooLargeError,
+    SharedFrameReader,
+    SharedFrameRingBuffer,
+    SharedFrameWriter,
+)
+
+
+def test_shared_frame_round_trip_without_copy():
+    ctx = multiprocessing.get_context("spawn")
+    ring = SharedFrameRingBuffer(ctx, slots=3, slot_size=90 * 160 * 3)
+    handle_queue = ctx.Queue()
+    pending = ctx.Event()
+    multiplexer = CameraFeedMultiplexer()
+
+    writer = SharedFrameWriter(ring, handle_queue, pending)
+    reader = SharedFrameReader(ring, handle_queue, pending, multiplexer)
+
+    raw_image_np = writer.allocate((90, 160, 3))
+    assert raw_image_np is not None
+    raw_image_np[:] = 42
+
+    writer.put_nowait(
+        CameraImageContainer.create(
+            "cam1", raw_image_np, get_split_image_dimensions(raw_image_np)
+        )
+    )
+    assert writer.contains("cam1")
+
+    assert reader.forward(timeout=1) == "cam1"
+    img = multiplexer.get()
+    assert reader.wait_taken("cam1", timeout=1)
+    assert not writer.contains("cam1")
+
+    assert np.shares_memory(img.raw_image_np, raw_image_np)
+    assert int(img.cropped_images[1][0, 0, 0]) == 42
+
+    # Writer still holds the frame until it moves on to the next one
+    assert ring.acquire() is not None
+    assert ring.acquire() is not None
+    assert ring.acquire() is None
+    writer.reset()
+    assert ring.acquire() is None
+
+    crop = img.cropped_images[0]
+    del img
+    gc.collect()
+    assert ring.acquire() is None
+
+    # Slot is released once the last view of the frame is gone
+    del crop
+    gc.collect()
+    assert ring.acquire() is not None
+
+
+def test_shared_frames_in_flight_are_bounded_by_ring():
+    ctx = multiprocessing.get_context("spawn")
+    ring = SharedFrameRingBuffer(ctx, slots=3, slot_size=90 * 160 * 3)
+    handle_queue = ctx.Queue()
+    pending = ctx.Event()
+    multiplexer = CameraFeedMultiplexer()
+
+    writer = SharedFrameWriter(ring, handle_queue, pending)
+    reader = SharedFrameReader(ring, handle_queue, pending, multiplexer)
+
+    # Pipeline keeps every frame it took, as its queues would
+    in_flight = []
+    while not writer.contains("cam1"):
+        raw_image_np = writer.allocate((90, 160, 3))
+        assert raw_image_np is not None
+        writer.put_nowait(
+            CameraImageContainer.create(
+                "cam1", raw_image_np, get_split_image_dimensions(raw_image_np)
+            )
+        )
+        assert reader.forward(timeout=1) == "cam1"
+        in_flight.append(multiplexer.get())
+        assert reader.wait_taken("cam1", timeout=1)
+
+    # Every slot is taken by the pipeline, the camera drops frames meanwhile
+    assert len(in_flight) == 3
+    writer.reset()
+    assert writer.contains("cam1")
+
+    # Camera resumes once the pipeline is done with a frame
+    del in_flight[0]
+    gc.collect()
+    assert not writer.contains("cam1")
+
+
+def test_shared_frame_too_large_for_slot():
+    ctx = multiprocessing.get_context("spawn")
+    ring = SharedFrameRingBuffer(ctx, slots=3, slot_size=90 * 160 * 3)
+    writer = SharedFrameWriter(ring, ctx.Queue(), ctx.Event())
+
+    with pytest.raises(FrameTooLargeError):
+        writer.allocate((180, 320, 3))
+
+    # Failed allocation doesn't take up a slot
+    for _ in range(3):
+        assert ring.acquire() is not None
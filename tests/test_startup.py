@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+from smart_nvr.utils.startup import StartupReport
+
+
+def test_heavy_libraries_not_imported_at_startup():
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys, smart_nvr.app; "
+            "print(sorted({'av', 'minio', 'torch', 'onnxruntime'} "
+            "& set(sys.modules)))",
+        ]
+    )
+    assert output.decode().strip() == "[]"
+
+
+def test_startup_report_lists_phases():
+    startup = StartupReport()
+    with startup.phase("model_load"):
+        pass
+    startup.record("camera_connect[cam1]", 1.5)
+
+    assert [name for name, _ in startup.phases()] == [
+        "model_load",
+        "camera_connect[cam1]",
+    ]
+    report = startup.format()
+    assert "camera_connect[cam1]   1.500 s" in report
+    assert "total" in report
@@ -0,0 +1,106 @@
+import json
+import os
+
+import numpy as np
+
+from smart_nvr.app_config import ProfilingConfig, TracingConfig
+from smart_nvr.camera.feed_multiplexer import CameraFeedMultiplexer
+from smart_nvr.camera.image import CameraImageContainer, get_split_image_dimensions
+from smart_nvr.tracing.profiler import PROFILER
+from smart_nvr.tracing.trace import TRACER
+from smart_nvr.workers.base_worker import BaseWorker
+from smart_nvr.workers.detection_worker import DetectionWorker
+
+from .test_detection_worker import FakeDetectionModel
+
+
+def test_traced_frame_records_stages_and_queues(tmp_path):
+    output_path = os.path.join(str(tmp_path), "trace.json")
+    TRACER.configure(
+        TracingConfig(enabled=True, sample_interval=1, output_path=output_path)
+    )
+    try:
+        multiplexer = CameraFeedMultiplexer()
+        worker = DetectionWorker(model=FakeDetectionModel(), image_queue=multiplexer)
+
+        raw_image_np = np.zeros((90, 160, 3), dtype=np.uint8)
+        trace = TRACER.start_trace("cam1")
+        assert trace is not None
+        with trace.span("retrieve"):
+            img = CameraImageContainer.create(
+                "cam1",
+                raw_image_np,
+                get_split_image_dimensions(raw_image_np),
+                trace=trace,
+            )
+        trace.enqueue("camera_feed")
+        multiplexer.put_nowait(img)
+
+        worker.run_processing()
+        result = worker.detection_queue.get_nowait()
+        assert result.trace is trace
+
+        result.trace.dequeue()
+        TRACER.finish(result.trace)
+        with TRACER.span("upload", file_path="cam1.mp4"):
+            pass
+    finally:
+        TRACER.close()
+
+    with open(output_path) as f:
+        events = json.load(f)
+
+    names = [event["name"] for event in events if event["ph"] == "X"]
+    assert names == [
+        "retrieve",
+        "queue camera_feed",
+        "inference",
+        "post_process",
+        "queue detection",
+        "upload",
+    ]
+    assert [event["ph"] for event in events if event.get("cat") == "frame"] == [
+        "b",
+        "e",
+    ]
+    assert any(
+        event["ph"] == "M" and event["args"]["name"] == "MainThread" for event in events
+    )
+
+
+def test_disabled_tracer_skips_frames():
+    TRACER.configure(TracingConfig(enabled=False))
+    assert TRACER.start_trace("cam1") is None
+
+
+class CountingWorker(BaseWorker):
+    def __init__(self):
+        super().__init__(name="CountingWorker")
+        self.iterations = 0
+
+    def run_processing(self):
+        self.iterations += 1
+        if self.iterations == 1:
+            PROFILER.toggle()
+        elif self.iterations == 3:
+            PROFILER.toggle()
+            self.stop()
+
+
+def test_profiler_toggle_dumps_worker_profile(tmp_path):
+    output_directory = os.path.join(str(tmp_path), "profiles")
+    PROFILER.configure(
+        ProfilingConfig(
+            enabled=True, workers=["Counting"], output_directory=output_directory
+        )
+    )
+    try:
+        worker = CountingWorker()
+        worker.run()
+    finally:
+        PROFILER.configure(ProfilingConfig())
+
+    profiles = os.listdir(output_directory)
+    assert len(profiles) == 1
+    assert profiles[0].startswith("CountingWorker-")
+    assert profiles[0].endswith(".prof")
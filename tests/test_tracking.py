@@ -0,0 +1,119 @@
+from typing import List
+
+import numpy as np
+
+from smart_nvr.app_config import TrackingConfig
+from smart_nvr.camera.image import CameraImageContainer, get_split_image_dimensions
+from smart_nvr.detection.base_model import BaseDetectionModel
+from smart_nvr.detection.detection_types import Detection
+from smart_nvr.detection.tracking import TrackingDetectionModel
+from smart_nvr.utils.rectangle import Rectangle
+
+
+class MovingObjectModel(BaseDetectionModel):
+    def __init__(self):
+        self.detected_at: List[int] = []
+
+    def load(self):
+        pass
+
+    def detect(
+        self, img: CameraImageContainer, threshold: float = 0.5
+    ) -> List[Detection]:
+        self.detected_at.append(img.created_at)
+        x = object_x(img.created_at)
+        return [Detection("person", 0.9, x, 20, x + 40, 100)]
+
+
+def object_x(timestamp: int) -> int:
+    # Moves 10 px every 100 ms
+    return 10 + timestamp // 10
+
+
+def create_image(
+    camera_name: str, timestamp: int, motion: List[Rectangle]
+) -> CameraImageContainer:
+    raw_image_np = np.zeros((180, 320, 3), dtype=np.uint8)
+    return CameraImageContainer.create(
+        camera_name,
+        raw_image_np,
+        get_split_image_dimensions(raw_image_np),
+        created_at=timestamp,
+        motion=motion,
+    )
+
+
+def object_motion(timestamp: int) -> List[Rectangle]:
+    x = object_x(timestamp)
+    return [Rectangle(x, 20, x + 40, 100)]
+
+
+def test_tracker_skips_inference_and_keeps_track_ids():
+    model = MovingObjectModel()
+    tracking_model = TrackingDetectionModel(model, TrackingConfig(detect_interval=5))
+
+    track_ids = set()
+    for index in range(20):
+        timestamp = index * 100
+        detections = tracking_model.detect(
+            create_image("cam1", timestamp, object_motion(timestamp))
+        )
+
+        assert len(detections) == 1
+        track_ids.add(detections[0].track_id)
+        # Constant velocity prediction follows the object between inferences
+        assert abs(detections[0].rectangle.x1 - object_x(timestamp)) <= 10
+
+    assert track_ids == {1}
+    # Second frame measures the velocity of the new track
+    assert model.detected_at == [0, 100, 600, 1100, 1600]
+    assert tracking_model.skipped_count == 15
+
+
+def test_tracker_detects_motion_outside_predicted_boxes():
+    model = MovingObjectModel()
+    tracking_model = TrackingDetectionModel(model, TrackingConfig(detect_interval=5))
+
+    for timestamp in [0, 100, 200]:
+        tracking_model.detect(create_image("cam1", timestamp, object_motion(timestamp)))
+    tracking_model.detect(
+        create_image("cam1", 300, object_motion(300) + [Rectangle(250, 120, 300, 170)])
+    )
+    assert model.detected_at == [0, 100, 300]
+
+    # Other cameras keep their own tracks
+    detections = tracking_model.detect(create_image("cam2", 400, object_motion(400)))
+    assert model.detected_at == [0, 100, 300, 400]
+    assert detections[0].track_id == 2
+
+
+def test_tracker_measures_coverage_against_motion_not_crops():
+    model = MovingObjectModel()
+    tracking_model = TrackingDetectionModel(model, TrackingConfig(detect_interval=5))
+
+    for timestamp in [0, 100, 200]:
+        tracking_model.detect(create_image("cam1", timestamp, object_motion(timestamp)))
+    assert model.detected_at == [0, 100]
+
+    # Crop square around the object is mostly not covered by its box
+    raw_image_np = np.zeros((180, 320, 3), dtype=np.uint8)
+    img = CameraImageContainer.create(
+        "cam1",
+        raw_image_np,
+        [Rectangle(0, 0, 180, 180)],
+        created_at=300,
+        motion=object_motion(300),
+    )
+    tracking_model.detect(img)
+    assert model.detected_at == [0, 100]
+
+    # Tracked box overlaps the crop square, but not the actual motion
+    img = CameraImageContainer.create(
+        "cam1",
+        raw_image_np,
+        [Rectangle(0, 0, 180, 180)],
+        created_at=400,
+        motion=[Rectangle(130, 120, 170, 170)],
+    )
+    tracking_model.detect(img)
+    assert model.detected_at == [0, 100, 400]
@@ -0,0 +1,173 @@
+import datetime
+import os
+import queue
+import time
+from typing import List
+
+from smart_nvr.app import stop_workers
+from smart_nvr.app_config import MinioConfig, UploadConfig
+from smart_nvr.camera.image import DetectionCameraImageContainer
+from smart_nvr.upload.spool import UploadSpool
+from smart_nvr.utils.backoff import ExponentialBackoff
+from smart_nvr.video.output_file import OutputFile, OutputFileType
+from smart_nvr.workers.minio_worker import MinioWorker
+from smart_nvr.workers.video_worker import VideoWorker
+
+from .test_video_worker import create_image
+
+
+class FakeMinioClient:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.uploads: List[str] = []
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return True
+
+    def fput_object(self, bucket_name: str, object_name: str, file_path: str, **kwargs):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("MinIO unreachable")
+
+        assert os.path.exists(file_path)
+        self.uploads.append(object_name)
+
+
+def create_output_file(directory: str, name: str, size: int = 100) -> OutputFile:
+    file_path = os.path.join(directory, name)
+    with open(file_path, "wb") as f:
+        f.write(b"\0" * size)
+
+    return OutputFile(
+        file_type=OutputFileType.video,
+        file_path=file_path,
+        timestamp=datetime.datetime(2022, 3, 4, tzinfo=datetime.timezone.utc),
+    )
+
+
+def create_spool(directory: str, max_bytes: int = 10_000) -> UploadSpool:
+    return UploadSpool(
+        os.path.join(directory, ".spool"), max_bytes, ExponentialBackoff(0.01, 0.05)
+    )
+
+
+def test_spool_replays_pending_files(tmp_path):
+    directory = str(tmp_path)
+    spool = create_spool(directory)
+    spool.add(create_output_file(directory, "a.mp4"))
+    spool.add(create_output_file(directory, "b.mp4"))
+
+    entry = spool.get(timeout=0)
+    assert entry is not None
+    spool.complete(entry)
+    assert not os.path.exists(entry.output_file.file_path)
+
+    # Restart picks up where the previous process stopped
+    spool = create_spool(directory)
+    assert len(spool) == 1
+    entry = spool.get(timeout=0)
+    assert entry is not None
+    assert os.path.basename(entry.output_file.file_path) == "b.mp4"
+
+    spool.add(create_output_file(directory, "c.mp4"))
+    assert spool.get(timeout=0).sequence > entry.sequence
+
+
+def test_spool_retries_with_backoff(tmp_path):
+    directory = str(tmp_path)
+    spool = create_spool(directory)
+    spool.add(create_output_file(directory, "a.mp4"))
+
+    entry = spool.get(timeout=0)
+    spool.retry(entry)
+    assert spool.get(timeout=0) is None
+
+    # File stays on disk until the upload succeeds
+    assert os.path.exists(entry.output_file.file_path)
+    assert spool.get(timeout=1) is entry
+
+
+def test_spool_evicts_oldest_files(tmp_path):
+    directory = str(tmp_path)
+    spool = create_spool(directory, max_bytes=250)
+    for name in ["a.mp4", "b.mp4", "c.mp4"]:
+        spool.add(create_output_file(directory, name))
+
+    assert len(spool) == 2
+    assert spool.size == 200
+    assert not os.path.exists(os.path.join(directory, "a.mp4"))
+    assert os.path.basename(spool.get(timeout=0).output_file.file_path) == "b.mp4"
+
+
+def test_minio_worker_uploads_after_failures(tmp_path):
+    directory = str(tmp_path)
+    minio_client = FakeMinioClient(failures=2)
+    file_queue: "queue.Queue[OutputFile]" = queue.Queue()
+    worker = MinioWorker(
+        MinioConfig(host="minio", access_key="a", secret_key="s", bucket="nvr"),
+        file_queue,
+        UploadConfig(
+            spool_directory=os.path.join(directory, ".spool"),
+            retry_initial_seconds=0.01,
+        ),
+        minio_client=minio_client,
+    )
+    worker.start()
+
+    file_queue.put(create_output_file(directory, "cam1.mp4"))
+    file_queue.put(create_output_file(directory, "cam2.mp4"))
+
+    deadline = time.monotonic() + 5
+    while len(minio_client.uploads) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    worker.stop()
+    worker.join()
+
+    assert sorted(minio_client.uploads) == [
+        "video/2022/03/04/cam1.mp4",
+        "video/2022/03/04/cam2.mp4",
+    ]
+    assert len(worker.spool) == 0
+    assert not os.path.exists(os.path.join(directory, "cam1.mp4"))
+
+
+def test_recording_open_at_shutdown_is_spooled(tmp_path):
+    directory = str(tmp_path)
+    detection_queue: "queue.Queue[DetectionCameraImageContainer]" = queue.Queue()
+    video_worker = VideoWorker(directory, detection_queue)
+    minio_worker = MinioWorker(
+        MinioConfig(host="minio", access_key="a", secret_key="s", bucket="nvr"),
+        video_worker.file_path_queue,
+        UploadConfig(spool_directory=os.path.join(directory, ".spool")),
+        minio_client=FakeMinioClient(failures=1000),
+    )
+    video_worker.start()
+    minio_worker.start()
+
+    for index in range(5):
+        detection_queue.put(create_image("cam1", index))
+    while not detection_queue.empty():
+        time.sleep(0.01)
+
+    # Clip is still being recorded when the application stops
+    stop_workers([minio_worker, video_worker])
+
+    spool = create_spool(directory)
+    file_types = set()
+    while len(spool) > 0:
+        entry = spool.get(timeout=1)
+        assert entry is not None
+        file_types.add(entry.output_file.file_type)
+        spool.complete(entry)
+    assert file_types == {OutputFileType.image, OutputFileType.video}
+
+
+def test_backoff_delay_stays_capped_for_large_attempts():
+    backoff = ExponentialBackoff(1.0, 30.0, jitter=0)
+
+    assert backoff.delay(1) == 1.0
+    assert backoff.delay(5) == 16.0
+    assert backoff.delay(6) == 30.0
+    assert backoff.delay(1100) == 30.0
+    assert backoff.delay(10**9) == 30.0
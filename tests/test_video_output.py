@@ -0,0 +1,87 @@
+import os
+
+import av
+import numpy as np
+
+from smart_nvr.app_config import RecordingProfileConfig, VideoCodecEnum
+from smart_nvr.camera.image import CameraImageContainer, DetectionCameraImageContainer
+from smart_nvr.video.video_output import (
+    SegmentedVideoOutput,
+    VideoOutput,
+    get_encoder_name,
+)
+
+
+def test_video_output_applies_recording_profile(tmp_path):
+    file_path = os.path.join(str(tmp_path), "video.mp4")
+    profile = RecordingProfileConfig(
+        codec=VideoCodecEnum.h264, preset="ultrafast", crf=28, scale=0.5, gop_size=5
+    )
+
+    video_output = VideoOutput(file_path, 161, 97, profile)
+    for index in range(10):
+        raw_image_np = np.full((97, 161, 3), index * 20, dtype=np.uint8)
+        video_output.write_image(
+            DetectionCameraImageContainer(
+                CameraImageContainer.create(
+                    "cam1", raw_image_np, [], created_at=1000 + index * 40
+                ),
+                [],
+            )
+        )
+    video_output.close()
+
+    container = av.open(file_path)
+    stream = container.streams.video[0]
+    frames = list(container.decode(stream))
+    container.close()
+
+    # Missing encoders fall back to mpeg4, scaling applies either way
+    assert stream.codec_context.name == (
+        "h264" if get_encoder_name(VideoCodecEnum.h264) != "mpeg4" else "mpeg4"
+    )
+    assert (frames[0].width, frames[0].height) == (80, 48)
+    assert len(frames) == 10
+
+
+def count_frames(file_path: str) -> int:
+    container = av.open(file_path)
+    frames_count = len(list(container.decode(video=0)))
+    container.close()
+    return frames_count
+
+
+def test_segmented_video_output_rotates_segments(tmp_path):
+    file_path = os.path.join(str(tmp_path), "cam1.mp4")
+    video_output = SegmentedVideoOutput(
+        file_path,
+        segment_millis=1000,
+        create_segment=lambda path, previous: VideoOutput(path, 160, 96),
+    )
+
+    segments = []
+    for index in range(25):
+        raw_image_np = np.full((96, 160, 3), index * 10, dtype=np.uint8)
+        video_output.write_image(
+            DetectionCameraImageContainer(
+                CameraImageContainer.create(
+                    "cam1", raw_image_np, [], created_at=index * 100
+                ),
+                [],
+            )
+        )
+        segments.extend(video_output.pop_finished_segments())
+
+    # Finished segments are complete files on their own
+    assert len(segments) == 2
+    for segment in segments:
+        segment.close()
+    video_output.close()
+
+    file_paths = [segment.file_path for segment in segments] + [video_output.file_path]
+    assert [os.path.basename(path) for path in file_paths] == [
+        "cam1_000.mp4",
+        "cam1_001.mp4",
+        "cam1_002.mp4",
+    ]
+    assert [count_frames(path) for path in file_paths] == [10, 10, 5]
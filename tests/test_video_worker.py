@@ -0,0 +1,73 @@
+import os
+import queue
+import time
+from typing import List
+
+import av
+import numpy as np
+
+from smart_nvr.camera.image import (
+    CameraImageContainer,
+    DetectionCameraImageContainer,
+    get_split_image_dimensions,
+)
+from smart_nvr.detection.detection_types import Detection
+from smart_nvr.utils.timing import get_current_time_millis
+from smart_nvr.video.output_file import OutputFile, OutputFileType
+from smart_nvr.workers.video_worker import VideoWorker
+
+
+def create_image(camera_name: str, index: int) -> DetectionCameraImageContainer:
+    raw_image_np = np.full((96, 160, 3), index, dtype=np.uint8)
+    img = CameraImageContainer.create(
+        camera_name,
+        raw_image_np,
+        get_split_image_dimensions(raw_image_np),
+        created_at=get_current_time_millis() + index * 40,
+    )
+    return DetectionCameraImageContainer(
+        img, [Detection("person", 0.9, 10, 10, 50, 50)]
+    )
+
+
+def test_video_worker_encodes_cameras_in_separate_lanes(tmp_path):
+    detection_queue: "queue.Queue[DetectionCameraImageContainer]" = queue.Queue()
+    worker = VideoWorker(str(tmp_path), detection_queue)
+    worker.start()
+
+    for index in range(10):
+        for camera_name in ["cam1", "cam2"]:
+            detection_queue.put(create_image(camera_name, index))
+
+    while not detection_queue.empty():
+        time.sleep(0.01)
+
+    worker.stop()
+    worker.join()
+
+    output_files: List[OutputFile] = []
+    while not worker.file_path_queue.empty():
+        output_files.append(worker.file_path_queue.get_nowait())
+
+    assert sorted(
+        (f.file_type, os.path.basename(f.file_path).split("_")[0]) for f in output_files
+    ) == [
+        (OutputFileType.image, "cam1"),
+        (OutputFileType.image, "cam2"),
+        (OutputFileType.video, "cam1"),
+        (OutputFileType.video, "cam2"),
+    ]
+
+    # Every lane keeps the frame order of its camera
+    for output_file in output_files:
+        if output_file.file_type != OutputFileType.video:
+            continue
+
+        container = av.open(output_file.file_path)
+        values = [
+            int(np.median(frame.to_ndarray(format="bgr24")))
+            for frame in container.decode(video=0)
+        ]
+        container.close()
+        assert values == sorted(values)
+        assert len(values) == 10
@@ -0,0 +1,43 @@
+import os
+from typing import Sequence
+
+from smart_nvr.app_config import ModelConfig, ModelNameEnum, OnnxRuntimeConfig
+from smart_nvr.camera.image import CameraImageContainer
+from smart_nvr.detection.base_model import BaseDetectionModel
+from smart_nvr.detection.detection_types import Detection
+from smart_nvr.detection.warmup import warmup_model
+
+
+class FakeCatModel(BaseDetectionModel):
+    def __init__(self):
+        self.calls = 0
+
+    def load(self):
+        pass
+
+    def detect(
+        self, img: CameraImageContainer, threshold: float = 0.5
+    ) -> Sequence[Detection]:
+        self.calls += 1
+        return [Detection("cat", 0.9, 0, 0, 10, 10)]
+
+
+def test_warmup_is_skipped_once_passed(tmp_path):
+    config = ModelConfig(
+        name=ModelNameEnum.yolo_v5_s_onnx,
+        warmup_cache_path=os.path.join(str(tmp_path), "warmup.json"),
+    )
+
+    model = FakeCatModel()
+    warmup_model(model, config)
+    assert model.calls > 0
+
+    cached_model = FakeCatModel()
+    warmup_model(cached_model, config)
+    assert cached_model.calls == 0
+
+    # Other runtime settings may change what the model finds
+    retuned_config = config.copy(update={"onnx": OnnxRuntimeConfig(intra_op_threads=2)})
+    retuned_model = FakeCatModel()
+    warmup_model(retuned_model, retuned_config)
+    assert retuned_model.calls > 0
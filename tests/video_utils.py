@@ -0,0 +1,30 @@
+from fractions import Fraction
+
+import av
+import numpy as np
+
+
+def write_test_video(
+    file_path: str, frames_count: int, gop_size: int, width: int = 160, height: int = 96
+):
+    container = av.open(file_path, mode="w")
+    stream = container.add_stream("mpeg4", rate=10)
+    stream.width = width
+    stream.height = height
+    stream.pix_fmt = "yuv420p"
+    stream.codec_context.gop_size = gop_size
+    stream.codec_context.time_base = Fraction(1, 10)
+
+    # Small moving square keeps the encoder from inserting extra keyframes
+    background = np.random.RandomState(0).randint(0, 255, (height, width, 3))
+    for index in range(frames_count):
+        img = background.astype(np.uint8)
+        img[10:30, index * 4 : index * 4 + 20] = 255
+        frame = av.VideoFrame.from_ndarray(img, format="bgr24")
+        frame.pts = index
+        for packet in stream.encode(frame):
+            container.mux(packet)
+
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()